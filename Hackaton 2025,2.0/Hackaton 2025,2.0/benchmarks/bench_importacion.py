@@ -0,0 +1,86 @@
+"""
+Presupuesto de arranque: importa cada punto de entrada en un intérprete nuevo
+con `python -X importtime` y comprueba
+
+- que no arrastra dependencias pesadas que solo hacen falta en otra etapa
+  (scikit-learn solo con el motor DBSCAN, requests solo al subir, pandas no
+  antes de abrir la ventana), y
+- que el tiempo acumulado de importación no supera su presupuesto.
+
+Uso (desde la carpeta del proyecto):
+    python -m benchmarks.bench_importacion
+    python -m benchmarks.bench_importacion --repeticiones 5 --factor 2
+
+Sale con código 1 si algún módulo incumple; sirve para CI o antes de publicar.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+# (módulo, dependencias que no debe cargar, presupuesto en ms en un portátil de campo)
+COMPROBACIONES = [
+    ('src.interfaz_gui', ('pandas', 'numpy', 'sklearn', 'scipy', 'requests'), 1500),
+    ('src.cli', ('pandas', 'numpy', 'sklearn', 'scipy', 'requests'), 400),
+    ('src.subida', ('pandas', 'numpy', 'sklearn', 'scipy'), 600),
+    ('src.motor_limpieza', ('sklearn', 'scipy', 'requests', 'openpyxl'), 1500),
+]
+
+# Línea de -X importtime: "import time: <propio> | <acumulado> | <módulo con sangría>"
+LINEA_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def medir_importacion(modulo: str) -> tuple[float, set[str]] | None:
+    """(milisegundos acumulados, módulos cargados) de importar `modulo` en frío; None si no se puede."""
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                             capture_output=True, text=True)
+    if proceso.returncode != 0:
+        return None
+    cargados = set()
+    acumulado_us = 0
+    for linea in proceso.stderr.splitlines():
+        coincidencia = LINEA_IMPORTTIME.match(linea)
+        if not coincidencia:
+            continue
+        nombre = coincidencia.group(4)
+        cargados.add(nombre)
+        if nombre == modulo:
+            acumulado_us = int(coincidencia.group(2))
+    return acumulado_us / 1000, cargados
+
+
+def prohibidos_cargados(cargados: set[str], prohibidos: tuple[str, ...]) -> list[str]:
+    return sorted(p for p in prohibidos if any(m == p or m.startswith(p + '.') for m in cargados))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=3, help='se toma el menor tiempo (por defecto 3)')
+    parser.add_argument('--factor', type=float, default=1.0, help='multiplica los presupuestos (máquinas lentas)')
+    args = parser.parse_args()
+
+    fallos = 0
+    print(f"{'módulo':<22}{'ms':>9}{'presupuesto':>13}  resultado")
+    for modulo, prohibidos, presupuesto_ms in COMPROBACIONES:
+        medidas = [medir_importacion(modulo) for _ in range(args.repeticiones)]
+        if any(medida is None for medida in medidas):
+            # p. ej. la GUI sin ttkbootstrap instalado
+            print(f"{modulo:<22}{'-':>9}{'-':>13}  omitido (no se puede importar aquí)")
+            continue
+        milisegundos = min(ms for ms, _ in medidas)
+        sobrantes = prohibidos_cargados(medidas[0][1], prohibidos)
+        limite = presupuesto_ms * args.factor
+
+        problemas = []
+        if sobrantes:
+            problemas.append(f"carga {', '.join(sobrantes)}")
+        if milisegundos > limite:
+            problemas.append("supera el presupuesto")
+        fallos += bool(problemas)
+        print(f"{modulo:<22}{milisegundos:>9.0f}{limite:>13.0f}  {'; '.join(problemas) or 'ok'}")
+
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark del motor de limpieza completo sobre fincas sintéticas.
+
+Genera (o reutiliza) fincas de cada tamaño y formato con benchmarks.generador,
+ejecuta LimpiezaSpots.procesar_y_exportar con cada configuración y guarda en
+JSON el tiempo total, el de cada etapa (stats['etapas']) y las estadísticas.
+
+Uso (desde la carpeta del proyecto):
+    python -m benchmarks.bench_motor
+    python -m benchmarks.bench_motor --tamanos 10000 100000 1000000 5000000 --motores grid
+    python -m benchmarks.bench_motor --salida nuevo.json --comparar base.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.motor_limpieza import LimpiezaSpots
+from .generador import escribir_finca, generar_finca
+
+CAMPOS_STATS = ('original', 'eliminados_exactos', 'eliminados_espaciales', 'corregidos_secuencia', 'final')
+
+
+def ruta_finca(directorio: str, n: int, formato: str, semilla: int) -> str:
+    """Genera la finca la primera vez y la reutiliza en ejecuciones posteriores."""
+    ruta = os.path.join(directorio, f"finca_{formato}_{n}_s{semilla}.csv")
+    if not os.path.exists(ruta):
+        escribir_finca(generar_finca(n, formato, semilla), ruta)
+    return ruta
+
+
+def medir_configuracion(ruta: str, salida: str, opciones: dict, repeticiones: int) -> dict:
+    """Mejor de `repeticiones` ejecuciones (por tiempo total) con sus etapas."""
+    mejor = None
+    for _ in range(repeticiones):
+        limpiador = LimpiezaSpots(**opciones)
+        inicio = time.perf_counter()
+        ok, reporte = limpiador.procesar_y_exportar(ruta, salida, '1')
+        total = time.perf_counter() - inicio
+        if not ok:
+            raise RuntimeError(f"Fallo al procesar {ruta}: {reporte.strip()}")
+        if mejor is None or total < mejor['total_segundos']:
+            mejor = {
+                'total_segundos': round(total, 4),
+                'etapas': {nombre: etapa['segundos'] for nombre, etapa in limpiador.stats['etapas'].items()},
+                'rss_pico_mb': max((etapa['rss_pico_mb'] or 0) for etapa in limpiador.stats['etapas'].values()),
+                'stats': {campo: limpiador.stats[campo] for campo in CAMPOS_STATS},
+            }
+    return mejor
+
+
+def clave(resultado: dict) -> tuple:
+    return (resultado['tamano'], resultado['formato'], resultado['motor'], resultado['workers'],
+            resultado['filas_por_bloque'])
+
+
+def comparar(resultados: list[dict], ruta_base: str):
+    with open(ruta_base, encoding='utf-8') as f:
+        base = {clave(r): r for r in json.load(f)['resultados']}
+    print(f"\nComparación con {ruta_base} (tiempo actual / base):")
+    for resultado in resultados:
+        anterior = base.get(clave(resultado))
+        if anterior is None:
+            continue
+        partes = [f"total {resultado['total_segundos'] / anterior['total_segundos']:.2f}x"]
+        for nombre, segundos in resultado['etapas'].items():
+            previo = anterior['etapas'].get(nombre)
+            if previo:
+                partes.append(f"{nombre} {segundos / previo:.2f}x")
+        print(f"  {clave(resultado)}: " + ', '.join(partes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--formatos', nargs='+', choices=['antiguo', 'nuevo'], default=['antiguo', 'nuevo'])
+    parser.add_argument('--motores', nargs='+', choices=LimpiezaSpots.MOTORES_ESPACIALES, default=['grid', 'dbscan'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    parser.add_argument('--filas-por-bloque', type=int, nargs='+', default=[0],
+                        help="0 = modo en memoria")
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--datos', default=os.path.join(tempfile.gettempdir(), 'palmclean_bench'),
+                        help="Carpeta donde se guardan las fincas generadas.")
+    parser.add_argument('--salida', default='bench_resultados.json')
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para comparar.")
+    args = parser.parse_args()
+
+    os.makedirs(args.datos, exist_ok=True)
+    salida_csv = os.path.join(args.datos, 'salida.csv')
+    resultados = []
+
+    print(f"{'n':>9} {'formato':>8} {'motor':>7} {'workers':>7} {'bloque':>8} {'total (s)':>10}  etapas (s)")
+    for n in args.tamanos:
+        for formato in args.formatos:
+            ruta = ruta_finca(args.datos, n, formato, args.semilla)
+            for motor in args.motores:
+                for workers in args.workers:
+                    for filas_por_bloque in args.filas_por_bloque:
+                        opciones = {'motor_espacial': motor, 'workers': workers,
+                                    'filas_por_bloque': filas_por_bloque or None}
+                        medida = medir_configuracion(ruta, salida_csv, opciones, args.repeticiones)
+                        resultado = {'tamano': n, 'formato': formato, 'motor': motor, 'workers': workers,
+                                     'filas_por_bloque': filas_por_bloque, **medida}
+                        resultados.append(resultado)
+                        etapas = ' '.join(f"{nombre}={segundos:.3f}" for nombre, segundos in medida['etapas'].items())
+                        print(f"{n:>9} {formato:>8} {motor:>7} {workers:>7} {filas_por_bloque:>8} "
+                              f"{medida['total_segundos']:>10.3f}  {etapas}", flush=True)
+
+    informe = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'plataforma': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'cpus': os.cpu_count(),
+        'resultados': resultados,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {args.salida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
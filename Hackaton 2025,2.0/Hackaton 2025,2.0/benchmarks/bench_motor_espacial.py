@@ -0,0 +1,66 @@
+"""
+Compara los motores espaciales de LimpiezaSpots ('dbscan' vs 'grid').
+
+Uso (desde la carpeta del proyecto):
+    python -m benchmarks.bench_motor_espacial
+    python -m benchmarks.bench_motor_espacial --tamanos 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+from src.motor_espacial import agrupar_por_rejilla, RADIO_TIERRA_M
+
+
+def generar_puntos(n: int, semilla: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Palmas en tresbolillo cada ~9 m con ruido GPS y un 5% de casi-duplicados."""
+    rng = np.random.default_rng(semilla)
+    n_base = int(n * 0.95)
+    lado = int(np.ceil(np.sqrt(n_base)))
+    fila, col = np.divmod(np.arange(n_base), lado)
+    paso = 9.0 / 111320  # ~9 m en grados
+    lat = 3.88 + fila * paso * 0.866
+    lng = -73.67 + (col + 0.5 * (fila % 2)) * paso
+    lat = lat + rng.normal(0, 0.3 / 111320, n_base)
+    lng = lng + rng.normal(0, 0.3 / 111320, n_base)
+    copias = rng.integers(0, n_base, n - n_base)
+    lat = np.concatenate([lat, lat[copias] + rng.normal(0, 0.3 / 111320, len(copias))])
+    lng = np.concatenate([lng, lng[copias] + rng.normal(0, 0.3 / 111320, len(copias))])
+    orden = rng.permutation(n)
+    return lat[orden], lng[orden]
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def etiquetas_dbscan(lat, lng, umbral_metros):
+    coords = np.radians(np.column_stack([lat, lng]))
+    return DBSCAN(eps=umbral_metros / RADIO_TIERRA_M, min_samples=1, metric='haversine').fit(coords).labels_
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--umbral', type=float, default=1.0, help='umbral_metros (por defecto 1.0)')
+    parser.add_argument('--sin-dbscan', action='store_true', help='medir solo el motor grid')
+    args = parser.parse_args()
+
+    print(f"{'n':>10} {'dbscan (s)':>12} {'grid (s)':>10} {'aceleración':>12} {'clusters':>10} iguales")
+    for n in args.tamanos:
+        lat, lng = generar_puntos(n)
+        grid, t_grid = medir(agrupar_por_rejilla, lat, lng, args.umbral)
+        if args.sin_dbscan:
+            print(f"{n:>10} {'-':>12} {t_grid:>10.3f} {'-':>12} {grid.max() + 1:>10} -")
+            continue
+        db, t_db = medir(etiquetas_dbscan, lat, lng, args.umbral)
+        iguales = np.array_equal(grid, db)
+        print(f"{n:>10} {t_db:>12.3f} {t_grid:>10.3f} {t_db / t_grid:>11.1f}x {grid.max() + 1:>10} {iguales}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Generador de plantaciones sintéticas para medir el motor de limpieza.
+
+Crea fincas con lotes rectangulares girados, líneas de palmas en tresbolillo,
+ruido GPS, duplicados exactos y casi-duplicados inyectados, números de palma
+desordenados y, opcionalmente, palmas anotadas en la línea vecina, en el
+formato antiguo (5 columnas, ';') o en el nuevo de la API.
+
+Uso:
+    python -m benchmarks.generador 100000 finca.csv --formato nuevo
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+METROS_POR_GRADO = 111320.0
+
+
+def generar_finca(
+    n_palmas: int,
+    formato: str = 'antiguo',
+    semilla: int = 0,
+    palmas_por_lote: int = 3000,
+    palmas_por_linea: int = 60,
+    espaciado_m: float = 9.0,
+    ruido_gps_m: float = 0.3,
+    frac_exactos: float = 0.01,
+    frac_casi_duplicados: float = 0.02,
+    frac_lineas_desordenadas: float = 0.05,
+    frac_lineas_equivocadas: float = 0.0,
+    finca_id: str = '1',
+    origen: tuple[float, float] = (3.88, -73.67),
+) -> pd.DataFrame:
+    """
+    Devuelve un DataFrame de texto con `n_palmas` filas en total (palmas + duplicados),
+    listo para escribir con `escribir_finca`.
+    """
+    if formato not in ('antiguo', 'nuevo'):
+        raise ValueError(f"formato debe ser 'antiguo' o 'nuevo', no '{formato}'")
+    rng = np.random.default_rng(semilla)
+
+    n_duplicados = int(n_palmas * (frac_exactos + frac_casi_duplicados))
+    n_base = n_palmas - n_duplicados
+
+    # --- Palmas reales: lote, línea y posición ---
+    indice = np.arange(n_base)
+    lote = indice // palmas_por_lote
+    en_lote = indice % palmas_por_lote
+    linea = en_lote // palmas_por_linea + 1
+    palma = en_lote % palmas_por_linea + 1
+
+    # Tresbolillo: líneas separadas espaciado*sin(60°), filas alternas desplazadas media palma
+    x = (palma - 1 + 0.5 * (linea % 2)) * espaciado_m
+    y = (linea - 1) * espaciado_m * np.sqrt(3) / 2
+
+    # Cada lote girado y colocado en una cuadrícula de lotes
+    n_lotes = int(lote.max()) + 1 if n_base else 0
+    angulo = rng.uniform(-np.pi / 6, np.pi / 6, n_lotes)[lote]
+    lado_lote = palmas_por_linea * espaciado_m * 1.2
+    lotes_por_fila = max(1, int(np.ceil(np.sqrt(n_lotes))))
+    x0 = (lote % lotes_por_fila) * lado_lote * 1.5
+    y0 = (lote // lotes_por_fila) * lado_lote * 1.5
+    este = x0 + x * np.cos(angulo) - y * np.sin(angulo) + rng.normal(0, ruido_gps_m, n_base)
+    norte = y0 + x * np.sin(angulo) + y * np.cos(angulo) + rng.normal(0, ruido_gps_m, n_base)
+
+    lat0, lng0 = origen
+    lat = lat0 + norte / METROS_POR_GRADO
+    lng = lng0 + este / (METROS_POR_GRADO * np.cos(np.radians(lat0)))
+
+    # --- Números de palma desordenados en algunas líneas ---
+    clave_linea = lote * 100_000 + linea
+    lineas = np.unique(clave_linea)
+    desordenadas = lineas[rng.random(len(lineas)) < frac_lineas_desordenadas]
+    filas = np.flatnonzero(np.isin(clave_linea, desordenadas))
+    # Las filas de cada línea son contiguas: permutar dentro de cada línea a la vez
+    permutacion = np.lexsort((rng.random(len(filas)), clave_linea[filas]))
+    palma[filas] = palma[filas[permutacion]]
+
+    # --- Palmas anotadas en la línea anterior o siguiente (solo si se piden) ---
+    if frac_lineas_equivocadas > 0:
+        equivocadas = np.flatnonzero(rng.random(n_base) < frac_lineas_equivocadas)
+        ultima = (np.minimum(palmas_por_lote, n_base - lote * palmas_por_lote) - 1) // palmas_por_linea + 1
+        paso = rng.choice([-1, 1], len(equivocadas))
+        nueva = linea[equivocadas] + paso
+        nueva = np.where((nueva < 1) | (nueva > ultima[equivocadas]), linea[equivocadas] - paso, nueva)
+        # Un lote de una sola línea no tiene vecina
+        linea[equivocadas] = np.where(ultima[equivocadas] > 1, nueva, linea[equivocadas])
+
+    # --- Duplicados: exactos (misma coordenada) y casi (a menos de 1 m) ---
+    n_exactos = int(n_palmas * frac_exactos)
+    origen_dup = rng.integers(0, max(n_base, 1), n_duplicados)
+    desvio = np.zeros(n_duplicados)
+    desvio[n_exactos:] = 1.0
+    lat_dup = lat[origen_dup] + desvio * rng.normal(0, ruido_gps_m / 2, n_duplicados) / METROS_POR_GRADO
+    lng_dup = lng[origen_dup] + desvio * rng.normal(0, ruido_gps_m / 2, n_duplicados) / METROS_POR_GRADO
+
+    lote = np.concatenate([lote, lote[origen_dup]])
+    linea = np.concatenate([linea, linea[origen_dup]])
+    palma = np.concatenate([palma, palma[origen_dup]])
+    lat = np.concatenate([lat, lat_dup])
+    lng = np.concatenate([lng, lng_dup])
+
+    # Los duplicados quedan intercalados cerca de su original, como en una exportación real
+    posicion = np.concatenate([np.arange(n_base), origen_dup + rng.uniform(0, 50, n_duplicados)])
+    orden = np.argsort(posicion, kind='stable')
+
+    nombres = np.array([f"{k + 1}-LOTE {k + 1}" for k in range(n_lotes)], dtype=object)
+    nombre_lote = pd.Series(nombres[lote[orden]])
+    linea_txt = pd.Series(linea[orden]).astype(str)
+    palma_txt = pd.Series(palma[orden]).astype(str)
+    lat_txt = pd.Series(np.round(lat[orden], 7)).map('{:.7f}'.format)
+    lng_txt = pd.Series(np.round(lng[orden], 7)).map('{:.7f}'.format)
+
+    if formato == 'antiguo':
+        return pd.DataFrame({
+            'Lote': nombre_lote, 'Linea': linea_txt, 'Palma': palma_txt,
+            'Longitud': lng_txt, 'Latitud': lat_txt,
+        })
+
+    return pd.DataFrame({
+        'nombre_spot': 'SPOT_' + nombre_lote + '_L' + linea_txt + '_P' + palma_txt,
+        'lat': lat_txt,
+        'lng': lng_txt,
+        'lote_id': nombre_lote,
+        'linea': linea_txt,
+        'posicion': palma_txt,
+        'nombre_planta': 'L' + nombre_lote + 'L' + linea_txt + 'P' + palma_txt,
+        'finca_id': finca_id,
+        'tipo_poligono_id': '1',
+        'distancia': '9',
+        'fecha_siembra': '2006-01-01',
+        'tipo_variedad_id': '5',
+    })
+
+
+def escribir_finca(df: pd.DataFrame, ruta: str):
+    """CSV con ';' para el formato antiguo (como Spots.csv) y ',' para el nuevo."""
+    sep = ';' if 'Latitud' in df.columns else ','
+    df.to_csv(ruta, index=False, sep=sep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('n_palmas', type=int)
+    parser.add_argument('salida')
+    parser.add_argument('--formato', choices=['antiguo', 'nuevo'], default='antiguo')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--lineas-equivocadas', type=float, default=0.0,
+                        help="Fracción de palmas anotadas en una línea vecina (por defecto 0).")
+    args = parser.parse_args()
+    escribir_finca(generar_finca(args.n_palmas, args.formato, args.semilla,
+                                 frac_lineas_equivocadas=args.lineas_equivocadas), args.salida)
+
+
+if __name__ == '__main__':
+    main()
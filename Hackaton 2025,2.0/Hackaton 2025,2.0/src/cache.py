@@ -0,0 +1,93 @@
+"""
+Caché en disco de resultados por lote, direccionada por contenido.
+
+Cada entrada es un `.npz` cuyo nombre es la huella (blake2b) de los datos de
+entrada y de los parámetros que afectan al resultado. Un lote que no cambió
+entre dos ejecuciones produce la misma huella y su resultado se reutiliza.
+El tamaño total se limita expulsando las entradas usadas hace más tiempo (LRU,
+según la fecha de modificación, que se actualiza en cada acierto).
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Cambiar si cambia el algoritmo de alguna etapa: invalida las entradas antiguas
+VERSION = 1
+
+MB = 1024 * 1024
+
+
+def huella(*arrays: np.ndarray, **parametros) -> str:
+    """Huella hexadecimal del contenido de `arrays` (valores, tipo y forma) y de `parametros`."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((VERSION, sorted(parametros.items()))).encode())
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update(f"{array.dtype.str}{array.shape}".encode())
+        h.update(array.data)
+    return h.hexdigest()
+
+
+class CacheResultados:
+    """Diccionario clave -> {nombre: ndarray} guardado en `directorio`, con tope de `max_mb`."""
+
+    def __init__(self, directorio: str, max_mb: float = 512):
+        self.directorio = directorio
+        self.max_bytes = int(max_mb * MB)
+        self.aciertos = 0
+        self.fallos = 0
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.npz")
+
+    def obtener(self, clave: str) -> dict[str, np.ndarray] | None:
+        ruta = self._ruta(clave)
+        try:
+            with np.load(ruta, allow_pickle=False) as datos:
+                resultado = {nombre: datos[nombre] for nombre in datos.files}
+            os.utime(ruta)
+        except FileNotFoundError:
+            self.fallos += 1
+            return None
+        except Exception:
+            # Entrada corrupta (p. ej. escritura interrumpida): se descarta y se recalcula
+            self.fallos += 1
+            self._borrar(ruta)
+            return None
+        self.aciertos += 1
+        return resultado
+
+    def guardar(self, clave: str, **arrays: np.ndarray):
+        # Escritura atómica: otro proceso nunca ve un .npz a medio escribir
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(temporal, self._ruta(clave))
+        except BaseException:
+            self._borrar(temporal)
+            raise
+
+    def recortar(self):
+        """Expulsa las entradas menos usadas hasta que el total quepa en `max_bytes`."""
+        entradas = []
+        for entrada in os.scandir(self.directorio):
+            if entrada.name.endswith('.npz'):
+                estado = entrada.stat()
+                entradas.append((estado.st_mtime, estado.st_size, entrada.path))
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            self._borrar(ruta)
+            total -= tamano
+
+    @staticmethod
+    def _borrar(ruta: str):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
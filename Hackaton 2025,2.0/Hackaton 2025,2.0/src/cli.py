@@ -0,0 +1,268 @@
+"""
+Línea de comandos sin interfaz gráfica para el motor de limpieza.
+
+Ejemplos:
+    python -m src.cli clean "exportes/*.csv" --finca-map fincas.csv --out-dir limpios --jobs 8
+    python -m src.cli upload "limpios/*_LIMPIAS.csv" --url https://.../api/v1 --token "Bearer ..."
+    python -m src.cli locate limpios/finca_LIMPIAS.csv lecturas_gps.csv --radio 5
+
+Cada archivo procesado produce una línea JSON en la salida estándar con sus
+estadísticas. El código de salida es 1 si algún archivo falló. Los archivos
+cuya salida coincidiría con la de otro (a/f.csv y b/f.csv, f.csv y f.xlsx) no
+se procesan y cuentan como fallidos. Un archivo con
+varias fincas produce además <salida>_<finca_id>.csv por finca y un resumen
+<salida>_FINCAS.csv (ver src.fincas).
+
+Cada comando importa solo lo que usa: `upload` no carga NumPy, pandas ni scikit-learn.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .constantes import MODOS_LINEAS, MOTORES
+from .lectura import opciones_lectura_csv
+
+
+def cargar_mapa_fincas(ruta: str) -> dict[str, str]:
+    """
+    Lee un CSV con columnas `archivo,finca_id`. `archivo` puede ser el nombre
+    del archivo (con o sin extensión).
+    """
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        muestra = f.read(2048)
+        f.seek(0)
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;')
+        mapa = {}
+        for fila in csv.DictReader(f, dialect=dialecto):
+            fila = {k.strip().lower(): (v or '').strip() for k, v in fila.items() if k}
+            if fila.get('archivo') and fila.get('finca_id'):
+                mapa[fila['archivo']] = fila['finca_id']
+    return mapa
+
+
+def buscar_finca_id(ruta: str, mapa: dict[str, str], por_defecto: str | None) -> str | None:
+    nombre = os.path.basename(ruta)
+    base, _ = os.path.splitext(nombre)
+    return mapa.get(nombre, mapa.get(base, por_defecto))
+
+
+def ruta_salida(ruta: str, out_dir: str) -> str:
+    base, _ = os.path.splitext(os.path.basename(ruta))
+    return os.path.join(out_dir, f"{base}_LIMPIAS.csv")
+
+
+def limpiar_archivo(ruta: str, salida: str, finca_id: str, opciones: dict) -> dict:
+    """Procesa un archivo y devuelve su resultado como dict serializable."""
+    resultado = {'archivo': ruta, 'salida': salida, 'finca_id': finca_id}
+    from .motor_limpieza import LimpiezaSpots
+
+    opciones = dict(opciones)
+    if opciones.pop('perfil', False):
+        opciones['perfil_json'] = os.path.splitext(salida)[0] + '.perfil.json'
+    try:
+        limpiador = LimpiezaSpots(**opciones)
+        # stdout queda reservado para las líneas JSON
+        with redirect_stdout(sys.stderr):
+            ok, reporte = limpiador.procesar_y_exportar(ruta, salida, finca_id)
+        resultado.update(ok=ok, stats=limpiador.stats)
+        if not ok:
+            resultado['error'] = reporte.strip()
+    except Exception as e:
+        resultado.update(ok=False, error=f"{type(e).__name__}: {e}")
+    return resultado
+
+
+def comando_clean(args) -> int:
+    archivos = sorted({ruta for patron in args.patrones for ruta in glob.glob(patron, recursive=True)})
+    if not archivos:
+        print(f"ERROR: Ningún archivo coincide con {args.patrones}", file=sys.stderr)
+        return 1
+
+    mapa = cargar_mapa_fincas(args.finca_map) if args.finca_map else {}
+    os.makedirs(args.out_dir, exist_ok=True)
+    opciones = {'umbral_metros': args.umbral, 'motor_espacial': args.motor, 'perfil': args.perfil,
+                'directorio_cache': args.cache, 'cache_max_mb': args.cache_max_mb,
+                'directorio_instantaneas': args.instantaneas, 'formato_columnar': args.columnar,
+                'convertir_xlsx': args.convertir_xlsx, 'validar_lineas': args.lineas,
+                'tolerancia_linea_m': args.tolerancia_linea}
+
+    fallos = 0
+
+    def emitir(resultado: dict):
+        nonlocal fallos
+        if not resultado['ok']:
+            fallos += 1
+        sys.stdout.write(json.dumps(resultado, ensure_ascii=False, default=str) + '\n')
+        sys.stdout.flush()
+
+    # Todas las salidas van a --out-dir con el nombre base: dos entradas pueden
+    # coincidir, y la segunda sobrescribiría a la primera
+    por_salida = {}
+    for ruta in archivos:
+        por_salida.setdefault(os.path.normcase(ruta_salida(ruta, args.out_dir)), []).append(ruta)
+
+    pendientes = []
+    for ruta in archivos:
+        salida = ruta_salida(ruta, args.out_dir)
+        coinciden = por_salida[os.path.normcase(salida)]
+        if len(coinciden) > 1:
+            otras = ', '.join(otra for otra in coinciden if otra != ruta)
+            emitir({'archivo': ruta, 'salida': salida, 'ok': False,
+                    'error': f"La salida coincide con la de {otras}: renombre los archivos o procéselos por separado"})
+            continue
+        finca_id = buscar_finca_id(ruta, mapa, args.finca_id)
+        if finca_id is None:
+            emitir({'archivo': ruta, 'ok': False, 'error': "Sin finca_id: añádalo a --finca-map o use --finca-id"})
+            continue
+        pendientes.append((ruta, salida, finca_id))
+
+    if args.jobs <= 1:
+        for ruta, salida, finca_id in pendientes:
+            emitir(limpiar_archivo(ruta, salida, finca_id, opciones))
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futuros = [pool.submit(limpiar_archivo, ruta, salida, finca_id, opciones)
+                       for ruta, salida, finca_id in pendientes]
+            for futuro in as_completed(futuros):
+                emitir(futuro.result())
+
+    return 1 if fallos else 0
+
+
+def comando_upload(args) -> int:
+    archivos = sorted({ruta for patron in args.patrones for ruta in glob.glob(patron, recursive=True)})
+    if not archivos:
+        print(f"ERROR: Ningún archivo coincide con {args.patrones}", file=sys.stderr)
+        return 1
+
+    from .subida import SubidaSpots
+    if args.instantaneas:
+        # delta usa pandas: solo se importa si hay que guardar instantáneas
+        from .delta import confirmar_subida
+        from .fincas import salidas_por_finca
+
+    # Los archivos van de uno en uno; las partes de cada archivo (con --por-partes), en paralelo
+    subida = SubidaSpots(args.url, args.token, workers=args.jobs, max_mb_parte=args.max_mb_parte,
+                         reintentos=args.reintentos, por_partes=args.por_partes, comprimir=args.comprimir,
+                         verificar_ssl=not args.inseguro)
+    fallos = 0
+    for ruta in archivos:
+        ok, mensaje = subida.subir(ruta)
+        if ok and args.instantaneas and not confirmar_subida(ruta, args.instantaneas):
+            # Archivo con varias fincas: las huellas están en la salida de cada finca
+            for salida in salidas_por_finca(ruta):
+                confirmar_subida(salida, args.instantaneas)
+        resultado = {'archivo': ruta, 'ok': ok, 'mensaje': mensaje, 'stats': subida.stats}
+        fallos += not ok
+        sys.stdout.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+    return 1 if fallos else 0
+
+
+def _columna(columnas, candidatas: tuple[str, ...]) -> str | None:
+    for columna in columnas:
+        if str(columna).strip().lower() in candidatas:
+            return columna
+    return None
+
+
+def comando_locate(args) -> int:
+    import numpy as np
+    import pandas as pd
+
+    from .indice import IndiceSpots
+
+    opciones = opciones_lectura_csv(args.lecturas)
+    lecturas = pd.read_csv(args.lecturas, sep=opciones['sep'], encoding=opciones['encoding'])
+    columna_lat = _columna(lecturas.columns, ('lat', 'latitud', 'latitude'))
+    columna_lng = _columna(lecturas.columns, ('lng', 'lon', 'longitud', 'longitude'))
+    if columna_lat is None or columna_lng is None:
+        print("ERROR: Las lecturas necesitan columnas de latitud y longitud (lat/lng)", file=sys.stderr)
+        return 1
+
+    indice = IndiceSpots.desde_archivo(args.spots)
+    lat = pd.to_numeric(lecturas[columna_lat], errors='coerce').to_numpy(dtype=float)
+    lng = pd.to_numeric(lecturas[columna_lng], errors='coerce').to_numpy(dtype=float)
+    posiciones, distancias = indice.buscar(lat, lng, radio_m=args.radio)
+
+    encontradas = posiciones >= 0
+    nombres = indice.spots['nombre_spot'].astype(object).to_numpy()
+    lecturas['nombre_spot'] = np.where(encontradas, nombres[np.maximum(posiciones, 0)], '')
+    lecturas['distancia_m'] = np.where(encontradas, distancias.round(2), np.nan)
+    salida = args.salida or f"{os.path.splitext(args.lecturas)[0]}_SPOTS.csv"
+    lecturas.to_csv(salida, index=False, lineterminator='\r\n')
+
+    resultado = {'lecturas': len(lecturas), 'asignadas': int(encontradas.sum()), 'salida': salida}
+    sys.stdout.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+    return 0
+
+
+def construir_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description="PalmClean sin interfaz gráfica.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    clean = subparsers.add_parser('clean', help="Limpia uno o varios archivos de spots (.csv/.xlsx/.parquet/.feather/.npz).")
+    clean.add_argument('patrones', nargs='+', help="Archivos o patrones glob (entre comillas).")
+    clean.add_argument('--finca-map', help="CSV con columnas archivo,finca_id.")
+    clean.add_argument('--finca-id', help="finca_id para los archivos que no estén en --finca-map.")
+    clean.add_argument('--out-dir', default='.', help="Carpeta de salida (por defecto la actual).")
+    clean.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Archivos en paralelo.")
+    clean.add_argument('--umbral', type=float, default=1.0, help="umbral_metros para duplicados espaciales.")
+    clean.add_argument('--motor', choices=MOTORES, default='dbscan',
+                       help="Motor de duplicados espaciales.")
+    clean.add_argument('--perfil', action='store_true',
+                       help="Guarda <salida>.perfil.json con tiempos y memoria por etapa.")
+    clean.add_argument('--cache', metavar='DIR',
+                       help="Caché por lote: al repetir un archivo solo se recalculan los lotes que cambiaron.")
+    clean.add_argument('--cache-max-mb', type=float, default=512, help="Tamaño máximo de la caché.")
+    clean.add_argument('--instantaneas', metavar='DIR',
+                       help="Escribe además <salida>_DELTA.csv con los cambios desde la última subida de la finca.")
+    clean.add_argument('--columnar', choices=('auto', 'parquet', 'feather', 'npz'),
+                       help="Guarda además una copia columnar de la salida (parquet/feather necesitan pyarrow), "
+                            "que también se acepta como entrada.")
+    clean.add_argument('--convertir-xlsx', action='store_true',
+                       help="Convierte cada .xlsx una vez a <libro>.xlsx.npz (o .parquet) y reutiliza esa copia "
+                            "mientras el libro no cambie.")
+    clean.add_argument('--lineas', choices=MODOS_LINEAS,
+                       help="Revisa que cada palma esté sobre el eje de su línea y escribe <salida>_LINEAS.csv; "
+                            "'reasignar' además la pasa a la línea vecina si le queda más cerca.")
+    clean.add_argument('--tolerancia-linea', type=float, default=3.0,
+                       help="Distancia máxima (m) al eje de la línea antes de marcar una palma.")
+    clean.set_defaults(funcion=comando_clean)
+
+    upload = subparsers.add_parser('upload', help="Sube archivos limpios a la API, con reintentos.")
+    upload.add_argument('patrones', nargs='+', help="Archivos o patrones glob (entre comillas).")
+    upload.add_argument('--url', required=True, help="URL de subida de la API.")
+    upload.add_argument('--token', required=True, help="Valor completo de la cabecera Authorization.")
+    upload.add_argument('--por-partes', action='store_true',
+                        help="Divide cada archivo en partes reanudables (solo si el endpoint acepta partes).")
+    upload.add_argument('--comprimir', action='store_true', help="Con --por-partes, envía cada parte con gzip.")
+    upload.add_argument('--jobs', type=int, default=4, help="Partes subidas en paralelo.")
+    upload.add_argument('--max-mb-parte', type=float, default=4, help="Tamaño máximo de cada parte sin comprimir.")
+    upload.add_argument('--reintentos', type=int, default=5, help="Reintentos por petición ante errores transitorios.")
+    upload.add_argument('--inseguro', action='store_true', help="No verificar el certificado SSL.")
+    upload.add_argument('--instantaneas', metavar='DIR',
+                        help="Guarda cada subida correcta como base del próximo delta (mismo DIR que en clean).")
+    upload.set_defaults(funcion=comando_upload)
+
+    locate = subparsers.add_parser('locate', help="Asigna a cada lectura GPS el spot más cercano de una finca limpia.")
+    locate.add_argument('spots', help="Salida limpia de la finca (CSV o copia columnar).")
+    locate.add_argument('lecturas', help="CSV con columnas de latitud y longitud.")
+    locate.add_argument('--radio', type=float, help="Distancia máxima en metros; más lejos queda sin spot.")
+    locate.add_argument('--salida', help="CSV de salida (por defecto <lecturas>_SPOTS.csv).")
+    locate.set_defaults(funcion=comando_locate)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = construir_parser().parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Salida columnar opcional, que también se puede volver a usar como entrada.
+
+Evita que las ejecuciones encadenadas y los análisis vuelvan a interpretar texto:
+las coordenadas y los números se guardan con su tipo. Con pyarrow instalado se
+usan Parquet (.parquet) o Feather (.feather); sin él, un archivo NumPy sin
+comprimir (.npz) con un array por columna:
+
+- columnas numéricas: el array tal cual (más una máscara de nulos si eran Int32/Int64);
+- columnas de texto o categóricas: códigos int32 y las categorías en UTF-8
+  separadas por '\\0' (sin pickle).
+
+Como el .npz no está comprimido, `leer_columnar` proyecta sus arrays en memoria
+(np.memmap) en lugar de copiarlos.
+"""
+import importlib.util
+import json
+import os
+import struct
+import zipfile
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_extension_array_dtype, is_numeric_dtype
+
+# pyarrow es opcional y lo importa pandas al usarlo; aquí basta saber si está
+HAY_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+FORMATOS = {'parquet': '.parquet', 'feather': '.feather', 'npz': '.npz'}
+EXTENSIONES = tuple(FORMATOS.values())
+SEPARADOR_CATEGORIAS = '\0'
+
+
+def resolver_formato(formato: str) -> str:
+    """'auto' elige Parquet si pyarrow está instalado y .npz si no."""
+    if formato == 'auto':
+        return 'parquet' if HAY_PYARROW else 'npz'
+    if formato not in FORMATOS:
+        raise ValueError(f"formato columnar debe ser 'auto' o uno de {tuple(FORMATOS)}, no '{formato}'")
+    if formato != 'npz' and not HAY_PYARROW:
+        raise ValueError(f"El formato '{formato}' necesita pyarrow (pip install pyarrow); use 'npz'")
+    return formato
+
+
+def ruta_columnar(ruta_salida: str, formato: str) -> str:
+    """Ruta junto al CSV de salida, con la extensión del formato."""
+    return os.path.splitext(ruta_salida)[0] + FORMATOS[formato]
+
+
+def escribir_columnar(df: pd.DataFrame, ruta: str):
+    """
+    Guarda `df` según la extensión de `ruta`. Las columnas con nombre repetido
+    conservan solo la primera, igual que al leer el CSV de salida con pandas.
+    """
+    df = df.loc[:, ~df.columns.duplicated()].reset_index(drop=True)
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == FORMATOS['parquet']:
+        df.to_parquet(ruta, index=False)
+    elif extension == FORMATOS['feather']:
+        df.to_feather(ruta)
+    elif extension == FORMATOS['npz']:
+        _guardar_npz(df, ruta)
+    else:
+        raise ValueError(f"Extensión columnar no soportada: {extension}")
+
+
+def leer_columnar(ruta: str) -> pd.DataFrame:
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == FORMATOS['parquet']:
+        return pd.read_parquet(ruta)
+    if extension == FORMATOS['feather']:
+        return pd.read_feather(ruta)
+    if extension == FORMATOS['npz']:
+        return _leer_npz(ruta)
+    raise ValueError(f"Extensión columnar no soportada: {extension}")
+
+
+def _guardar_npz(df: pd.DataFrame, ruta: str):
+    arrays = {}
+    columnas = []
+    for i, nombre in enumerate(df.columns):
+        serie = df.iloc[:, i]
+        clave = f"c{i}"
+        if is_numeric_dtype(serie.dtype) and not isinstance(serie.dtype, pd.CategoricalDtype):
+            if is_extension_array_dtype(serie.dtype):
+                # Int32 / Int64 / Float64 / boolean con nulos: valores + máscara
+                numpy_dtype = bool if is_bool_dtype(serie.dtype) else serie.dtype.numpy_dtype
+                arrays[clave] = serie.to_numpy(dtype=numpy_dtype, na_value=0)
+                arrays[f"{clave}_nulos"] = serie.isna().to_numpy()
+                columnas.append({'nombre': str(nombre), 'tipo': 'nulable', 'dtype': str(serie.dtype)})
+            else:
+                arrays[clave] = serie.to_numpy()
+                columnas.append({'nombre': str(nombre), 'tipo': 'numero'})
+        else:
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                codigos, categorias = serie.cat.codes.to_numpy(), serie.cat.categories
+            else:
+                codigos, categorias = pd.factorize(serie)
+            texto = SEPARADOR_CATEGORIAS.join(map(str, categorias)).encode('utf-8')
+            arrays[clave] = codigos.astype(np.int32)
+            arrays[f"{clave}_categorias"] = np.frombuffer(texto, dtype=np.uint8)
+            columnas.append({'nombre': str(nombre), 'tipo': 'texto', 'n_categorias': len(categorias)})
+
+    meta = json.dumps({'filas': len(df), 'columnas': columnas}).encode('utf-8')
+    arrays['meta'] = np.frombuffer(meta, dtype=np.uint8)
+    with open(ruta, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def _proyectar_npz(ruta: str) -> dict[str, np.ndarray]:
+    """
+    Arrays de un .npz sin comprimir como np.memmap de solo lectura: cada miembro
+    del zip es un .npy guardado tal cual, así que basta con saltar sus cabeceras.
+    """
+    arrays = {}
+    with zipfile.ZipFile(ruta) as archivo, open(ruta, 'rb') as f:
+        for info in archivo.infolist():
+            if info.compress_type != zipfile.ZIP_STORED or not info.filename.endswith('.npy'):
+                raise ValueError(f"{info.filename} está comprimido")
+            # Cabecera local del zip: 30 bytes + nombre + campo extra
+            f.seek(info.header_offset + 26)
+            largo_nombre, largo_extra = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + largo_nombre + largo_extra)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                forma, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                forma, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            nombre = info.filename[:-len('.npy')]
+            if 0 in forma:
+                arrays[nombre] = np.empty(forma, dtype=dtype)
+            else:
+                arrays[nombre] = np.memmap(ruta, dtype=dtype, mode='r', offset=f.tell(), shape=forma,
+                                           order='F' if fortran else 'C')
+    return arrays
+
+
+def _leer_npz(ruta: str) -> pd.DataFrame:
+    try:
+        arrays = _proyectar_npz(ruta)
+    except ValueError:
+        # .npz comprimido (p. ej. escrito a mano con savez_compressed): se lee completo
+        with np.load(ruta, allow_pickle=False) as datos:
+            arrays = {nombre: datos[nombre] for nombre in datos.files}
+
+    meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+    datos = {}
+    for i, columna in enumerate(meta['columnas']):
+        clave = f"c{i}"
+        valores = arrays[clave]
+        if columna['tipo'] == 'numero':
+            datos[columna['nombre']] = pd.Series(np.asarray(valores))
+        elif columna['tipo'] == 'nulable':
+            nulos = np.asarray(arrays[f"{clave}_nulos"])
+            datos[columna['nombre']] = pd.Series(pd.array(np.asarray(valores), dtype=columna['dtype'])).mask(nulos)
+        else:
+            texto = arrays[f"{clave}_categorias"].tobytes().decode('utf-8')
+            categorias = texto.split(SEPARADOR_CATEGORIAS) if columna['n_categorias'] else []
+            datos[columna['nombre']] = pd.Series(pd.Categorical.from_codes(np.asarray(valores), categories=categorias))
+    # copy=False: las columnas numéricas siguen proyectadas sobre el archivo
+    return pd.DataFrame(datos, index=pd.RangeIndex(meta['filas']), copy=False)
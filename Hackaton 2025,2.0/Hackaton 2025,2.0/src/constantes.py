@@ -0,0 +1,10 @@
+"""
+Opciones válidas del motor, sin dependencias: la línea de comandos las usa en
+sus `choices` sin importar NumPy.
+"""
+
+# Motores de duplicados espaciales de LimpiezaSpots(motor_espacial=...)
+MOTORES = ('dbscan', 'grid')
+
+# Modos de LimpiezaSpots(validar_lineas=...)
+MODOS_LINEAS = ('marcar', 'reasignar')
@@ -0,0 +1,125 @@
+"""
+Exportación delta: qué spots cambiaron desde la última subida correcta.
+
+Al exportar se guarda, junto al CSV limpio, un archivo de huellas (una por fila,
+con `nombre_spot` como clave) pendiente de confirmar. Cuando la subida termina
+bien, `confirmar_subida` lo convierte en la instantánea de esa finca. La próxima
+exportación de la misma finca se compara con la instantánea y escribe
+<salida>_DELTA.csv con una columna 'cambio' (agregado / modificado / eliminado);
+de los eliminados solo se envía `nombre_spot`.
+"""
+import csv
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+COLUMNA_CAMBIO = 'cambio'
+SUFIJO_DELTA = '_DELTA'
+SEPARADOR_NOMBRES = '\0'
+
+
+def ruta_delta(ruta_salida: str) -> str:
+    base, extension = os.path.splitext(ruta_salida)
+    return f"{base}{SUFIJO_DELTA}{extension}"
+
+
+def ruta_huellas(ruta_salida: str) -> str:
+    return ruta_salida + '.huellas.npz'
+
+
+def ruta_instantanea(directorio: str, finca_id: str) -> str:
+    nombre = re.sub(r'[^\w.-]', '_', finca_id)
+    return os.path.join(directorio, f"finca_{nombre}.npz")
+
+
+def _claves(nombres: pd.Series) -> pd.Index:
+    """`nombre_spot` como clave; los repetidos se distinguen por su número de aparición."""
+    repeticion = nombres.groupby(nombres, sort=False).cumcount()
+    return pd.Index(nombres.where(repeticion == 0, nombres + '#' + repeticion.astype(str)))
+
+
+def _leer_salida(ruta_salida: str) -> tuple[list[str], pd.DataFrame]:
+    """Cabecera original y filas del CSV exportado, como texto exacto."""
+    with open(ruta_salida, newline='', encoding='utf-8') as f:
+        cabecera = next(csv.reader(f), [])
+    # Como texto y sin NaN: la huella depende solo de lo que se envía a la API
+    df = pd.read_csv(ruta_salida, dtype=str, keep_default_na=False)
+    return cabecera, df
+
+
+def _guardar_huellas(ruta: str, nombres: pd.Series, huellas: np.ndarray, finca_id: str):
+    nombres_utf8 = SEPARADOR_NOMBRES.join(nombres).encode('utf-8')
+    with open(ruta, 'wb') as f:
+        np.savez(f, nombres=np.frombuffer(nombres_utf8, dtype=np.uint8), huellas=huellas,
+                 finca_id=np.array(finca_id))
+
+
+def _cargar_huellas(ruta: str) -> tuple[pd.Series, np.ndarray, str]:
+    with np.load(ruta, allow_pickle=False) as datos:
+        texto = datos['nombres'].tobytes().decode('utf-8')
+        huellas = datos['huellas']
+        finca_id = str(datos['finca_id'])
+    nombres = pd.Series(texto.split(SEPARADOR_NOMBRES) if len(huellas) else [], dtype=object)
+    return nombres, huellas, finca_id
+
+
+def exportar_delta(ruta_salida: str, directorio_instantaneas: str) -> dict | None:
+    """
+    Guarda las huellas de `ruta_salida` y, si existe una instantánea de la misma
+    finca, escribe el delta. Devuelve los conteos del delta, o None si no había
+    instantánea (la primera subida tiene que ser completa).
+    """
+    cabecera, df = _leer_salida(ruta_salida)
+    nombres = df['nombre_spot']
+    huellas = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    finca_id = str(df['finca_id'].iloc[0]) if len(df) else ''
+    _guardar_huellas(ruta_huellas(ruta_salida), nombres, huellas, finca_id)
+
+    instantanea = ruta_instantanea(directorio_instantaneas, finca_id)
+    if not os.path.exists(instantanea):
+        # Un delta de otra finca o de una subida anterior ya no sirve
+        if os.path.exists(ruta_delta(ruta_salida)):
+            os.remove(ruta_delta(ruta_salida))
+        return None
+
+    nombres_previos, huellas_previas, _ = _cargar_huellas(instantanea)
+    claves = _claves(nombres)
+    claves_previas = _claves(nombres_previos)
+
+    posicion_previa = claves_previas.get_indexer(claves)
+    agregados = posicion_previa < 0
+    modificados = ~agregados & (huellas_previas[np.maximum(posicion_previa, 0)] != huellas)
+    eliminados = claves.get_indexer(claves_previas) < 0
+
+    cambios = df[agregados | modificados]
+    cambios.insert(0, COLUMNA_CAMBIO, np.where(agregados[agregados | modificados], 'agregado', 'modificado'))
+    bajas = pd.DataFrame({COLUMNA_CAMBIO: 'eliminado', 'nombre_spot': nombres_previos[eliminados].to_numpy()})
+    delta = pd.concat([cambios, bajas], ignore_index=True).reindex(columns=cambios.columns, fill_value='')
+    delta.to_csv(ruta_delta(ruta_salida), index=False, header=[COLUMNA_CAMBIO] + cabecera,
+                 sep=',', lineterminator='\r\n')
+
+    return {
+        'agregados': int(agregados.sum()),
+        'modificados': int(modificados.sum()),
+        'eliminados': int(eliminados.sum()),
+        'sin_cambios': int(len(df) - agregados.sum() - modificados.sum()),
+    }
+
+
+def confirmar_subida(ruta_subida: str, directorio_instantaneas: str) -> bool:
+    """
+    Tras una subida correcta (del CSV completo o de su delta), sus huellas pasan a
+    ser la instantánea de la finca. Devuelve False si no había huellas pendientes.
+    """
+    base, extension = os.path.splitext(ruta_subida)
+    if base.endswith(SUFIJO_DELTA):
+        ruta_subida = base[:-len(SUFIJO_DELTA)] + extension
+    pendientes = ruta_huellas(ruta_subida)
+    if not os.path.exists(pendientes):
+        return False
+    _, _, finca_id = _cargar_huellas(pendientes)
+    os.makedirs(directorio_instantaneas, exist_ok=True)
+    os.replace(pendientes, ruta_instantanea(directorio_instantaneas, finca_id))
+    return True
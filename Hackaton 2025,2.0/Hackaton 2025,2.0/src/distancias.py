@@ -0,0 +1,183 @@
+"""
+Núcleo de distancias entre puntos de una finca.
+
+Las coordenadas se pasan a radianes una sola vez por finca (`Coordenadas`, con
+cos(lat) ya calculado) y las distancias entre pares de índices se evalúan por
+tramos de `TAMANO_TRAMO` con búferes reutilizados (`out=`), en lugar de crear
+una decena de arrays temporales del tamaño de todos los pares.
+
+- `haversine`: distancia exacta. En float64 da bit a bit el mismo resultado que
+  `haversine_m`, así que el orden de la secuencia y los duplicados no cambian.
+- `equirectangular`: aproximación plana, sin senos ni arcoseno, para distancias
+  cortas. Hasta 1 km y latitudes de ±70° el error relativo frente a la
+  haversine es menor que 1e-4 (0,1 mm por metro); en las latitudes de las
+  fincas (±15°) menor que 1e-5.
+- Con `Coordenadas(..., dtype=np.float32)` se trabaja en float32 sobre
+  coordenadas relativas a un origen común (la finca), lo que conserva unos
+  milímetros de resolución: hasta 1 km el error de la haversine frente a
+  float64 es menor que 1 mm. Los búferes ocupan la mitad.
+"""
+import numpy as np
+
+RADIO_TIERRA_M = 6371000
+
+# 32768 elementos: cuatro búferes float64 caben en la caché L2 (1 MB)
+TAMANO_TRAMO = 32768
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """
+    Calcula la distancia en metros entre arrays de coordenadas. Crea un array
+    temporal por operación: es la referencia de `haversine`, que es lo que usa el motor.
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(a))
+    return c * RADIO_TIERRA_M
+
+
+class Coordenadas:
+    """
+    Latitudes y longitudes en radianes y cos(lat), calculados una vez.
+
+    En float64 los radianes son absolutos. En float32 se guardan relativos a
+    `origen` (lat, lng en grados; por defecto la media de los puntos): dos
+    conjuntos que se comparen entre sí deben compartir el mismo origen.
+    """
+
+    def __init__(self, lat, lng, dtype=np.float64, origen: tuple[float, float] | None = None):
+        self.dtype = np.dtype(dtype)
+        lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+        lng_rad = np.radians(np.asarray(lng, dtype=np.float64))
+        self.cos_lat = np.cos(lat_rad).astype(self.dtype, copy=False)
+        if self.dtype == np.float64:
+            self.origen = None
+        else:
+            if origen is None:
+                origen = (float(np.degrees(lat_rad.mean())), float(np.degrees(lng_rad.mean()))) if len(lat_rad) else (0.0, 0.0)
+            self.origen = origen
+            lat_rad = (lat_rad - np.radians(origen[0])).astype(self.dtype)
+            lng_rad = (lng_rad - np.radians(origen[1])).astype(self.dtype)
+        self.lat = lat_rad
+        self.lng = lng_rad
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+
+def _comprobar(origen: Coordenadas, i, destino: Coordenadas, j) -> int:
+    if origen.dtype != destino.dtype or origen.origen != destino.origen:
+        raise ValueError("Las coordenadas deben tener el mismo dtype y el mismo origen")
+    n_i = len(origen) if i is None else len(i)
+    n_j = len(destino) if j is None else len(j)
+    if n_i != n_j:
+        raise ValueError("Los índices de origen y destino deben tener el mismo tamaño")
+    return n_i
+
+
+def _tomar(valores: np.ndarray, indices, inicio: int, fin: int, out: np.ndarray) -> np.ndarray:
+    """Copia al búfer los valores del tramo (todos en orden si `indices` es None)."""
+    if indices is None:
+        out[:] = valores[inicio:fin]
+    else:
+        np.take(valores, indices[inicio:fin], out=out, mode='clip')
+    return out
+
+
+def _preparar_salida(origen: Coordenadas, i, destino: Coordenadas, j, out: np.ndarray | None) -> np.ndarray:
+    n = _comprobar(origen, i, destino, j)
+    if out is None:
+        return np.empty(n, dtype=origen.dtype)
+    if out.shape != (n,) or out.dtype != origen.dtype or not out.flags.c_contiguous:
+        raise ValueError(f"out debe ser un array contiguo de forma ({n},) y dtype {origen.dtype}")
+    return out
+
+
+def _tramos(out: np.ndarray, tramo: int):
+    """Recorre `out` por tramos: (inicio, fin, salida del tramo, tres búferes reutilizados)."""
+    n = len(out)
+    largo = max(1, min(tramo, n))
+    bufferes = [np.empty(largo, dtype=out.dtype) for _ in range(3)]
+    for inicio in range(0, n, largo):
+        fin = min(inicio + largo, n)
+        m = fin - inicio
+        yield inicio, fin, out[inicio:fin], [b[:m] for b in bufferes]
+
+
+def haversine(origen: Coordenadas, i, destino: Coordenadas, j, out: np.ndarray | None = None,
+              radio: float | None = RADIO_TIERRA_M, tramo: int = TAMANO_TRAMO) -> np.ndarray:
+    """
+    Distancia haversine del punto origen[i[k]] al destino[j[k]] para cada k
+    (`i`/`j` None: todos los puntos en orden). En metros, o el ángulo central en
+    radianes con `radio=None`. `out` (contiguo, del dtype de las coordenadas)
+    recibe el resultado si se pasa.
+    """
+    out = _preparar_salida(origen, i, destino, j, out)
+    for inicio, fin, salida, (a, b, c) in _tramos(out, tramo):
+        # sin²(dlat/2)
+        _tomar(destino.lat, j, inicio, fin, a)
+        np.subtract(a, _tomar(origen.lat, i, inicio, fin, b), out=a)
+        np.divide(a, 2, out=a)
+        np.sin(a, out=a)
+        np.square(a, out=a)
+        # cos(lat1)·cos(lat2)·sin²(dlng/2); la salida del tramo sirve de cuarto búfer
+        np.multiply(_tomar(origen.cos_lat, i, inicio, fin, b), _tomar(destino.cos_lat, j, inicio, fin, c), out=b)
+        _tomar(destino.lng, j, inicio, fin, c)
+        np.subtract(c, _tomar(origen.lng, i, inicio, fin, salida), out=c)
+        np.divide(c, 2, out=c)
+        np.sin(c, out=c)
+        np.square(c, out=c)
+        np.multiply(b, c, out=b)
+        # 2·asin(√a)·R, en el mismo orden de operaciones que haversine_m
+        np.add(a, b, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        np.multiply(a, 2, out=a)
+        if radio is None:
+            salida[:] = a
+        else:
+            np.multiply(a, radio, out=salida)
+    return out
+
+
+def equirectangular(origen: Coordenadas, i, destino: Coordenadas, j, out: np.ndarray | None = None,
+                    radio: float | None = RADIO_TIERRA_M, tramo: int = TAMANO_TRAMO) -> np.ndarray:
+    """
+    Como `haversine`, con la aproximación plana √(dlat² + (cos(lat1)·dlng)²):
+    solo restas, productos y una raíz. Para distancias de menos de 1 km (ver
+    el error acotado en el docstring del módulo).
+    """
+    out = _preparar_salida(origen, i, destino, j, out)
+    for inicio, fin, salida, (a, b, c) in _tramos(out, tramo):
+        _tomar(destino.lat, j, inicio, fin, a)
+        np.subtract(a, _tomar(origen.lat, i, inicio, fin, b), out=a)
+        np.square(a, out=a)
+        _tomar(destino.lng, j, inicio, fin, b)
+        np.subtract(b, _tomar(origen.lng, i, inicio, fin, c), out=b)
+        np.multiply(b, _tomar(origen.cos_lat, i, inicio, fin, c), out=b)
+        np.square(b, out=b)
+        np.add(a, b, out=a)
+        if radio is None:
+            np.sqrt(a, out=salida)
+        else:
+            np.sqrt(a, out=a)
+            np.multiply(a, radio, out=salida)
+    return out
+
+
+def plano_local(lat, lng) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (x, y) en metros en un plano equirectangular centrado en la media de los
+    puntos. A la escala de una finca (unos km) la escala varía menos de 1e-4.
+    """
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    lng_rad = np.radians(np.asarray(lng, dtype=np.float64))
+    if not len(lat_rad):
+        return lat_rad, lng_rad
+    lat0, lng0 = lat_rad.mean(), lng_rad.mean()
+    return (lng_rad - lng0) * (np.cos(lat0) * RADIO_TIERRA_M), (lat_rad - lat0) * RADIO_TIERRA_M
+
+
+METODOS = {'haversine': haversine, 'equirectangular': equirectangular}
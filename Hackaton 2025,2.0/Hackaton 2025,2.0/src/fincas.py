@@ -0,0 +1,182 @@
+"""
+Archivos con varias fincas (exportaciones consolidadas con varios finca_id).
+
+El archivo se lee y normaliza una sola vez; las filas se reparten por finca_id
+con un solo groupby y cada finca se limpia por separado, como si llegara en su
+propio archivo (con `workers` > 1, varias fincas a la vez en procesos):
+
+- <salida>_<finca_id>.csv por finca, con su delta, copia columnar o informe de
+  líneas si están activados;
+- <salida> con todas las fincas una tras otra (se copian los bytes de cada una);
+- <salida>_FINCAS.csv con las estadísticas de cada finca.
+"""
+import copy
+import csv
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+SUFIJO_RESUMEN = '_FINCAS'
+CONTADORES = ('original', 'eliminados_exactos', 'eliminados_espaciales', 'corregidos_secuencia', 'final')
+CONTADORES_LINEAS = ('revisadas', 'sospechosas', 'reasignables', 'reasignadas')
+
+
+def ruta_finca(ruta_salida: str, finca_id) -> str:
+    base, extension = os.path.splitext(ruta_salida)
+    nombre = re.sub(r'[^\w.-]', '_', str(finca_id))
+    return f"{base}_{nombre}{extension}"
+
+
+def ruta_resumen(ruta_salida: str) -> str:
+    base, extension = os.path.splitext(ruta_salida)
+    return f"{base}{SUFIJO_RESUMEN}{extension}"
+
+
+def salidas_por_finca(ruta_salida: str) -> list[str]:
+    """
+    Salidas de las fincas limpiadas sin error según el resumen de `ruta_salida`
+    (vacío si no existe: el archivo tenía una sola finca).
+    """
+    resumen = ruta_resumen(ruta_salida)
+    if not os.path.exists(resumen):
+        return []
+    directorio = os.path.dirname(ruta_salida)
+    with open(resumen, newline='', encoding='utf-8') as f:
+        return [os.path.join(directorio, fila['salida']) for fila in csv.DictReader(f) if fila['ok'] == 'True']
+
+
+def _particion(df: pd.DataFrame, indices: np.ndarray) -> pd.DataFrame:
+    """
+    Filas de una finca. Linea/Palma leídas como texto quedan decimales si otra
+    finca tenía vacíos; se vuelven a entero si en esta finca no los hay, como al
+    leer la finca sola.
+    """
+    finca = df.iloc[indices].reset_index(drop=True)
+    for columna in ('Linea', 'Palma'):
+        if finca[columna].dtype.kind == 'f' and finca[columna].notna().all():
+            finca[columna] = pd.to_numeric(finca[columna], downcast='integer')
+    return finca
+
+
+class _ProgresoFinca:
+    """Lleva el progreso de una finca (0-100) a su tramo [inicio, fin] del progreso del archivo."""
+
+    def __init__(self, callback, inicio: float, fin: float, finca):
+        self.callback = callback
+        self.inicio = inicio
+        self.fin = fin
+        self.finca = finca
+
+    def __call__(self, progreso: int, mensaje: str):
+        self.callback(int(self.inicio + (self.fin - self.inicio) * progreso / 100), f"Finca {self.finca}: {mensaje}")
+
+
+def _limpiar_finca(limpiador, df: pd.DataFrame, ruta_salida: str) -> tuple[bool, str, dict]:
+    limpiador._reiniciar_stats()
+    limpiador.stats['original'] = len(df)
+    ok, mensaje = limpiador._limpiar_y_exportar(df, ruta_salida)
+    return ok, mensaje, limpiador.stats
+
+
+def _unir_salidas(rutas: list[str], ruta_salida: str):
+    """Concatena los CSV de las fincas con una sola cabecera, sin volver a formatear."""
+    with open(ruta_salida, 'wb') as destino:
+        for numero, ruta in enumerate(rutas):
+            with open(ruta, 'rb') as origen:
+                cabecera = origen.readline()
+                if numero == 0:
+                    destino.write(cabecera)
+                shutil.copyfileobj(origen, destino)
+
+
+def _copia_con_progreso(copia, callback, finca, numero: int, total: int):
+    """
+    Copia para la finca `numero` (desde 0) de `total` cuyo progreso 0-100 va a
+    `callback` dentro de su tramo de las etapas 2 a 5 de 6, como el aviso del bucle.
+    """
+    if callback is None:
+        return copia
+    finca_copia = copy.copy(copia)
+    finca_copia._cancelado = copia._cancelado
+    inicio, fin = (2 + 3 * numero / total) / 6 * 100, (2 + 3 * (numero + 1) / total) / 6 * 100
+    finca_copia.update_callback = _ProgresoFinca(callback, inicio, fin, finca)
+    return finca_copia
+
+
+def procesar_fincas(limpiador, df: pd.DataFrame, output_file_path: str) -> tuple[bool, str]:
+    """
+    Limpia cada finca de `df` (ya normalizado) con una copia de `limpiador`.
+    Deja en `limpiador.stats` la suma de los contadores, 'fincas' (stats de cada
+    una) y 'resumen_fincas'; 'original' sigue siendo el total leído. Devuelve
+    (éxito, reporte o error).
+    """
+    particiones = df.groupby('finca_id', dropna=False, sort=True, observed=True).indices
+    fincas = list(particiones)
+    limpiador._report_progress(2, 6, f"Archivo con {len(fincas)} fincas: limpiando cada una por separado...")
+
+    # Copia sin perfil propio. En procesos va sin callback (no se puede enviar a
+    # otro proceso); en un solo proceso comparte el aviso de cancelación y cada
+    # finca informa su progreso dentro de su tramo, para que la barra no retroceda
+    copia = copy.copy(limpiador)
+    copia.perfil_json = copia.perfil_cprofile = None
+    copia.update_callback = None
+    en_paralelo = limpiador.workers > 1 and len(fincas) > 1
+    if en_paralelo:
+        copia.workers = 1
+        copias = repeat(copia)
+    else:
+        copia._cancelado = limpiador._cancelado
+        copias = (_copia_con_progreso(copia, limpiador.update_callback, finca, numero, len(fincas))
+                  for numero, finca in enumerate(fincas))
+
+    rutas = [ruta_finca(output_file_path, finca) for finca in fincas]
+    # Cada finca se separa cuando se necesita (en un solo proceso, de una en una)
+    por_finca = (_particion(df, particiones[finca]) for finca in fincas)
+    resultados = []
+    with (ProcessPoolExecutor(max_workers=min(limpiador.workers, len(fincas))) if en_paralelo else nullcontext()) as pool:
+        mapear = pool.map if pool else map
+        try:
+            for numero, resultado in enumerate(mapear(_limpiar_finca, copias, por_finca, rutas), 1):
+                resultados.append(resultado)
+                limpiador._report_progress(2 + 3 * numero / len(fincas), 6, f"Finca {numero}/{len(fincas)} limpia...")
+        except BaseException:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    limpiador.stats['fincas'] = {}
+    filas_resumen = []
+    for finca, ruta, (ok, mensaje, stats) in zip(fincas, rutas, resultados):
+        clave = str(finca)
+        limpiador.stats['fincas'][clave] = {'salida': ruta, 'ok': ok, **stats}
+        if ok:
+            for contador in CONTADORES[1:]:
+                limpiador.stats[contador] += stats[contador]
+            if 'lineas' in stats:
+                lineas = limpiador.stats.setdefault('lineas', dict.fromkeys(CONTADORES_LINEAS, 0))
+                for contador in CONTADORES_LINEAS:
+                    lineas[contador] += stats['lineas'][contador]
+        filas_resumen.append({'finca_id': clave, 'salida': os.path.basename(ruta), 'ok': ok,
+                              **{contador: stats.get(contador, 0) for contador in CONTADORES},
+                              'error': '' if ok else mensaje.strip()})
+
+    limpiador._report_progress(5.5, 6, "5/5: Uniendo las salidas y el resumen de fincas...")
+    resumen = ruta_resumen(output_file_path)
+    pd.DataFrame(filas_resumen).to_csv(resumen, index=False, sep=',', lineterminator='\r\n')
+    limpiador.stats['resumen_fincas'] = resumen
+    correctas = [ruta for ruta, (ok, _, _) in zip(rutas, resultados) if ok]
+    if correctas:
+        _unir_salidas(correctas, output_file_path)
+
+    fallidas = [fila['finca_id'] for fila in filas_resumen if not fila['ok']]
+    if fallidas:
+        limpiador._report_progress(100, 100, f"ERROR: Fallaron las fincas {fallidas}.")
+        return False, f"Fallaron las fincas {fallidas}; ver {os.path.basename(resumen)}."
+    limpiador._report_progress(6, 6, "¡PROCESO TERMINADO! Revisar reporte.")
+    return True, limpiador._generar_reporte(output_file_path)
@@ -0,0 +1,133 @@
+"""
+Índice espacial de una finca limpia: qué palma corresponde a una lectura GPS.
+
+Las coordenadas se proyectan a metros en un plano local (equirectangular
+centrado en la finca, con error despreciable a esta escala) y se indexan en un
+KDTree. El árbol solo propone candidatos; la distancia que se devuelve y el
+orden final de los vecinos salen de la haversine exacta (núcleo de
+`distancias`, con los radianes de los spots calculados una vez).
+
+Todas las consultas aceptan arrays de lecturas y se resuelven de una vez.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .columnar import EXTENSIONES as EXTENSIONES_COLUMNARES, escribir_columnar, leer_columnar
+from .distancias import RADIO_TIERRA_M, Coordenadas, haversine
+from .lectura import convertir_numericas, opciones_lectura_csv
+
+# Candidatos de más que se piden al árbol antes de reordenar por haversine
+MARGEN_CANDIDATOS = 1
+
+
+class IndiceSpots:
+    """
+    Índice sobre la salida de `LimpiezaSpots` (columnas de la API; se usan 'lat'
+    y 'lng'). Las consultas devuelven posiciones de fila en `self.spots`.
+    """
+
+    def __init__(self, spots: pd.DataFrame):
+        # Sin columnas repetidas (la salida del formato antiguo repite lat/lng/posicion)
+        self.spots = spots.loc[:, ~spots.columns.duplicated()].reset_index(drop=True)
+        self.lat = self.spots['lat'].to_numpy(dtype=np.float64)
+        self.lng = self.spots['lng'].to_numpy(dtype=np.float64)
+        if np.isnan(self.lat).any() or np.isnan(self.lng).any():
+            raise ValueError("El índice necesita coordenadas sin vacíos (use la salida limpia)")
+        self._coordenadas = Coordenadas(self.lat, self.lng)
+
+        # Origen del plano local y escala de la longitud a esa latitud
+        self.lat0 = float(self.lat.mean()) if len(self) else 0.0
+        self.lng0 = float(self.lng.mean()) if len(self) else 0.0
+        self._escala_lng = np.cos(np.radians(self.lat0))
+        # scikit-learn solo se importa al construir un índice
+        from sklearn.neighbors import KDTree
+        self._arbol = KDTree(self._proyectar(self.lat, self.lng)) if len(self) else None
+
+        # Para rectángulos: posiciones ordenadas por latitud
+        self._por_lat = np.argsort(self.lat, kind='stable')
+        self._lat_ordenada = self.lat[self._por_lat]
+
+    def __len__(self) -> int:
+        return len(self.spots)
+
+    @classmethod
+    def desde_archivo(cls, ruta: str) -> 'IndiceSpots':
+        """Desde un CSV exportado o una copia columnar (.parquet/.feather/.npz)."""
+        if os.path.splitext(ruta)[1].lower() in EXTENSIONES_COLUMNARES:
+            return cls.cargar(ruta)
+        opciones = opciones_lectura_csv(ruta)
+        df = pd.read_csv(ruta, sep=opciones['sep'], encoding=opciones['encoding'], dtype=opciones['dtype'])
+        return cls(convertir_numericas(df, opciones['numericas']))
+
+    def guardar(self, ruta: str):
+        """Guarda los spots en formato columnar; el árbol se reconstruye al cargar."""
+        escribir_columnar(self.spots, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'IndiceSpots':
+        """Índice guardado con `guardar` (.parquet/.feather/.npz según la extensión)."""
+        return cls(leer_columnar(ruta))
+
+    def _proyectar(self, lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+        """Coordenadas (x, y) en metros en el plano local de la finca."""
+        x = np.radians(lng - self.lng0) * self._escala_lng * RADIO_TIERRA_M
+        y = np.radians(lat - self.lat0) * RADIO_TIERRA_M
+        return np.column_stack([x, y])
+
+    @staticmethod
+    def _lecturas(lat, lng) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        if lat.shape != lng.shape or lat.ndim != 1:
+            raise ValueError("lat y lng deben ser arrays 1D del mismo tamaño")
+        validas = ~(np.isnan(lat) | np.isnan(lng))
+        return lat, lng, validas
+
+    def vecinos(self, lat, lng, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Los `k` spots más cercanos a cada lectura, de menor a mayor distancia.
+        Devuelve (posiciones, distancias en metros), ambos de forma (n, k); las
+        lecturas sin coordenadas (o si el índice tiene menos de k spots) quedan
+        con posición -1 y distancia NaN.
+        """
+        lat, lng, validas = self._lecturas(lat, lng)
+        posiciones = np.full((len(lat), k), -1, dtype=np.int64)
+        distancias = np.full((len(lat), k), np.nan)
+        if not len(self) or not validas.any():
+            return posiciones, distancias
+
+        candidatos = min(len(self), k + MARGEN_CANDIDATOS)
+        _, cercanos = self._arbol.query(self._proyectar(lat[validas], lng[validas]), k=candidatos)
+        lecturas = Coordenadas(lat[validas], lng[validas])
+        fila_lectura = np.repeat(np.arange(len(lecturas)), candidatos)
+        exactas = haversine(self._coordenadas, cercanos.ravel(), lecturas, fila_lectura).reshape(cercanos.shape)
+        orden = np.argsort(exactas, axis=1, kind='stable')[:, :k]
+        hallados = orden.shape[1]
+        posiciones[validas, :hallados] = np.take_along_axis(cercanos, orden, axis=1)
+        distancias[validas, :hallados] = np.take_along_axis(exactas, orden, axis=1)
+        return posiciones, distancias
+
+    def buscar(self, lat, lng, radio_m: float | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Spot más cercano a cada lectura: (posiciones, distancias en metros).
+        Con `radio_m`, las lecturas sin ningún spot a esa distancia quedan con -1.
+        """
+        posiciones, distancias = self.vecinos(lat, lng, k=1)
+        posiciones, distancias = posiciones[:, 0], distancias[:, 0]
+        if radio_m is not None:
+            posiciones[~(distancias <= radio_m)] = -1
+        return posiciones, distancias
+
+    def en_rectangulo(self, lat_min: float, lat_max: float, lng_min: float, lng_max: float) -> np.ndarray:
+        """Posiciones (ascendentes) de los spots dentro del rectángulo, bordes incluidos."""
+        inicio = np.searchsorted(self._lat_ordenada, lat_min, side='left')
+        fin = np.searchsorted(self._lat_ordenada, lat_max, side='right')
+        candidatos = self._por_lat[inicio:fin]
+        dentro = (self.lng[candidatos] >= lng_min) & (self.lng[candidatos] <= lng_max)
+        return np.sort(candidatos[dentro])
+
+
+# Nombre con el que se pidió el índice; en el código se usa IndiceSpots, como LimpiezaSpots y SubidaSpots
+SpotIndex = IndiceSpots
@@ -3,11 +3,15 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import filedialog, messagebox
 import os
-import requests
+import queue
 import threading
 import json
-from .motor_limpieza import LimpiezaSpots
 from PIL import Image, ImageTk 
+# El motor (pandas, numpy) y la subida (requests) se importan al usarlos, para
+# que la ventana aparezca sin esperar a esas bibliotecas; ver setup_limpiador.
+
+# Cada cuánto (ms) se revisa la cola de progreso del hilo de limpieza
+INTERVALO_PROGRESO_MS = 100
 
 class AppLimpieza(ttk.Window): 
     def __init__(self):
@@ -28,13 +32,41 @@ class AppLimpieza(ttk.Window):
         # --- NUEVAS VARIABLES ---
         self.finca_id_var = tk.StringVar()
         self.token_var = tk.StringVar() # Para el token de autorización
+        # Enviar solo el delta es opcional: por defecto la API recibe el archivo completo
+        self.solo_cambios_var = tk.BooleanVar(value=False)
         self.btn_subir = None # Referencia al botón de subida
         
+        # Mensajes de los hilos de limpieza y subida: ('progreso', %, texto) o
+        # ('fin', función, argumentos), que se ejecuta en el hilo principal
+        self.cola_limpieza = queue.Queue()
+        self.hilo_limpieza = None
+        self.subida = None
+        
         self.create_widgets()
         self.setup_limpiador()
+        self.protocol("WM_DELETE_WINDOW", self.cerrar)
 
     def setup_limpiador(self):
-        self.limpiador = LimpiezaSpots(umbral_metros=1.0, update_callback=self.update_progress)
+        # Caché por lote: volver a limpiar el mismo archivo (o con otro ID de finca) es casi inmediato
+        self.directorio_cache = os.path.join(os.path.expanduser("~"), ".palmclean", "cache")
+        # Última subida correcta de cada finca: las siguientes solo envían los cambios
+        self.directorio_instantaneas = os.path.join(os.path.expanduser("~"), ".palmclean", "subidas")
+        # El motor se importa en segundo plano cuando la ventana ya está visible;
+        # si el usuario pulsa antes, _obtener_limpiador espera a que termine.
+        self.after(200, lambda: threading.Thread(target=self._importar_motor, daemon=True).start())
+
+    @staticmethod
+    def _importar_motor():
+        from . import motor_limpieza  # noqa: F401
+
+    def _obtener_limpiador(self):
+        if self.limpiador is None:
+            from .motor_limpieza import LimpiezaSpots
+            # El motor corre en otro hilo: solo encola, la GUI se actualiza desde _revisar_cola
+            self.limpiador = LimpiezaSpots(umbral_metros=1.0, update_callback=self._encolar_progreso,
+                                           directorio_cache=self.directorio_cache,
+                                           directorio_instantaneas=self.directorio_instantaneas)
+        return self.limpiador
 
     def create_widgets(self):
         main_frame = ttk.Frame(self, padding="20 20 20 20")
@@ -70,6 +102,12 @@ class AppLimpieza(ttk.Window):
         ttk.Label(entry_frame, text="Token de Autorización API:", font=('Arial', 14, 'bold')).pack(pady=(5, 0), anchor=W)
         self.entry_token = ttk.Entry(entry_frame, textvariable=self.token_var, font=('Arial', 16), show="*")
         self.entry_token.pack(pady=(0, 10), fill=X)
+        ttk.Checkbutton(
+            entry_frame,
+            text="Enviar solo los cambios desde la última subida (solo si la API acepta archivos delta)",
+            variable=self.solo_cambios_var,
+            bootstyle="round-toggle"
+        ).pack(pady=(0, 10), anchor=W)
 
 
         # --- 2. Acciones ---
@@ -98,6 +136,15 @@ class AppLimpieza(ttk.Window):
         )
         self.btn_limpiar.pack(side=LEFT, fill=X, expand=True, padx=(5, 0))
 
+        self.btn_cancelar = ttk.Button(
+            frame_botones, 
+            text="⛔ Cancelar", 
+            command=self.cancelar_limpieza, 
+            state=DISABLED, 
+            bootstyle=(DANGER, OUTLINE)
+        )
+        self.btn_cancelar.pack(side=LEFT, padx=(5, 0))
+
         # --- 3. Progreso y Resultados ---
         ttk.Separator(main_frame).pack(fill=X, pady=15)
         ttk.Label(main_frame, text="3. Progreso y Resultados", font=('Arial', 18, 'bold')).pack(pady=(0, 10), anchor=W)
@@ -136,12 +183,15 @@ class AppLimpieza(ttk.Window):
             style = INFO
             
         self.label_progreso_msg.config(text=f"Progreso ({percentage}%): {message}", bootstyle=style)
-        self.update_idletasks()
+
+    def _encolar_progreso(self, percentage: int, message: str):
+        """Callback del motor. Se ejecuta en el hilo de limpieza: no toca widgets."""
+        self.cola_limpieza.put(('progreso', percentage, message))
 
     def seleccionar_archivo(self):
         file_path = filedialog.askopenfilename(
             defaultextension=".csv",
-            filetypes=[("Archivos de Datos", "*.csv *.xlsx")]
+            filetypes=[("Archivos de Datos", "*.csv *.xlsx *.parquet *.feather *.npz")]
         )
         if file_path:
             self.btn_limpiar.config(state=NORMAL)
@@ -165,19 +215,81 @@ class AppLimpieza(ttk.Window):
         self.btn_limpiar.config(state=DISABLED, text="⏳ PROCESANDO...")
         self.btn_seleccionar.config(state=DISABLED)
         self.btn_subir.config(state=DISABLED)
+        self.btn_cancelar.config(state=NORMAL)
         self.update_progress(0, "Iniciando proceso...")
+        self._obtener_limpiador()
 
-        # (Revertimos el cambio del 'FutureWarning' para evitar el 'KeyError')
-        success, reporte_texto = self.limpiador.procesar_y_exportar(self.input_path, self.output_path, finca_id)
-        
+        # La limpieza corre en un hilo aparte para no congelar la ventana
+        self.hilo_limpieza = threading.Thread(
+            target=self._ejecutar_limpieza_hilo,
+            args=(self.input_path, self.output_path, finca_id),
+            daemon=True
+        )
+        self.hilo_limpieza.start()
+        self.after(INTERVALO_PROGRESO_MS, self._revisar_cola)
+
+    def _ejecutar_limpieza_hilo(self, input_path, output_path, finca_id):
+        """Se ejecuta en el hilo de limpieza. El resultado vuelve por la cola."""
+        try:
+            success, reporte_texto = self.limpiador.procesar_y_exportar(input_path, output_path, finca_id)
+        except Exception as e:
+            success, reporte_texto = False, f"Error inesperado en la limpieza: {e}"
+        self.cola_limpieza.put(('fin', self._finalizar_limpieza, (success, reporte_texto)))
+
+    def _revisar_cola(self):
+        """
+        Vacía la cola en el hilo principal. Solo se pinta el último progreso de cada
+        revisión, así la ventana se refresca como mucho cada INTERVALO_PROGRESO_MS.
+        """
+        ultimo_progreso = None
+        fin = None
+        try:
+            while True:
+                mensaje = self.cola_limpieza.get_nowait()
+                if mensaje[0] == 'fin':
+                    fin = mensaje[1:]
+                else:
+                    ultimo_progreso = mensaje[1:]
+        except queue.Empty:
+            pass
+
+        if ultimo_progreso:
+            self.update_progress(*ultimo_progreso)
+        if fin:
+            funcion, argumentos = fin
+            funcion(*argumentos)
+        else:
+            self.after(INTERVALO_PROGRESO_MS, self._revisar_cola)
+
+    def cancelar_limpieza(self):
+        """Pide al motor que se detenga; el hilo termina en el siguiente punto de control."""
+        self.limpiador.cancelar()
+        self.btn_cancelar.config(state=DISABLED)
+        self.label_progreso_msg.config(text="Cancelando...", bootstyle=WARNING)
+
+    def cerrar(self):
+        """Al cerrar la ventana se cancela la limpieza en curso para no dejarla consumiendo CPU."""
+        if self.hilo_limpieza and self.hilo_limpieza.is_alive():
+            self.limpiador.cancelar()
+        if self.subida:
+            self.subida.cancelar()
+        self.destroy()
+
+    def _finalizar_limpieza(self, success, reporte_texto):
+        """Actualiza la GUI cuando la limpieza termina. Se ejecuta en el hilo principal."""
+        self.hilo_limpieza = None
         self.btn_limpiar.config(state=NORMAL, text="✨ 1. INICIAR LIMPIEZA")
         self.btn_seleccionar.config(state=NORMAL)
+        self.btn_cancelar.config(state=DISABLED)
 
         if success:
             self.label_reporte.config(text=reporte_texto.strip(), bootstyle=SUCCESS)
             self.label_progreso_msg.config(text="¡LIMPIEZA TERMINADA! Archivo Listo para subir.", bootstyle=SUCCESS)
             self.btn_subir.config(state=NORMAL) # <-- Activa el botón de subida
             messagebox.showinfo("¡Éxito!", f"¡Limpieza finalizada! El archivo 'Palmas_LIMPIAS.csv' está listo.\n\nAhora puede presionar el botón 'SUBIR A SIOMA'.")
+        elif self.limpiador.cancelado:
+            self.label_reporte.config(text=reporte_texto.strip(), bootstyle=WARNING)
+            self.label_progreso_msg.config(text="Limpieza cancelada.", bootstyle=WARNING)
         else:
             self.label_reporte.config(text=reporte_texto.strip(), bootstyle=DANGER)
             self.label_progreso_msg.config(text="ERROR EN EL PROCESO DE LIMPIEZA.", bootstyle=DANGER)
@@ -197,56 +309,82 @@ class AppLimpieza(ttk.Window):
         self.btn_seleccionar.config(state=DISABLED)
         self.btn_subir.config(state=DISABLED, text="🛰️ SUBIENDO A API...")
         
+        from .subida import SubidaSpots
+
+        archivos, salidas = self._archivos_a_subir()
+        if not archivos:
+            messagebox.showinfo("Sin cambios", "No hay cambios desde la última subida de esta finca.")
+            self.finalizar_subida("✅ Sin cambios desde la última subida: no hay nada que enviar.", SUCCESS)
+            return
+        
         self.update_progress(0, "Iniciando subida a la API...", bootstyle=INFO)
         
-        # Iniciar la subida en un hilo separado para no congelar la GUI
+        # Iniciar la subida en un hilo separado para no congelar la GUI. La subida
+        # se reintenta ante errores transitorios de la API.
+        self.subida = SubidaSpots(
+            self.api_url,
+            token, # La doc no especifica 'Bearer ', así que se envía directo
+            update_callback=self._encolar_progreso
+        )
         threading.Thread(
             target=self._ejecutar_subida_api, 
-            args=(token, self.output_path), 
+            args=(self.subida, archivos, salidas), 
             daemon=True
         ).start()
+        self.after(INTERVALO_PROGRESO_MS, self._revisar_cola)
 
-    def _ejecutar_subida_api(self, token, filepath):
-        """Contiene la lógica de red (requests). Se ejecuta en un hilo."""
+    def _archivos_a_subir(self):
+        """
+        (archivos a enviar, salidas cuyas huellas se confirman tras subirlos).
+        Por defecto se envía el archivo completo. Con 'solo cambios', el delta de
+        cada finca que ya tenga una subida anterior (las demás van completas).
+        Un archivo con varias fincas se confirma finca por finca: el archivo
+        unido no tiene huellas propias.
+        """
+        from .delta import ruta_delta
+
+        stats = self.limpiador.stats
+        if stats.get('fincas'):
+            fincas = [finca for finca in stats['fincas'].values() if finca['ok']]
+        else:
+            fincas = [{'salida': self.output_path, 'delta': stats.get('delta')}]
+        salidas = [finca['salida'] for finca in fincas]
+        if not self.solo_cambios_var.get():
+            return [self.output_path], salidas
+
+        archivos = []
+        for finca in fincas:
+            delta = finca.get('delta')
+            if delta is None:
+                archivos.append(finca['salida'])
+            elif delta['agregados'] or delta['modificados'] or delta['eliminados']:
+                archivos.append(ruta_delta(finca['salida']))
+        return archivos, salidas
+
+    def _ejecutar_subida_api(self, subida, archivos, salidas):
+        """Contiene la lógica de red. Se ejecuta en un hilo."""
         try:
-            # 1. Preparar cabeceras y archivos
-            headers = {'Authorization': token} # La doc no especifica 'Bearer ', así que se envía directo
-            
-            with open(filepath, 'rb') as f:
-                files = {'file': (os.path.basename(filepath), f, 'text/csv')}
-                
-                # 2. Hacer la petición POST (timeout de 60s)
-                response = requests.post(self.api_url, headers=headers, files=files, timeout=60)
-
-            # 3. Analizar la respuesta
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    if data.get("status") == "success":
-                        msg = f"✅ ÉXITO API: {data.get('message')}"
-                        style = SUCCESS
-                    else:
-                        msg = f"❌ ERROR API: {data.get('message')} (Código: {data.get('codigo')})"
-                        style = DANGER
-                except requests.exceptions.JSONDecodeError:
-                    msg = f"❌ ERROR API: La respuesta del servidor no es un JSON válido. (Respuesta: {response.text[:100]}...)"
-                    style = DANGER
+            mensajes = []
+            for filepath in archivos:
+                success, mensaje = subida.subir(filepath)
+                if not success:
+                    break
+                mensajes.append(mensaje)
+            if success:
+                from .delta import confirmar_subida
+                for salida in salidas:
+                    confirmar_subida(salida, self.directorio_instantaneas)
+                msg = f"✅ ÉXITO API: {' | '.join(mensajes)}"
+                style = SUCCESS
             else:
-                msg = f"❌ ERROR HTTP: {response.status_code}. (Respuesta: {response.text[:100]}...)"
+                msg = f"❌ ERROR API: {mensaje}"
                 style = DANGER
-
-        except requests.exceptions.Timeout:
-            msg = "❌ ERROR API: Timeout. El servidor tardó más de 60 segundos en responder."
-            style = DANGER
-        except requests.exceptions.ConnectionError:
-            msg = "❌ ERROR API: No se pudo conectar al servidor. Revisa tu internet o la URL de la API."
-            style = DANGER
         except Exception as e:
             msg = f"❌ ERROR INESPERADO: {str(e)}"
             style = DANGER
         
-        # 4. Enviar el resultado de vuelta a la GUI (de forma segura)
-        self.after(0, self.finalizar_subida, msg, style)
+        # Enviar el resultado de vuelta a la GUI (de forma segura)
+        self.cola_limpieza.put(('fin', self.finalizar_subida, (msg, style)))
 
     def finalizar_subida(self, message, bootstyle):
         """Actualiza la GUI cuando la subida termina. Se ejecuta en el hilo principal."""
@@ -0,0 +1,126 @@
+"""
+Detección del formato de un CSV de spots a partir de una muestra de la cabecera,
+para leer el archivo una sola vez y con los tipos ya correctos.
+
+Las columnas numéricas no se fijan en `read_csv` (un solo valor no numérico
+haría fallar la lectura): el parser las infiere y `convertir_numericas` las
+lleva después a su tipo, dejando vacíos los valores que no son números.
+
+Solo usa la biblioteca estándar al importarse: también lo importa la subida.
+"""
+import codecs
+import csv
+
+TAMANO_MUESTRA = 64 * 1024
+
+SEPARADORES = ',;\t|'
+
+# Tipos por columna (nombres en minúscula, como quedan tras normalizar la cabecera)
+TIPOS_FORMATO = {
+    'nuevo': {
+        'lat': 'float64', 'lng': 'float64',
+        'linea': 'Int32', 'posicion': 'Int32',
+        'lote_id': 'category', 'finca_id': 'category',
+    },
+    # linea y palma se leen como texto: los nombres del formato antiguo se componen
+    # con el valor tal como viene ('01', '007'); se convierten al normalizar
+    'antiguo': {
+        'latitud': 'float64', 'longitud': 'float64',
+        'lote': 'category',
+    },
+}
+TIPOS_NUMERICOS = ('float64', 'Int32')
+# Textos que read_csv lee como vacíos por defecto (su `na_values`); la lectura de .xlsx hace lo mismo
+VALORES_VACIOS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+
+def detectar_formato(columnas) -> str | None:
+    """'nuevo', 'antiguo' o None según las columnas (ya en minúscula y sin espacios)."""
+    columnas = set(columnas)
+    if 'nombre_spot' in columnas and 'lote_id' in columnas:
+        return 'nuevo'
+    if 'lote' in columnas and 'longitud' in columnas and 'latitud' in columnas:
+        return 'antiguo'
+    return None
+
+
+def _decodificar_muestra(muestra: bytes) -> tuple[str, str]:
+    """Devuelve (codificación, texto). Prueba UTF-8 (con o sin BOM) y si falla cp1252."""
+    for encoding in ('utf-8-sig', 'cp1252'):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            # final=False: la muestra puede cortar un carácter multibyte al final
+            return encoding, decoder.decode(muestra, final=False)
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1', muestra.decode('latin-1')
+
+
+def _detectar_separador(texto: str) -> str:
+    lineas = texto.splitlines()
+    # Sin la última línea, que puede estar cortada
+    completas = '\n'.join(lineas[:-1] if len(lineas) > 1 else lineas)
+    try:
+        return csv.Sniffer().sniff(completas, delimiters=SEPARADORES).delimiter
+    except csv.Error:
+        cabecera = lineas[0] if lineas else ''
+        return max(SEPARADORES, key=cabecera.count) if any(s in cabecera for s in SEPARADORES) else ','
+
+
+def opciones_lectura_csv(ruta: str) -> dict:
+    """
+    Lee una muestra del archivo y devuelve las opciones para `pd.read_csv`:
+    separador, codificación y `dtype` por columna según el formato detectado
+    (sin las numéricas). 'numericas' son los tipos que les da
+    `convertir_numericas` tras leer y 'formato' el formato ('nuevo', 'antiguo' o None).
+    """
+    with open(ruta, 'rb') as f:
+        muestra = f.read(TAMANO_MUESTRA)
+
+    encoding, texto = _decodificar_muestra(muestra)
+    sep = _detectar_separador(texto)
+    cabecera = next(csv.reader(texto.splitlines()[:1], delimiter=sep), [])
+
+    formato, dtype = tipos_columnas(cabecera)
+    numericas = {nombre: tipo for nombre, tipo in dtype.items() if tipo in TIPOS_NUMERICOS}
+    lectura = {nombre: tipo for nombre, tipo in dtype.items() if nombre not in numericas}
+    return {'sep': sep, 'encoding': encoding, 'dtype': lectura, 'numericas': numericas, 'formato': formato}
+
+
+def tipos_columnas(cabecera) -> tuple[str | None, dict]:
+    """Formato detectado y `dtype` por columna para una cabecera tal como viene en el archivo."""
+    columnas = {nombre: str(nombre).strip().lower() for nombre in cabecera}
+    formato = detectar_formato(columnas.values())
+    tipos = TIPOS_FORMATO.get(formato, {})
+    # Columnas numéricas/categóricas con su tipo; el resto como texto
+    dtype = {nombre: tipos.get(normalizada, str) for nombre, normalizada in columnas.items()}
+    return formato, dtype
+
+
+def convertir_numericas(df, numericas: dict):
+    """
+    Lleva las columnas de `numericas` a su tipo (en `df`, que se devuelve). Los
+    valores que no son números quedan vacíos, y en las columnas Int32 también
+    los decimales (y los que no caben en 32 bits): un número de línea o de palma con decimales no es válido. Así
+    el tipo no depende de qué filas se leyeron juntas (bloques del modo por bloques).
+    """
+    # pandas solo se importa al convertir (el módulo lo importa también la subida)
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import is_numeric_dtype
+
+    for columna, tipo in numericas.items():
+        if columna not in df.columns:
+            continue
+        valores = df[columna]
+        if not is_numeric_dtype(valores) or valores.dtype.kind == 'b':
+            valores = pd.to_numeric(valores.astype(object), errors='coerce')
+        valores = valores.astype(np.float64)
+        if tipo == 'Int32':
+            validos = (np.floor(valores) == valores) & (valores.abs() <= np.iinfo(np.int32).max)
+            valores = valores.where(validos).astype('Int32')
+        df[columna] = valores
+    return df
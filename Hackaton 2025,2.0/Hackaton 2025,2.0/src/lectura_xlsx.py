@@ -0,0 +1,99 @@
+"""
+Lectura de .xlsx fila a fila y por lotes, con los mismos tipos por columna que
+los CSV (ver `lectura.tipos_columnas` y `lectura.convertir_numericas`).
+"""
+import importlib.util
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from .lectura import TIPOS_NUMERICOS, VALORES_VACIOS, convertir_numericas, tipos_columnas
+
+FILAS_POR_LOTE_XLSX = 20_000
+
+
+def leer_xlsx(ruta: str, filas_por_lote: int = FILAS_POR_LOTE_XLSX) -> pd.DataFrame:
+    """
+    Primera hoja de un .xlsx con los tipos de `tipos_columnas`, igual que se lee
+    un CSV: los valores no numéricos de las columnas numéricas quedan vacíos.
+    Con python-calamine instalado se usa ese motor (mucho más rápido); si no,
+    openpyxl en modo solo lectura, convirtiendo `filas_por_lote` filas cada vez
+    para no tener todas las celdas como objetos de Python a la vez.
+    """
+    if importlib.util.find_spec('python_calamine'):
+        return _leer_xlsx_calamine(ruta)
+    return _leer_xlsx_openpyxl(ruta, filas_por_lote)
+
+
+def _tipos_lectura(cabecera) -> tuple[dict, dict]:
+    """(tipos no numéricos para leer, tipos numéricos para `convertir_numericas`)."""
+    dtype = tipos_columnas(cabecera)[1]
+    numericas = {nombre: tipo for nombre, tipo in dtype.items() if tipo in TIPOS_NUMERICOS}
+    return {nombre: tipo for nombre, tipo in dtype.items() if nombre not in numericas}, numericas
+
+
+def _leer_xlsx_calamine(ruta: str) -> pd.DataFrame:
+    lectura, numericas = _tipos_lectura(pd.read_excel(ruta, engine='calamine', nrows=0).columns)
+    return convertir_numericas(pd.read_excel(ruta, engine='calamine', dtype=lectura), numericas)
+
+
+def _texto(valor):
+    # Como read_csv con dtype=str: las celdas vacías o con un valor nulo quedan NaN
+    if valor is None or valor != valor:
+        return np.nan
+    valor = valor if type(valor) is str else str(valor)
+    return np.nan if valor in VALORES_VACIOS else valor
+
+
+def _convertir_lote(lote: list[list], cabecera: list, lectura: dict, numericas: dict) -> pd.DataFrame:
+    """Filas de celdas a DataFrame con los tipos de `lectura` y `numericas`."""
+    df = pd.DataFrame(lote, columns=cabecera, dtype=object)
+    # Texto y categorías como texto (p. ej. lotes 62 y '62-A' en la misma columna)
+    for columna, tipo in lectura.items():
+        valores = df[columna].map(_texto)
+        df[columna] = valores if tipo is str else valores.astype(tipo)
+    return convertir_numericas(df, numericas)
+
+
+def _leer_xlsx_openpyxl(ruta: str, filas_por_lote: int) -> pd.DataFrame:
+    # openpyxl solo hace falta para los .xlsx
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+
+    def celda(valor):
+        # Mismas conversiones que pandas.read_excel con openpyxl
+        if type(valor) is float and valor.is_integer():
+            return int(valor)
+        if type(valor) is str and valor in ERROR_CODES:
+            return None
+        return valor
+
+    libro = load_workbook(ruta, read_only=True, data_only=True, keep_links=False)
+    try:
+        hoja = libro.worksheets[0]
+        hoja.reset_dimensions()
+        filas = hoja.iter_rows(values_only=True)
+        cabecera = [celda(valor) for valor in next(filas, ())]
+        while cabecera and cabecera[-1] is None:
+            cabecera.pop()
+        ancho = len(cabecera)
+        lectura, numericas = _tipos_lectura(cabecera)
+
+        partes = []
+        while True:
+            lote = [[celda(valor) for valor in fila[:ancho]] for fila in islice(filas, filas_por_lote)]
+            if not lote:
+                break
+            partes.append(_convertir_lote(lote, cabecera, lectura, numericas))
+    finally:
+        libro.close()
+
+    if not partes:
+        return _convertir_lote([], cabecera, lectura, numericas)
+    df = pd.concat(partes, ignore_index=True)
+    # Cada lote tiene sus propias categorías; al unirlos se vuelven a agrupar
+    for columna, tipo in lectura.items():
+        if tipo == 'category':
+            df[columna] = df[columna].astype('category')
+    return df
@@ -0,0 +1,122 @@
+"""
+Pertenencia de cada palma a su línea.
+
+La corrección de secuencia confía en 'Linea': una palma con la línea mal
+anotada se numera dentro de la fila equivocada. Aquí cada (Lote, Linea) se
+ajusta a un eje recto (centroide y dirección principal) con reducciones
+agrupadas de NumPy sobre toda la finca a la vez, sin bucles por línea, y se
+mide la distancia perpendicular de cada palma al eje de su línea y a los de
+las líneas vecinas del mismo lote (la anterior y la siguiente).
+
+- sospechosa: se aleja de su eje más que la tolerancia;
+- reasignable: además el eje de una línea vecina está dentro de la tolerancia
+  y más cerca que el suyo.
+"""
+import os
+
+import numpy as np
+
+from .constantes import MODOS_LINEAS as MODOS
+from .distancias import plano_local
+
+SUFIJO_INFORME = '_LINEAS'
+
+# Palmas dentro de la tolerancia que necesita una línea para tener un eje fiable
+MIN_PALMAS_EJE = 3
+# El segundo ajuste deja fuera las palmas que el primero encontró lejos del eje
+AJUSTES = 2
+
+
+def ruta_informe(ruta_salida: str) -> str:
+    """<salida>_LINEAS.csv: las palmas sospechosas y la línea sugerida."""
+    base, extension = os.path.splitext(ruta_salida)
+    return f"{base}{SUFIJO_INFORME}{extension}"
+
+
+def ajustar_ejes(grupo: np.ndarray, n_grupos: int, x: np.ndarray, y: np.ndarray,
+                 peso: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    (cx, cy, ux, uy, cuenta) de cada grupo: centroide ponderado por `peso` y
+    dirección principal (vector unitario) de su covarianza 2x2 en forma cerrada.
+    Los grupos sin peso quedan con NaN.
+    """
+    cuenta = np.bincount(grupo, weights=peso, minlength=n_grupos)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cx = np.bincount(grupo, weights=peso * x, minlength=n_grupos) / cuenta
+        cy = np.bincount(grupo, weights=peso * y, minlength=n_grupos) / cuenta
+    dx = x - cx[grupo]
+    dy = y - cy[grupo]
+    sxx = np.bincount(grupo, weights=peso * dx * dx, minlength=n_grupos)
+    syy = np.bincount(grupo, weights=peso * dy * dy, minlength=n_grupos)
+    sxy = np.bincount(grupo, weights=peso * dx * dy, minlength=n_grupos)
+    angulo = 0.5 * np.arctan2(2 * sxy, sxx - syy)
+    return cx, cy, np.cos(angulo), np.sin(angulo), cuenta
+
+
+def distancia_eje(x: np.ndarray, y: np.ndarray, g: np.ndarray, cx, cy, ux, uy) -> np.ndarray:
+    """Distancia perpendicular (m) de cada punto al eje del grupo `g`."""
+    return np.abs((x - cx[g]) * uy[g] - (y - cy[g]) * ux[g])
+
+
+def revisar_lineas(grupo: np.ndarray, lote_grupo: np.ndarray, linea_valida: np.ndarray,
+                   lat: np.ndarray, lng: np.ndarray, tolerancia_m: float) -> dict[str, np.ndarray]:
+    """
+    `grupo` es el número de (Lote, Linea) de cada palma en el orden de
+    groupby(['Lote', 'Linea']), así que las líneas de un lote son grupos
+    consecutivos; `lote_grupo` y `linea_valida` describen cada grupo (las
+    líneas vacías no se revisan ni reciben palmas).
+
+    Devuelve por palma 'revisada', 'sospechosa' y 'reasignable' (bool),
+    'distancia' al eje propio, 'vecina' (grupo vecino más cercano o -1) y
+    'distancia_vecina' (NaN sin vecina). Solo las sospechosas se miden contra
+    las vecinas.
+    """
+    n = len(grupo)
+    n_grupos = len(lote_grupo)
+    x, y = plano_local(lat, lng)
+    en_linea = linea_valida[grupo]
+    peso = en_linea.astype(np.float64)
+    for _ in range(AJUSTES):
+        cx, cy, ux, uy, cuenta = ajustar_ejes(grupo, n_grupos, x, y, peso)
+        distancia = distancia_eje(x, y, grupo, cx, cy, ux, uy)
+        peso = (en_linea & (distancia <= tolerancia_m)).astype(np.float64)
+
+    con_eje = linea_valida & (cuenta >= MIN_PALMAS_EJE)
+    revisada = con_eje[grupo]
+    sospechosa = revisada & (distancia > tolerancia_m)
+
+    # Grupo anterior y siguiente del mismo lote, si tienen eje
+    posicion = np.arange(n_grupos)
+    vecinas_grupo = []
+    for paso in (-1, 1):
+        vecina = posicion + paso
+        dentro = (vecina >= 0) & (vecina < n_grupos)
+        vecina[~dentro] = 0
+        valida = dentro & con_eje[vecina] & (lote_grupo[vecina] == lote_grupo)
+        vecinas_grupo.append(np.where(valida, vecina, -1))
+
+    filas = np.flatnonzero(sospechosa)
+    mejor = np.full(len(filas), -1, dtype=np.int64)
+    mejor_distancia = np.full(len(filas), np.inf)
+    for vecina_grupo in vecinas_grupo:
+        vecina = vecina_grupo[grupo[filas]]
+        hay = vecina >= 0
+        d = np.full(len(filas), np.inf)
+        d[hay] = distancia_eje(x[filas[hay]], y[filas[hay]], vecina[hay], cx, cy, ux, uy)
+        mas_cerca = d < mejor_distancia
+        mejor[mas_cerca] = vecina[mas_cerca]
+        mejor_distancia[mas_cerca] = d[mas_cerca]
+
+    vecina = np.full(n, -1, dtype=np.int64)
+    distancia_vecina = np.full(n, np.nan)
+    vecina[filas] = mejor
+    distancia_vecina[filas[mejor >= 0]] = mejor_distancia[mejor >= 0]
+    reasignable = sospechosa & (distancia_vecina <= tolerancia_m) & (distancia_vecina < distancia)
+    return {
+        'revisada': revisada,
+        'sospechosa': sospechosa,
+        'reasignable': reasignable,
+        'distancia': distancia,
+        'vecina': vecina,
+        'distancia_vecina': distancia_vecina,
+    }
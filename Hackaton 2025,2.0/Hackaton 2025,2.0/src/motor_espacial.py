@@ -0,0 +1,106 @@
+import numpy as np
+
+from .constantes import MOTORES
+from .distancias import RADIO_TIERRA_M, Coordenadas, haversine
+
+
+def componentes_conexas(n: int, origen: np.ndarray, destino: np.ndarray) -> np.ndarray:
+    """
+    Etiqueta las componentes conexas del grafo (origen, destino) con propagación
+    del mínimo + salto de punteros. Cada nodo termina apuntando al menor índice
+    de su componente.
+    """
+    raiz = np.arange(n)
+    while True:
+        minimo = np.minimum(raiz[origen], raiz[destino])
+        nueva = raiz.copy()
+        np.minimum.at(nueva, origen, minimo)
+        np.minimum.at(nueva, destino, minimo)
+        # Salto de punteros hasta que cada nodo apunte a una raíz
+        while True:
+            saltada = nueva[nueva]
+            if np.array_equal(saltada, nueva):
+                break
+            nueva = saltada
+        if np.array_equal(nueva, raiz):
+            return raiz
+        raiz = nueva
+
+
+def margen_vecindad(lat_rad: np.ndarray, umbral_metros: float) -> tuple[float, float]:
+    """
+    Devuelve (dlat, dlng) en radianes tales que cualquier par a menos de
+    `umbral_metros` difiere como mucho dlat en latitud y dlng en longitud.
+    """
+    eps = umbral_metros / RADIO_TIERRA_M
+    # hav(c) >= cos(lat1)cos(lat2) hav(dlon)  =>  sin(dlon/2) <= sin(eps/2) / cos_min
+    cos_min = np.cos(np.abs(lat_rad).max())
+    if cos_min <= 0:
+        return eps, 2 * np.pi
+    return eps, 2 * np.arcsin(min(1.0, np.sin(eps / 2) / cos_min))
+
+
+def agrupar_por_rejilla(lat: np.ndarray, lng: np.ndarray, umbral_metros: float, progreso=None) -> np.ndarray:
+    """
+    Agrupa los puntos a menos de `umbral_metros` (haversine) en componentes conexas.
+    Devuelve las mismas etiquetas que DBSCAN(eps, min_samples=1, metric='haversine'):
+    clusters numerados en el orden de su primer registro.
+
+    Usa una rejilla uniforme en radianes: una celda mide `eps` en latitud y lo
+    suficiente en longitud para que todo vecino real caiga en las 8 celdas contiguas.
+    Los pares candidatos se confirman con la distancia haversine exacta.
+    `progreso(fraccion)` se llama antes de revisar cada celda vecina.
+    """
+    coordenadas = Coordenadas(lat, lng)
+    lat_rad, lng_rad = coordenadas.lat, coordenadas.lng
+    n = len(lat_rad)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    celda_lat, celda_lng = margen_vecindad(lat_rad, umbral_metros)
+    eps = celda_lat
+
+    ix = np.floor((lng_rad - lng_rad.min()) / celda_lng).astype(np.int64)
+    iy = np.floor((lat_rad - lat_rad.min()) / celda_lat).astype(np.int64)
+    alto = int(iy.max()) + 3
+    clave = (ix + 1) * alto + (iy + 1)
+
+    orden = np.argsort(clave, kind='stable')
+    clave_ordenada = clave[orden]
+
+    # Las consultas se hacen en el orden de la clave: searchsorted con claves
+    # ordenadas es mucho más rápido que con consultas aleatorias.
+    origenes = []
+    destinos = []
+    desplazamientos = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+    for numero, (dx, dy) in enumerate(desplazamientos, 1):
+        if progreso:
+            progreso((numero - 1) / len(desplazamientos))
+        vecina = clave_ordenada + dx * alto + dy
+        inicio = np.searchsorted(clave_ordenada, vecina, side='left')
+        fin = np.searchsorted(clave_ordenada, vecina, side='right')
+        cuenta = fin - inicio
+        total = int(cuenta.sum())
+        if total == 0:
+            continue
+        src = np.repeat(orden, cuenta)
+        desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+        dst = orden[np.repeat(inicio, cuenta) + desplazamiento]
+        mantener = src < dst
+        origenes.append(src[mantener])
+        destinos.append(dst[mantener])
+
+    origen = np.concatenate(origenes) if origenes else np.empty(0, dtype=np.int64)
+    destino = np.concatenate(destinos) if destinos else np.empty(0, dtype=np.int64)
+
+    if len(origen):
+        # Ángulo central (radio=None) comparado con eps, por tramos
+        cerca = haversine(coordenadas, origen, coordenadas, destino, radio=None) <= eps
+        origen = origen[cerca]
+        destino = destino[cerca]
+
+    raiz = componentes_conexas(n, origen, destino)
+    # La raíz es el menor índice de cada componente: ordenar por raíz numera los
+    # clusters por orden de aparición, igual que DBSCAN.
+    _, etiquetas = np.unique(raiz, return_inverse=True)
+    return etiquetas
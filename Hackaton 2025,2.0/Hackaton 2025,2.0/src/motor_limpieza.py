@@ -1,8 +1,50 @@
 import pandas as pd
-from sklearn.cluster import DBSCAN
+from pandas.api.types import is_numeric_dtype
 import numpy as np
 import os
+import json
+import cProfile
+import glob
+import threading
+import tracemalloc
 from typing import Dict, Any, Tuple
+from .cache import CacheResultados
+from .columnar import EXTENSIONES as EXTENSIONES_COLUMNARES, FORMATOS, escribir_columnar, leer_columnar, resolver_formato, ruta_columnar
+from .delta import exportar_delta
+from .distancias import Coordenadas, haversine
+from .fincas import procesar_fincas
+from .lectura import convertir_numericas, detectar_formato, opciones_lectura_csv
+from .lectura_xlsx import leer_xlsx
+from .lineas import MODOS as MODOS_LINEAS, revisar_lineas, ruta_informe as ruta_informe_lineas
+from .motor_espacial import MOTORES, agrupar_por_rejilla
+from .perfil import medir_etapa
+from .pipeline import PIPELINES, Pipeline
+from .streaming import procesar_por_bloques
+
+def _como_texto(serie: pd.Series) -> pd.Series:
+    """Valores como texto para componer nombres; los vacíos quedan como 'nan'."""
+    return serie.astype(str).where(serie.notna(), 'nan')
+
+def _nombres(lote: pd.Series, linea: pd.Series, palma: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """(nombre_spot, nombre_planta) como los espera la API."""
+    lote_txt, linea_txt, palma_txt = _como_texto(lote), _como_texto(linea), _como_texto(palma)
+    return ('SPOT_' + lote_txt + '_L' + linea_txt + '_P' + palma_txt,
+            'L' + lote_txt + 'L' + linea_txt + 'P' + palma_txt)
+
+def _archivos_salida(output_file_path: str) -> dict[str, int]:
+    """<salida>* (CSV, informes, copias, salidas por finca) con su fecha de modificación."""
+    base = glob.escape(os.path.splitext(output_file_path)[0])
+    return {ruta: os.stat(ruta).st_mtime_ns for ruta in glob.glob(base + '*')}
+
+# Formato antiguo: copia de 'Linea' tal como se leyó, para componer los nombres al exportar
+COLUMNA_LINEA_ORIGINAL = 'linea_original_TEMP'
+
+class ProcesoCancelado(BaseException):
+    """
+    Se lanza en un punto de control cuando se pidió cancelar la limpieza. Hereda de
+    BaseException para que los `except Exception` de las etapas no la absorban.
+    """
+
 
 class LimpiezaSpots:
     """
@@ -10,27 +52,90 @@ class LimpiezaSpots:
     Optimizado para alta velocidad (vectorización de Haversine).
     """
     
-    def __init__(self, umbral_metros: float = 1.0, update_callback=None):
+    MOTORES_ESPACIALES = MOTORES
+    MODOS_VALIDACION_LINEAS = MODOS_LINEAS
+    PIPELINES = PIPELINES
+    COLUMNA_LINEA_ORIGINAL = COLUMNA_LINEA_ORIGINAL
+
+    COLUMNAS_FINALES = [
+        'nombre_spot', 'lat', 'lng', 'lote_id', 'linea', 'posicion', 
+        'nombre_planta', 'finca_id', 'tipo_poligono_id', 'distancia', 
+        'fecha_siembra', 'tipo_variedad_id'
+    ]
+
+    def __init__(self, umbral_metros: float = 1.0, update_callback=None, motor_espacial: str = 'dbscan',
+                 workers: int = 1, filas_por_bloque: int | None = None, directorio_temporal: str | None = None,
+                 perfil_json: str | None = None, perfil_cprofile: str | None = None, perfil_memoria: bool = False,
+                 directorio_cache: str | None = None, cache_max_mb: float = 512,
+                 directorio_instantaneas: str | None = None, formato_columnar: str | None = None,
+                 convertir_xlsx: bool = False, validar_lineas: str | None = None, tolerancia_linea_m: float = 3.0):
+        if motor_espacial not in self.MOTORES_ESPACIALES:
+            raise ValueError(f"motor_espacial debe ser uno de {self.MOTORES_ESPACIALES}, no '{motor_espacial}'")
+        if validar_lineas is not None and validar_lineas not in self.MODOS_VALIDACION_LINEAS:
+            raise ValueError(f"validar_lineas debe ser None o uno de {self.MODOS_VALIDACION_LINEAS}, no '{validar_lineas}'")
         self.umbral_metros = umbral_metros
+        self.motor_espacial = motor_espacial
+        self.workers = max(1, int(workers))
+        # Modo por bloques (solo CSV): lee el archivo en trozos de este tamaño y
+        # limpia un lote cada vez desde archivos temporales en `directorio_temporal`.
+        self.filas_por_bloque = filas_por_bloque
+        self.directorio_temporal = directorio_temporal
+        # Perfilado opcional: stats en JSON, volcado de cProfile (.prof) y tracemalloc por etapa.
+        self.perfil_json = perfil_json
+        self.perfil_cprofile = perfil_cprofile
+        self.perfil_memoria = perfil_memoria
+        # Caché por lote en disco (modo en memoria): al repetir un archivo solo se
+        # recalculan los lotes cuyo contenido cambió.
+        self.cache = CacheResultados(directorio_cache, cache_max_mb) if directorio_cache else None
+        # Instantáneas de la última subida por finca: si hay una, se escribe además
+        # <salida>_DELTA.csv con los spots agregados, modificados y eliminados.
+        self.directorio_instantaneas = directorio_instantaneas
+        # Copia columnar opcional de la salida junto al CSV ('auto', 'parquet',
+        # 'feather' o 'npz'), reutilizable como entrada sin volver a leer texto.
+        self.formato_columnar = resolver_formato(formato_columnar) if formato_columnar else None
+        # Los .xlsx se convierten una vez a <libro>.xlsx.npz (o .parquet) y las
+        # siguientes ejecuciones leen esa copia mientras el libro no cambie.
+        self.convertir_xlsx = convertir_xlsx
+        # Revisión de la línea de cada palma antes de la secuencia (src.lineas):
+        # 'marcar' solo informa en <salida>_LINEAS.csv; 'reasignar' además pasa cada
+        # palma a la línea vecina cuyo eje le queda a menos de `tolerancia_linea_m`,
+        # con nombre_spot y nombre_planta de la línea nueva.
+        self.validar_lineas = validar_lineas
+        self.tolerancia_linea_m = tolerancia_linea_m
+        self._informes_lineas = []
         self.stats = {}
         self.update_callback = update_callback 
+        self._cancelado = threading.Event()
 
-    def _report_progress(self, step: int, total_steps: int, message: str):
-        if self.update_callback:
-            progress = int((step / total_steps) * 100)
-            self.update_callback(progress, message)
+    def __getstate__(self):
+        # Para enviar el motor a otros procesos: sin callback (GUI) ni Event (no serializable)
+        estado = self.__dict__.copy()
+        estado['update_callback'] = None
+        del estado['_cancelado']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._cancelado = threading.Event()
 
-    def _haversine_np(self, lon1, lat1, lon2, lat2):
+    def cancelar(self):
         """
-        Calcula la distancia en metros entre arrays de coordenadas.
+        Pide detener el proceso en curso (seguro desde otro hilo). La limpieza se
+        detiene en el siguiente aviso de progreso y procesar_y_exportar devuelve False.
         """
-        lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
-        dlon = lon2 - lon1 
-        dlat = lat2 - lat1 
-        a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
-        c = 2 * np.arcsin(np.sqrt(a)) 
-        r = 6371000 # Radio de la Tierra en metros
-        return c * r
+        self._cancelado.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelado.is_set()
+
+    def _report_progress(self, step: float, total_steps: int, message: str):
+        # Cada aviso de progreso es también un punto de cancelación
+        if self._cancelado.is_set():
+            raise ProcesoCancelado()
+        if self.update_callback:
+            progress = int((step / total_steps) * 100)
+            self.update_callback(progress, message)
 
     def _cargar_y_normalizar(self, file_path: str, finca_id_manual: str) -> pd.DataFrame | None:
         self._report_progress(1, 6, "1/5: Cargando archivo y detectando formato...")
@@ -40,12 +145,11 @@ class LimpiezaSpots:
             extension = extension.lower()
             
             if extension == '.csv':
-                try:
-                    df = pd.read_csv(file_path, dtype=str)
-                except Exception:
-                    df = pd.read_csv(file_path, sep=';', dtype=str)
+                df = self._leer_csv(file_path)
             elif extension == '.xlsx':
-                df = pd.read_excel(file_path, dtype=str)
+                df = self._leer_xlsx(file_path)
+            elif extension in EXTENSIONES_COLUMNARES:
+                df = leer_columnar(file_path)
             else:
                 self._report_progress(1, 6, f"ERROR: Extensión no soportada: {extension}.")
                 return None
@@ -53,11 +157,42 @@ class LimpiezaSpots:
             self._report_progress(1, 6, f"ERROR: No se pudo leer el archivo: {e}")
             return None
 
+        return self._normalizar(df, finca_id_manual)
+
+    def _leer_csv(self, file_path: str) -> pd.DataFrame:
+        """
+        Lee el CSV una sola vez con el separador, la codificación y los tipos
+        detectados en la cabecera (coordenadas float64, Linea/Palma Int32, Lote y
+        finca_id categóricos). Los valores no numéricos de esas columnas quedan vacíos.
+        """
+        opciones = opciones_lectura_csv(file_path)
+        df = pd.read_csv(file_path, sep=opciones['sep'], encoding=opciones['encoding'], dtype=opciones['dtype'])
+        return convertir_numericas(df, opciones['numericas'])
+
+    def _leer_xlsx(self, file_path: str) -> pd.DataFrame:
+        if not self.convertir_xlsx:
+            return leer_xlsx(file_path)
+        convertido = file_path + FORMATOS[resolver_formato('auto')]
+        if os.path.exists(convertido) and os.path.getmtime(convertido) >= os.path.getmtime(file_path):
+            return leer_columnar(convertido)
+        df = leer_xlsx(file_path)
+        try:
+            escribir_columnar(df, convertido)
+        except Exception as e:
+            print(f"Advertencia: No se pudo guardar la copia columnar del libro. {e}")
+        return df
+
+    def _normalizar(self, df: pd.DataFrame, finca_id_manual: str) -> pd.DataFrame | None:
+        """
+        Detecta el formato (nuevo API / antiguo) de un DataFrame leído como texto
+        o ya tipado y lo lleva a las columnas internas con coordenadas numéricas.
+        """
         df.columns = df.columns.str.strip().str.lower()
         columnas_actuales = set(df.columns)
+        formato = detectar_formato(columnas_actuales)
         
         # --- CASO 1: Formato Nuevo (12 columnas) ---
-        if 'nombre_spot' in columnas_actuales and 'lote_id' in columnas_actuales:
+        if formato == 'nuevo':
             self._report_progress(1, 6, "1/5: Detectado Formato Nuevo API. Validando...")
             
             columnas_requeridas = {
@@ -69,11 +204,6 @@ class LimpiezaSpots:
                 self._report_progress(1, 6, f"ERROR: Faltan columnas: {faltantes}")
                 return None
             
-            fincas_en_archivo = df['finca_id'].unique()
-            if len(fincas_en_archivo) > 1:
-                self._report_progress(1, 6, f"ERROR: Múltiples fincas en archivo: {fincas_en_archivo}")
-                return None
-            
             if 'tipo_poligono_id' not in df.columns: df['tipo_poligono_id'] = '1'
             if 'distancia' not in df.columns: df['distancia'] = '9'
             if 'fecha_siembra' not in df.columns: df['fecha_siembra'] = '2006-01-01'
@@ -88,7 +218,7 @@ class LimpiezaSpots:
             })
 
         # --- CASO 2: Formato Antiguo (5 columnas) ---
-        elif 'lote' in columnas_actuales and 'longitud' in columnas_actuales and 'latitud' in columnas_actuales:
+        elif formato == 'antiguo':
             self._report_progress(1, 6, "1/5: Detectado Formato Antiguo. Convirtiendo a API...")
             
             df_limpio = df.rename(columns={
@@ -102,15 +232,12 @@ class LimpiezaSpots:
             df_limpio['lat'] = df_limpio['Latitud']
             df_limpio['lng'] = df_limpio['Longitud']
             df_limpio['lote_id'] = df_limpio['Lote']
+            # posicion y los nombres guardan Linea y Palma como texto, tal como se leyeron
+            # ('007' no es '7'); nombre_spot y nombre_planta se componen al exportar
+            # (_componer_nombres), solo para las filas que quedan y por tramos
             df_limpio['posicion'] = df_limpio['Palma']
-            
-            df_limpio['nombre_planta'] = 'L' + df_limpio['Lote'].astype(str) + \
-                                       'L' + df_limpio['Linea'].astype(str) + \
-                                       'P' + df_limpio['Palma'].astype(str)
-            
-            df_limpio['nombre_spot'] = 'SPOT_' + df_limpio['Lote'].astype(str) + \
-                                     '_L' + df_limpio['Linea'].astype(str) + \
-                                     '_P' + df_limpio['Palma'].astype(str)
+            df_limpio[COLUMNA_LINEA_ORIGINAL] = df_limpio['Linea']
+            df_limpio = convertir_numericas(df_limpio, {'Linea': 'Int32', 'Palma': 'Int32'})
             
             df_limpio['finca_id'] = finca_id_manual
             
@@ -126,96 +253,212 @@ class LimpiezaSpots:
             return None
 
         # --- Procesamiento común (tipos de datos y coordenadas) ---
+        # Solo se convierten las columnas que no llegaron ya tipadas desde la lectura
         try:
-            df_limpio['Latitud'] = pd.to_numeric(df_limpio['Latitud'], errors='coerce')
-            df_limpio['Longitud'] = pd.to_numeric(df_limpio['Longitud'], errors='coerce')
-            df_limpio['Linea'] = pd.to_numeric(df_limpio['Linea'], errors='coerce', downcast='integer')
-            df_limpio['Palma'] = pd.to_numeric(df_limpio['Palma'], errors='coerce', downcast='integer')
+            for columna in ('Latitud', 'Longitud'):
+                if not is_numeric_dtype(df_limpio[columna]):
+                    df_limpio[columna] = pd.to_numeric(df_limpio[columna], errors='coerce')
+            for columna in ('Linea', 'Palma'):
+                if not is_numeric_dtype(df_limpio[columna]):
+                    df_limpio[columna] = pd.to_numeric(df_limpio[columna], errors='coerce', downcast='integer')
         except Exception as e:
             self._report_progress(1, 6, f"ERROR: Fallo al convertir tipos de datos: {e}")
             return None
 
+        # Lote categórico (lectura tipada): pandas añade las categorías de cada trozo
+        # leído sin ordenarlas; ordenadas, groupby('Lote') recorre los lotes igual que con texto
+        if isinstance(df_limpio['Lote'].dtype, pd.CategoricalDtype):
+            categorias = df_limpio['Lote'].cat.categories
+            if not categorias.is_monotonic_increasing:
+                df_limpio['Lote'] = df_limpio['Lote'].cat.reorder_categories(categorias.sort_values())
+
         df_limpio = df_limpio.dropna(subset=['Latitud', 'Longitud']).reset_index(drop=True)
         
         self.stats['original'] = len(df_limpio)
         return df_limpio
 
 
-    def _corregir_duplicados_exactos(self, df: pd.DataFrame) -> pd.DataFrame:
-        self._report_progress(2, 6, "2/5: Eliminando duplicados idénticos (rápido)...")
-        registros_iniciales = len(df)
-        df_dedup_exacto = df.drop_duplicates(subset=['Latitud', 'Longitud'], keep='first').reset_index(drop=True)
-        self.stats['eliminados_exactos'] = registros_iniciales - len(df_dedup_exacto)
-        return df_dedup_exacto
-
-    def _corregir_duplicados_espaciales(self, df: pd.DataFrame) -> pd.DataFrame:
-        self._report_progress(3, 6, "3/5: Usando IA (DBSCAN) para errores de GPS (lento)...")
-        coords = df[['Latitud', 'Longitud']].values
+    def _etiquetar_clusters(self, lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+        """
+        Etiquetas de cluster (numeradas por primer registro) con el motor configurado.
+        """
+        if self.motor_espacial == 'grid':
+            def progreso(fraccion):
+                self._report_progress(3 + 0.9 * fraccion, 6, "3/5: Agrupando errores de GPS por rejilla (rápido)...")
+            return agrupar_por_rejilla(lat, lng, self.umbral_metros, progreso=progreso)
+        # scikit-learn tarda en importarse: solo se carga si se usa este motor
+        from sklearn.cluster import DBSCAN
+        coords = np.column_stack([lat, lng])
         epsilon = self.umbral_metros / 6371000 
-        db = DBSCAN(eps=epsilon, min_samples=1, metric='haversine').fit(np.radians(coords))
-        df['cluster'] = db.labels_
-        df_final = pd.DataFrame()
-        for _, grupo in df.groupby('cluster'):
-            df_final = pd.concat([df_final, grupo.iloc[[0]]])
+        return DBSCAN(eps=epsilon, min_samples=1, metric='haversine').fit(np.radians(coords)).labels_
+
+    def _agrupar_espacial(self, lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+        """Etapa 3 sobre toda la finca: avisa del progreso y etiqueta los clusters."""
+        if self.motor_espacial == 'grid':
+            self._report_progress(3, 6, "3/5: Agrupando errores de GPS por rejilla (rápido)...")
+        else:
+            self._report_progress(3, 6, "3/5: Usando IA (DBSCAN) para errores de GPS (lento)...")
+        return self._etiquetar_clusters(lat, lng)
+
+    def _corregir_duplicados_espaciales(self, df: pd.DataFrame, etiquetas: np.ndarray | None = None) -> pd.DataFrame:
+        # `etiquetas` llega ya calculado cuando el agrupamiento se hizo por lote en paralelo
+        if etiquetas is None:
+            etiquetas = self._agrupar_espacial(df['Latitud'].values, df['Longitud'].values)
+        # Primer registro de cada cluster, en orden de etiqueta (igual que groupby('cluster')),
+        # seleccionado de una sola vez en lugar de un pd.concat por cluster.
+        _, primeros = np.unique(etiquetas, return_index=True)
+        df_final = df.iloc[primeros]
         self.stats['eliminados_espaciales'] = len(df) - len(df_final)
-        return df_final.drop(columns=['cluster']).reset_index(drop=True)
+        return df_final.reset_index(drop=True)
+
+    def _revisar_lineas(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Mide cada palma contra el eje de su línea y de las vecinas del lote, para
+        toda la finca a la vez. Las sospechosas se guardan para el informe y, con
+        validar_lineas='reasignar', las reasignables cambian de 'Linea' (en `df`)
+        y de nombre_spot/nombre_planta. Suma los conteos en stats['lineas'].
+        """
+        self._report_progress(4, 6, "4/5: Revisando la línea de cada palma...")
+        grupo = df.groupby(['Lote', 'Linea'], dropna=False, sort=True, observed=True).ngroup().to_numpy()
+        # Primera fila de cada (Lote, Linea): de ella salen el lote y la línea del grupo
+        _, primera = np.unique(grupo, return_index=True)
+        lote_grupo = df.groupby('Lote', dropna=False, sort=True, observed=True).ngroup().to_numpy()[primera]
+        linea_grupo = df['Linea'].to_numpy(dtype=np.float64, na_value=np.nan)[primera]
+        revision = revisar_lineas(
+            grupo, lote_grupo, ~np.isnan(linea_grupo),
+            df['Latitud'].to_numpy(dtype=np.float64), df['Longitud'].to_numpy(dtype=np.float64),
+            self.tolerancia_linea_m
+        )
+
+        # Informe por (Lote, Linea), igual en memoria que lote a lote
+        sospechosas = np.flatnonzero(revision['sospechosa'])
+        sospechosas = sospechosas[np.argsort(grupo[sospechosas], kind='stable')]
+        reasignable = revision['reasignable'][sospechosas]
+        reasignar = reasignable if self.validar_lineas == 'reasignar' else np.zeros(len(sospechosas), dtype=bool)
+        # Fila de la línea sugerida de la que se copian sus valores (mismo tipo que la columna)
+        fila_vecina = primera[np.maximum(revision['vecina'][sospechosas], 0)]
+        informe = pd.DataFrame({
+            'lote_id': df['Lote'].to_numpy()[sospechosas],
+            'linea': df['Linea'].to_numpy()[sospechosas],
+            'posicion': df['Palma'].to_numpy()[sospechosas],
+            'lat': df['Latitud'].to_numpy()[sospechosas],
+            'lng': df['Longitud'].to_numpy()[sospechosas],
+            'distancia_eje_m': revision['distancia'][sospechosas].round(2),
+            'linea_sugerida': df['Linea'].iloc[fila_vecina].reset_index(drop=True).where(reasignable),
+            'distancia_sugerida_m': revision['distancia_vecina'][sospechosas].round(2),
+            'reasignada': reasignar,
+        })
+        if 'nombre_spot' in df.columns:
+            informe.insert(0, 'nombre_spot', df['nombre_spot'].to_numpy()[sospechosas])
+        self._informes_lineas.append(informe)
+
+        filas = sospechosas[reasignar]
+        if len(filas):
+            for columna in ('Linea', COLUMNA_LINEA_ORIGINAL):
+                if columna in df.columns:
+                    valores = df[columna].copy()
+                    valores.iloc[filas] = df[columna].iloc[fila_vecina[reasignar]].to_numpy()
+                    df[columna] = valores
+            # Formato nuevo: los nombres vienen del archivo y se rehacen con la línea nueva
+            # (en el antiguo se componen al exportar, ya con la línea reasignada)
+            if COLUMNA_LINEA_ORIGINAL not in df.columns:
+                nombres = _nombres(df['Lote'].iloc[filas], df['Linea'].iloc[filas], df['Palma'].iloc[filas])
+                for columna, nuevos in zip(('nombre_spot', 'nombre_planta'), nombres):
+                    if columna not in df.columns:
+                        continue
+                    valores = df[columna].copy()
+                    valores.iloc[filas] = nuevos.to_numpy()
+                    df[columna] = valores
+
+        conteo = self.stats.setdefault('lineas', {'revisadas': 0, 'sospechosas': 0, 'reasignables': 0, 'reasignadas': 0})
+        conteo['revisadas'] += int(revision['revisada'].sum())
+        conteo['sospechosas'] += len(sospechosas)
+        conteo['reasignables'] += int(reasignable.sum())
+        conteo['reasignadas'] += len(filas)
+        return df
+
+    def _exportar_lineas(self, output_file_path: str):
+        """<salida>_LINEAS.csv con las palmas sospechosas (no impide terminar si falla)."""
+        informes = self._informes_lineas
+        self._informes_lineas = []
+        ruta = ruta_informe_lineas(output_file_path)
+        try:
+            pd.concat(informes, ignore_index=True).to_csv(ruta, index=False, sep=',', lineterminator='\r\n')
+        except Exception as e:
+            print(f"Advertencia: No se pudo guardar el informe de líneas. {e}")
+            return
+        self.stats['lineas']['informe'] = ruta
 
     # --- FUNCIÓN DE SECUENCIA OPTIMIZADA ---
-    def _corregir_secuencia_palmas(self, df: pd.DataFrame) -> pd.DataFrame:
-        self._report_progress(4, 6, "4/5: Corrigiendo secuencia (optimizado)...")
+    def _ordenar_secuencia(self, df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Renumera las palmas de cada (Lote, Linea) por distancia a la palma de menor
+        número. Todas las líneas se resuelven a la vez: una sola pasada del núcleo
+        de distancias y un solo lexsort, sin apply por grupo. Devuelve el orden de
+        las filas tras corregir la secuencia y 'Palma' corregida en ese orden (NaN
+        en las líneas sin ninguna 'Palma' válida).
+        """
+        n = len(df)
+        # Número de línea en el orden de groupby(['Lote', 'Linea'], dropna=False)
+        grupo = df.groupby(['Lote', 'Linea'], dropna=False, sort=True, observed=True).ngroup().to_numpy()
+        n_grupos = int(grupo.max()) + 1 if n else 0
+        palma = df['Palma'].to_numpy(dtype=np.float64, na_value=np.nan)
+        lat = df['Latitud'].to_numpy(dtype=np.float64)
+        lng = df['Longitud'].to_numpy(dtype=np.float64)
+        filas = np.arange(n)
 
-        def reordenar_linea(grupo):
-            grupo_valido = grupo.dropna(subset=['Palma']).copy()
-            if grupo_valido.empty:
-                return grupo 
-            
-            palma_inicio = grupo_valido.loc[grupo_valido['Palma'].idxmin()]
-            lat_inicio = palma_inicio['Latitud']
-            lng_inicio = palma_inicio['Longitud']
-            
-            lats_grupo = grupo['Latitud'].values
-            lngs_grupo = grupo['Longitud'].values
-            
-            distancias = self._haversine_np(lng_inicio, lat_inicio, lngs_grupo, lats_grupo)
-            grupo['distancia_inicio'] = distancias
-            
-            grupo_ordenado = grupo.sort_values(by='distancia_inicio').reset_index(drop=True)
-            
-            grupo_ordenado['Palma_Corregida'] = grupo_ordenado.index + 1
-            return grupo_ordenado
+        # Palma de inicio de cada línea: menor 'Palma' válida (primera en caso de empate)
+        validas = filas[~np.isnan(palma)]
+        orden_validas = validas[np.lexsort((validas, palma[validas], grupo[validas]))]
+        es_primera = np.ones(len(orden_validas), dtype=bool)
+        es_primera[1:] = grupo[orden_validas[1:]] != grupo[orden_validas[:-1]]
+        ancla_grupo = np.full(n_grupos, -1, dtype=np.int64)
+        ancla_grupo[grupo[orden_validas[es_primera]]] = orden_validas[es_primera]
 
-        # --- CÓDIGO CORRECTO (sin include_groups=False) ---
-        df_corregido = df.groupby(['Lote', 'Linea'], dropna=False, group_keys=False).apply(reordenar_linea)
-        
-        df_corregido = df_corregido.reset_index(drop=True)
-        
-        df_corregido['Palma_Original'] = df_corregido['Palma']
-        correcciones_totales = df_corregido[df_corregido['Palma_Original'].notna() & 
-                                            (df_corregido['Palma_Original'] != df_corregido['Palma_Corregida'])].shape[0]
+        ancla = ancla_grupo[grupo]
+        con_ancla = ancla >= 0
+        # Las líneas sin ninguna 'Palma' válida conservan su orden y quedan sin número
+        distancias = np.zeros(n, dtype=np.float64)
+        coordenadas = Coordenadas(lat, lng)
+        con_ancla_filas = filas[con_ancla]
+        distancias[con_ancla_filas] = haversine(coordenadas, ancla[con_ancla_filas], coordenadas, con_ancla_filas)
+
+        orden = np.lexsort((filas, distancias, grupo))
+        grupo_ordenado = grupo[orden]
+        inicio_grupo = np.searchsorted(grupo_ordenado, grupo_ordenado, side='left')
+        palma_corregida = (filas - inicio_grupo + 1).astype(np.float64)
+        palma_corregida[~con_ancla[orden]] = np.nan
+        return orden, palma_corregida
+
+    def _palma_secuencia(self, palma_original: np.ndarray, palma_corregida: np.ndarray) -> np.ndarray:
+        """'Palma' final (entera si no quedan vacíos); cuenta las correcciones en stats."""
+        correcciones_totales = int(np.count_nonzero(~np.isnan(palma_original) & (palma_original != palma_corregida)))
         self.stats['corregidos_secuencia'] = correcciones_totales
-        
-        df_corregido['Palma'] = df_corregido['Palma_Corregida']
-        
-        df_corregido = df_corregido.drop(columns=['Palma_Corregida', 'distancia_inicio', 'Palma_Original'])
-        return df_corregido
 
-    # --- FUNCIÓN PRINCIPAL DE EXPORTACIÓN ---
-    def procesar_y_exportar(self, input_file_path: str, output_file_path: str, finca_id_manual: str) -> Tuple[bool, str]:
-        self.stats = {'original': 0, 'eliminados_exactos': 0, 'eliminados_espaciales': 0, 'corregidos_secuencia': 0, 'final': 0}
-        
-        df = self._cargar_y_normalizar(input_file_path, finca_id_manual)
-        if df is None:
-            self._report_progress(0, 6, "ERROR: Archivo no válido.")
-            return False, "Error al cargar o interpretar el archivo. Verifique el formato y las columnas."
+        if not np.isnan(palma_corregida).any():
+            return palma_corregida.astype(np.int64)
+        return palma_corregida
 
-        df = self._corregir_duplicados_exactos(df)
-        df = self._corregir_duplicados_espaciales(df)
-        df_limpio = self._corregir_secuencia_palmas(df)
-        
-        self._report_progress(5, 6, "5/5: Guardando el archivo corregido...")
-        self.stats['final'] = len(df_limpio)
+    def _componer_nombres(self, df_limpio: pd.DataFrame) -> pd.DataFrame:
+        """
+        Formato antiguo: nombre_spot y nombre_planta a partir del texto leído
+        (Lote, Linea y Palma antes de convertirlos y de corregir la secuencia).
+        """
+        if COLUMNA_LINEA_ORIGINAL not in df_limpio.columns:
+            return df_limpio
+        nombre_spot, nombre_planta = _nombres(
+            df_limpio['lote_id'], df_limpio[COLUMNA_LINEA_ORIGINAL], df_limpio['posicion']
+        )
+        df_limpio = df_limpio.drop(columns=[COLUMNA_LINEA_ORIGINAL])
+        df_limpio['nombre_planta'] = nombre_planta
+        df_limpio['nombre_spot'] = nombre_spot
+        return df_limpio
 
-        df_exportar = df_limpio.rename(columns={
+    def _preparar_exportacion(self, df_limpio: pd.DataFrame) -> pd.DataFrame:
+        """
+        Renombra y ordena las columnas internas al formato de 12 columnas de la API.
+        """
+        df_exportar = self._componer_nombres(df_limpio).rename(columns={
             'Lote': 'lote_id_interno_TEMP', 
             'Linea': 'linea_interno_TEMP',
             'Palma': 'posicion',
@@ -223,12 +466,6 @@ class LimpiezaSpots:
             'Latitud': 'lat'
         })
         
-        columnas_finales = [
-            'nombre_spot', 'lat', 'lng', 'lote_id', 'linea', 'posicion', 
-            'nombre_planta', 'finca_id', 'tipo_poligono_id', 'distancia', 
-            'fecha_siembra', 'tipo_variedad_id'
-        ]
-        
         # Esta lógica ahora SÍ funcionará porque 'linea_interno_TEMP'
         # y 'lote_id_interno_TEMP' siempre se crearán
         if 'lote_id' not in df_exportar.columns:
@@ -236,20 +473,68 @@ class LimpiezaSpots:
         if 'linea' not in df_exportar.columns:
             df_exportar['linea'] = df_exportar['linea_interno_TEMP']
 
-        df_exportar_final = df_exportar[columnas_finales]
+        return df_exportar[self.COLUMNAS_FINALES]
 
-        try:
-            df_exportar_final.to_csv(
+    def _escribir_csv(self, df_limpio: pd.DataFrame, output_file_path: str, filas_por_escritura: int = 100_000):
+        """
+        Escribe el CSV para la API por tramos, avisando del progreso (y permitiendo
+        cancelar) entre tramos. Cada tramo se pasa al formato de la API por separado,
+        así los nombres del formato antiguo nunca existen para todo el archivo a la
+        vez. El resultado es el mismo que un solo to_csv.
+        """
+        total = len(df_limpio)
+        for inicio in range(0, max(total, 1), filas_por_escritura):
+            self._report_progress(5 + inicio / max(total, 1), 6, f"5/5: Guardando el archivo corregido ({inicio}/{total})...")
+            self._preparar_exportacion(df_limpio.iloc[inicio:inicio + filas_por_escritura]).to_csv(
                 output_file_path, 
+                mode='w' if inicio == 0 else 'a',
+                header=inicio == 0,
                 index=False, 
                 sep=',', # Separador de coma para la API
                 lineterminator='\r\n' 
             )
-        except Exception as e:
-            self._report_progress(100, 100, "ERROR: No se pudo guardar el archivo.")
-            return False, f"Error al guardar el archivo limpio: {e}"
 
+    def _exportar_columnar(self, df_limpio: pd.DataFrame, output_file_path: str):
+        """Copia columnar de la salida (no impide terminar si falla)."""
+        ruta = ruta_columnar(output_file_path, self.formato_columnar)
+        self._report_progress(5.8, 6, f"5/5: Guardando copia columnar ({self.formato_columnar})...")
+        with self._medir('columnar', len(df_limpio)) as etapa:
+            try:
+                escribir_columnar(self._preparar_exportacion(df_limpio), ruta)
+            except Exception as e:
+                print(f"Advertencia: No se pudo guardar la copia columnar. {e}")
+                return
+            self.stats['columnar'] = ruta
+            etapa['filas_salida'] = len(df_limpio)
+
+    def _exportar_delta(self, output_file_path: str):
+        """Huellas de la salida y delta contra la última subida (no impide terminar si falla)."""
+        self._report_progress(5.9, 6, "5/5: Comparando con la última subida...")
+        with self._medir('delta', self.stats['final']) as etapa:
+            try:
+                delta = exportar_delta(output_file_path, self.directorio_instantaneas)
+            except Exception as e:
+                print(f"Advertencia: No se pudo generar el delta. {e}")
+                delta = None
+            self.stats['delta'] = delta
+            if delta:
+                etapa['filas_salida'] = delta['agregados'] + delta['modificados'] + delta['eliminados']
+
+    def _generar_reporte(self, output_file_path: str) -> str:
         total_eliminados = self.stats['eliminados_exactos'] + self.stats['eliminados_espaciales']
+        delta = self.stats.get('delta')
+        linea_delta = ""
+        if delta:
+            linea_delta = (f"\n        - 🔁 Cambios desde la última subida: {delta['agregados']} nuevos, "
+                           f"{delta['modificados']} modificados, {delta['eliminados']} eliminados")
+        fincas = self.stats.get('fincas')
+        if fincas:
+            linea_delta += (f"\n        - 🏡 Fincas en el archivo: {len(fincas)} (una salida por finca; "
+                            f"resumen en {os.path.basename(self.stats['resumen_fincas'])})")
+        lineas = self.stats.get('lineas')
+        if lineas:
+            linea_delta = (f"\n        - 📏 Palmas fuera de su línea: {lineas['sospechosas']} "
+                           f"({lineas['reasignadas']} reasignadas a la línea vecina)") + linea_delta
         reporte = f"""
         ✅ Tareas completadas con ÉXITO.
         
@@ -257,9 +542,130 @@ class LimpiezaSpots:
         ✨ Registros finales listos: {self.stats['final']}
         
         - 🗑️ Duplicados eliminados: {total_eliminados}
-        - ✏️ Palmas Reordenadas: {self.stats['corregidos_secuencia']}
+        - ✏️ Palmas Reordenadas: {self.stats['corregidos_secuencia']}{linea_delta}
         
         Archivo listo para API: {os.path.basename(output_file_path)}
         """
+        return reporte
+
+    def _medir(self, nombre: str, filas_entrada: int | None = None):
+        """Contexto que registra tiempo, memoria y filas de una etapa en stats['etapas']."""
+        return medir_etapa(self.stats.setdefault('etapas', {}), nombre, filas_entrada)
+
+    def _guardar_perfil(self, input_file_path: str, output_file_path: str, exito: bool):
+        perfil = {
+            'entrada': input_file_path,
+            'salida': output_file_path,
+            'exito': exito,
+            'motor_espacial': self.motor_espacial,
+            'workers': self.workers,
+            'filas_por_bloque': self.filas_por_bloque,
+            'validar_lineas': self.validar_lineas,
+            'stats': self.stats,
+        }
+        try:
+            with open(self.perfil_json, 'w', encoding='utf-8') as f:
+                json.dump(perfil, f, ensure_ascii=False, indent=2, default=str)
+        except Exception as e:
+            print(f"Advertencia: No se pudo guardar el perfil. {e}")
+
+    def pipeline(self, etapas=None) -> Pipeline:
+        """
+        Pipeline con las etapas indicadas (nombres de src.pipeline.ETAPAS, funciones
+        propias o un nombre de PIPELINES, p. ej. 'duplicados' o 'validar'); por
+        defecto, las de procesar_y_exportar.
+        """
+        return Pipeline(self, self._etapas_limpieza() if etapas is None else etapas)
+
+    def _etapas_limpieza(self) -> list[str]:
+        """Etapas 2 a 4 de procesar_y_exportar."""
+        etapas = ['duplicados_exactos', 'duplicados_espaciales', 'lineas', 'secuencia']
+        if not self.validar_lineas:
+            etapas.remove('lineas')
+        return etapas
+
+    # --- FUNCIÓN PRINCIPAL DE EXPORTACIÓN ---
+    def _reiniciar_stats(self):
+        self.stats = {'original': 0, 'eliminados_exactos': 0, 'eliminados_espaciales': 0, 'corregidos_secuencia': 0, 'final': 0,
+                      'etapas': {}}
+        self._informes_lineas = []
+
+    def procesar_y_exportar(self, input_file_path: str, output_file_path: str, finca_id_manual: str) -> Tuple[bool, str]:
+        self._reiniciar_stats()
+        self._cancelado.clear()
+        iniciar_tracemalloc = self.perfil_memoria and not tracemalloc.is_tracing()
+        if iniciar_tracemalloc:
+            tracemalloc.start()
+        perfilador = cProfile.Profile() if self.perfil_cprofile else None
+        previos = _archivos_salida(output_file_path)
+        try:
+            if perfilador:
+                perfilador.enable()
+            exito, reporte = self._procesar_y_exportar(input_file_path, output_file_path, finca_id_manual)
+        except ProcesoCancelado:
+            # Lo escrito antes de cancelar (CSV a medias, informes) no es una salida válida
+            for ruta, modificado in _archivos_salida(output_file_path).items():
+                if previos.get(ruta) != modificado:
+                    os.remove(ruta)
+            exito, reporte = False, "Proceso cancelado por el usuario."
+        finally:
+            if perfilador:
+                perfilador.disable()
+                perfilador.dump_stats(self.perfil_cprofile)
+            if iniciar_tracemalloc:
+                tracemalloc.stop()
+
+        if self.perfil_json:
+            self._guardar_perfil(input_file_path, output_file_path, exito)
+        return exito, reporte
+
+    def _procesar_y_exportar(self, input_file_path: str, output_file_path: str, finca_id_manual: str) -> Tuple[bool, str]:
+        if self.filas_por_bloque and os.path.splitext(input_file_path)[1].lower() == '.csv':
+            ok, error = procesar_por_bloques(self, input_file_path, output_file_path, finca_id_manual)
+            if not ok:
+                return False, error
+            if self.validar_lineas:
+                self._exportar_lineas(output_file_path)
+            if self.formato_columnar:
+                print("Advertencia: La copia columnar no está disponible en el modo por bloques.")
+            if self.directorio_instantaneas:
+                self._exportar_delta(output_file_path)
+            self._report_progress(6, 6, "¡PROCESO TERMINADO! Revisar reporte.")
+            return True, self._generar_reporte(output_file_path)
+        
+        with self._medir('carga') as etapa:
+            df = self._cargar_y_normalizar(input_file_path, finca_id_manual)
+            etapa['filas_salida'] = 0 if df is None else len(df)
+        if df is None:
+            self._report_progress(0, 6, "ERROR: Archivo no válido.")
+            return False, "Error al cargar o interpretar el archivo. Verifique el formato y las columnas."
+
+        # Exportación consolidada de varias fincas: cada una se limpia por separado
+        if df['finca_id'].nunique(dropna=False) > 1:
+            return procesar_fincas(self, df, output_file_path)
+        return self._limpiar_y_exportar(df, output_file_path)
+
+    def _limpiar_y_exportar(self, df: pd.DataFrame, output_file_path: str) -> Tuple[bool, str]:
+        """Etapas 2 a 5 sobre una finca ya cargada y normalizada."""
+        # Con caché o varios procesos, las etapas 3 y 4 van lote a lote (ver src.pipeline)
+        df_limpio = self.pipeline(self._etapas_limpieza()).ejecutar(df).df
+        
+        self._report_progress(5, 6, "5/5: Guardando el archivo corregido...")
+        self.stats['final'] = len(df_limpio)
+
+        with self._medir('exportacion', len(df_limpio)) as etapa:
+            try:
+                self._escribir_csv(df_limpio, output_file_path)
+            except Exception as e:
+                self._report_progress(100, 100, "ERROR: No se pudo guardar el archivo.")
+                return False, f"Error al guardar el archivo limpio: {e}"
+            etapa['filas_salida'] = len(df_limpio)
+
+        if self.validar_lineas:
+            self._exportar_lineas(output_file_path)
+        if self.formato_columnar:
+            self._exportar_columnar(df_limpio, output_file_path)
+        if self.directorio_instantaneas:
+            self._exportar_delta(output_file_path)
         self._report_progress(6, 6, "¡PROCESO TERMINADO! Revisar reporte.")
-        return True, reporte
\ No newline at end of file
+        return True, self._generar_reporte(output_file_path)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Ejecución por lote de la etapa 3 (duplicados espaciales) en un
+ProcessPoolExecutor, con resultado idéntico a la ejecución en un solo núcleo.
+Con caché (src.cache) el agrupamiento de cada lote solo se calcula si su
+contenido cambió desde una ejecución anterior.
+
+La etapa del pipeline (src.pipeline) llama a `etiquetas_por_lote` cuando el
+limpiador tiene caché o varios procesos.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from .cache import huella
+from .motor_espacial import componentes_conexas, margen_vecindad
+
+
+def _particiones_por_lote(df: pd.DataFrame) -> list[np.ndarray]:
+    """Índices de fila de cada lote, en el orden de groupby('Lote', dropna=False)."""
+    codigo = df.groupby('Lote', dropna=False, sort=True, observed=True).ngroup().to_numpy()
+    orden = np.argsort(codigo, kind='stable')
+    cortes = np.flatnonzero(np.diff(codigo[orden])) + 1
+    return np.split(orden, cortes)
+
+
+def _raices_lote(limpiador, coordenadas: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Agrupa un lote más su halo. 'raiz' es, para cada punto, la posición (dentro del
+    lote con halo) del primer punto de su cluster.
+    """
+    etiquetas = limpiador._etiquetar_clusters(coordenadas[:, 0], coordenadas[:, 1])
+    _, primeros, inversa = np.unique(etiquetas, return_index=True, return_inverse=True)
+    return {'raiz': primeros[inversa.ravel()]}
+
+
+def _resolver_lotes(limpiador, mapear, copia, funcion, datos_lote, n_lotes: int, paso: int, mensaje: str,
+                    claves: list[str] | None = None) -> list[dict]:
+    """
+    `funcion(copia, datos_lote(i))` para cada lote, en orden. Con `claves` solo se
+    calculan (con `mapear`) los lotes que no están en `limpiador.cache`.
+    """
+    cache = limpiador.cache if claves else None
+    resultados = [cache.obtener(clave) for clave in claves] if cache else [None] * n_lotes
+    pendientes = [i for i, resultado in enumerate(resultados) if resultado is None]
+    hechos = len(resultados) - len(pendientes)
+    calculados = mapear(funcion, repeat(copia), (datos_lote(i) for i in pendientes)) if pendientes else []
+    for i, resultado in zip(pendientes, calculados):
+        resultados[i] = resultado
+        if cache:
+            cache.guardar(claves[i], **resultado)
+        hechos += 1
+        limpiador._report_progress(
+            paso + 0.9 * hechos / len(resultados), 6, f"{mensaje} ({hechos}/{len(resultados)})..."
+        )
+    return resultados
+
+
+def _etiquetas_lotes(limpiador, mapear, copia, df: pd.DataFrame, particiones: list[np.ndarray]) -> np.ndarray:
+    """
+    Etiquetas de cluster globales calculadas lote a lote.
+
+    Cada lote se agrupa junto con su halo: los puntos de otros lotes dentro de la
+    caja del lote ampliada en `umbral_metros`. Así toda pareja cercana (también
+    entre lotes) aparece en al menos una partición, y unir las componentes de
+    todas las particiones da exactamente las componentes de toda la finca.
+    """
+    lat = df['Latitud'].to_numpy(dtype=np.float64)
+    lng = df['Longitud'].to_numpy(dtype=np.float64)
+    margen_lat, margen_lng = np.degrees(margen_vecindad(np.radians(lat), copia.umbral_metros))
+
+    trabajos = []
+    for indices in particiones:
+        lat_lote, lng_lote = lat[indices], lng[indices]
+        en_caja = (
+            (lat >= lat_lote.min() - margen_lat) & (lat <= lat_lote.max() + margen_lat) &
+            (lng >= lng_lote.min() - margen_lng) & (lng <= lng_lote.max() + margen_lng)
+        )
+        en_caja[indices] = False
+        con_halo = np.concatenate([indices, np.flatnonzero(en_caja)])
+        trabajos.append(con_halo)
+
+    # La clave depende solo de las coordenadas del lote y su halo (en orden) y del umbral:
+    # cambiar finca_id u otros campos no invalida la caché
+    claves = None
+    if limpiador.cache:
+        claves = [huella(lat[t], lng[t], umbral_metros=copia.umbral_metros, motor=copia.motor_espacial)
+                  for t in trabajos]
+    resultados = _resolver_lotes(
+        limpiador, mapear, copia, _raices_lote, lambda i: np.column_stack([lat[trabajos[i]], lng[trabajos[i]]]),
+        len(trabajos), 3, "3/5: Agrupando errores de GPS por lote", claves
+    )
+
+    origen = np.concatenate(trabajos)
+    destino = np.concatenate([t[resultado['raiz']] for t, resultado in zip(trabajos, resultados)])
+    raiz = componentes_conexas(len(df), origen, destino)
+    _, etiquetas = np.unique(raiz, return_inverse=True)
+    return etiquetas
+
+
+@contextmanager
+def _repartidor(workers: int):
+    """`map` en `workers` procesos (en este si es uno). Al cancelar o fallar no arranca lo pendiente."""
+    if workers <= 1:
+        yield map
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            yield pool.map
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def _copia(limpiador):
+    # Copia sin callback: el de la GUI no se puede enviar a otro proceso
+    return type(limpiador)(umbral_metros=limpiador.umbral_metros, motor_espacial=limpiador.motor_espacial)
+
+
+def _procesos(limpiador) -> str:
+    return f" ({limpiador.workers} procesos)" if limpiador.workers > 1 else ""
+
+
+def etiquetas_por_lote(limpiador, df: pd.DataFrame) -> np.ndarray:
+    """
+    Etapa 3 lote a lote sobre `df` (Latitud, Longitud y Lote): en
+    `limpiador.workers` procesos y con los lotes sin cambios tomados de
+    `limpiador.cache`. Las etiquetas son las de agrupar toda la finca a la vez.
+    Deja los aciertos y fallos de la caché en stats['cache'].
+    """
+    # El tiempo de CPU registrado en stats['etapas'] es solo el del proceso principal
+    if limpiador.cache:
+        limpiador.cache.aciertos = limpiador.cache.fallos = 0
+    limpiador._report_progress(3, 6, f"3/5: Agrupando errores de GPS por lote{_procesos(limpiador)}...")
+    with _repartidor(limpiador.workers) as mapear:
+        etiquetas = _etiquetas_lotes(limpiador, mapear, _copia(limpiador), df, _particiones_por_lote(df))
+
+    if limpiador.cache:
+        limpiador.stats['cache'] = {'aciertos': limpiador.cache.aciertos, 'fallos': limpiador.cache.fallos}
+        limpiador.cache.recortar()
+    return etiquetas
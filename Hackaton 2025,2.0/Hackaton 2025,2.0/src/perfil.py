@@ -0,0 +1,80 @@
+"""
+Medición por etapa (tiempo real, tiempo de CPU, memoria y filas) para
+`LimpiezaSpots.stats['etapas']`.
+"""
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+# Pico de memoria (bytes absolutos) ya visto por cada medición abierta, de fuera
+# a dentro: reset_peak() es global y una etapa anidada borraría el de la exterior
+_picos_abiertos: list[int] = []
+
+
+def rss_pico_mb() -> float | None:
+    """Pico de memoria residente del proceso en MB (None si el sistema no lo expone)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss viene en bytes en macOS y en KiB en Linux
+    return round(pico / MB if sys.platform == 'darwin' else pico / 1024, 1)
+
+
+def _acumular(anterior: dict, nuevo: dict) -> dict:
+    """Suma dos mediciones de la misma etapa (modo por bloques: una por lote)."""
+    combinado = dict(anterior)
+    for clave, valor in nuevo.items():
+        previo = anterior.get(clave)
+        if valor is None or previo is None:
+            combinado[clave] = valor if previo is None else previo
+        elif clave in ('rss_pico_mb', 'memoria_pico_mb'):
+            combinado[clave] = max(previo, valor)
+        else:
+            combinado[clave] = round(previo + valor, 4)
+    return combinado
+
+
+@contextmanager
+def medir_etapa(etapas: dict, nombre: str, filas_entrada: int | None = None):
+    """
+    Mide el bloque `with` y guarda el resultado en `etapas[nombre]`. Devuelve un
+    dict en el que el llamador puede anotar `filas_salida`.
+
+    Si tracemalloc está activo se añaden `memoria_pico_mb` y `memoria_delta_mb`
+    (memoria de Python/NumPy asignada durante la etapa). Las mediciones se pueden
+    anidar: el pico de la exterior incluye el de las interiores.
+    """
+    registro = {'filas_entrada': filas_entrada, 'filas_salida': None}
+    memoria = tracemalloc.is_tracing()
+    if memoria:
+        if _picos_abiertos:
+            _picos_abiertos[-1] = max(_picos_abiertos[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        memoria_inicial = tracemalloc.get_traced_memory()[0]
+        _picos_abiertos.append(0)
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+    try:
+        yield registro
+    finally:
+        registro['segundos'] = round(time.perf_counter() - inicio, 4)
+        registro['cpu_segundos'] = round(time.process_time() - inicio_cpu, 4)
+        registro['rss_pico_mb'] = rss_pico_mb()
+        if memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            pico = max(pico, _picos_abiertos.pop())
+            if _picos_abiertos:
+                _picos_abiertos[-1] = max(_picos_abiertos[-1], pico)
+            registro['memoria_pico_mb'] = round((pico - memoria_inicial) / MB, 2)
+            registro['memoria_delta_mb'] = round((actual - memoria_inicial) / MB, 2)
+        if nombre in etapas:
+            registro = _acumular(etapas[nombre], registro)
+        etapas[nombre] = registro
@@ -0,0 +1,267 @@
+"""
+Pipeline de limpieza con las etapas declaradas de antemano.
+
+    resultado = limpiador.pipeline(['duplicados_exactos', 'duplicados_espaciales']).ejecutar(df)
+    resultado.etapas['duplicados_espaciales']['eliminadas']   # las etapas corren aquí
+    resultado.df        # el DataFrame se construye aquí, una sola vez
+
+`ejecutar` solo arma el plan: las etapas corren la primera vez que se pide
+algo del resultado, y una sola vez.
+
+Las etapas trabajan sobre un almacén de columnas compartido (`Columnas`): el
+DataFrame normalizado no se copia entre etapas; solo cambian la selección de
+filas vigente (posiciones en el original, en el orden actual) y las columnas
+que alguna etapa reescribió.
+
+- Las etapas que filtran filas (duplicados exactos y espaciales) solo reducen
+  la selección: las consecutivas quedan en una sola máscara, sin DataFrames
+  intermedios ni reset_index por etapa.
+- Las etapas leen solo las columnas que usan (`Columnas.vista`).
+- Con caché o varios procesos en el limpiador, la etapa de duplicados
+  espaciales trabaja lote a lote (src.paralelo), con el mismo resultado. La
+  secuencia es vectorizada y siempre corre en este proceso: repartirla cuesta
+  más (arrancar procesos y enviar los lotes) que calcularla. El modo por
+  bloques (src.streaming) también pasa por estas etapas.
+- Una etapa nueva es una función `etapa(limpiador, columnas) -> dict | None`;
+  se pasa tal cual en la lista o se registra en `ETAPAS`.
+"""
+import numpy as np
+import pandas as pd
+
+from .paralelo import etiquetas_por_lote
+
+# Columnas que leen la revisión de líneas y la secuencia
+COLUMNAS_SECUENCIA = ['Lote', 'Linea', 'Palma', 'Latitud', 'Longitud']
+
+
+class Columnas:
+    """
+    Almacén compartido por las etapas: `base` (el DataFrame de entrada, sin
+    copiar), `filas` (posiciones de `base` seleccionadas, en el orden actual) y
+    las columnas reescritas, alineadas con `filas`.
+    """
+
+    def __init__(self, base: pd.DataFrame):
+        self.base = base
+        self.filas = np.arange(len(base))
+        self._reescritas = {}
+
+    def __len__(self) -> int:
+        return len(self.filas)
+
+    def seleccionar(self, posiciones: np.ndarray):
+        """Reduce o reordena la selección; `posiciones` (o una máscara) es relativa a la selección vigente."""
+        self.filas = self.filas[posiciones]
+        for nombre, valores in self._reescritas.items():
+            self._reescritas[nombre] = valores[posiciones]
+
+    def reescribir(self, nombre: str, valores):
+        """Sustituye los valores de `nombre` en las filas seleccionadas (mismo largo que la selección)."""
+        valores = valores.array if isinstance(valores, pd.Series) else np.asarray(valores)
+        if len(valores) != len(self):
+            raise ValueError(f"'{nombre}' tiene {len(valores)} valores para {len(self)} filas")
+        self._reescritas[nombre] = valores
+
+    def columna(self, nombre: str) -> pd.Series:
+        if nombre in self._reescritas:
+            return pd.Series(self._reescritas[nombre], name=nombre)
+        return self.base[nombre].iloc[self.filas].reset_index(drop=True)
+
+    def vista(self, nombres: list[str]) -> pd.DataFrame:
+        """DataFrame con las columnas pedidas que existan, solo de las filas seleccionadas."""
+        return pd.DataFrame({nombre: self.columna(nombre) for nombre in nombres if nombre in self.base.columns})
+
+    def mascara(self) -> np.ndarray:
+        """Filas de `base` que siguen seleccionadas."""
+        mascara = np.zeros(len(self.base), dtype=bool)
+        mascara[self.filas] = True
+        return mascara
+
+    def materializar(self) -> pd.DataFrame:
+        df = self.base.iloc[self.filas].reset_index(drop=True)
+        for nombre, valores in self._reescritas.items():
+            df[nombre] = valores
+        return df
+
+
+def duplicados_exactos(limpiador, columnas: Columnas) -> dict:
+    limpiador._report_progress(2, 6, "2/5: Eliminando duplicados idénticos (rápido)...")
+    repetidas = columnas.vista(['Latitud', 'Longitud']).duplicated(keep='first').to_numpy()
+    columnas.seleccionar(~repetidas)
+    limpiador.stats['eliminados_exactos'] = int(repetidas.sum())
+    return {'eliminadas': limpiador.stats['eliminados_exactos']}
+
+
+def _por_lote(columnas: Columnas) -> bool:
+    return columnas.columna('Lote').nunique(dropna=False) > 1
+
+
+def duplicados_espaciales(limpiador, columnas: Columnas) -> dict:
+    if not len(columnas):
+        etiquetas = np.empty(0, dtype=np.int64)
+    elif limpiador.cache or (limpiador.workers > 1 and _por_lote(columnas)):
+        etiquetas = etiquetas_por_lote(limpiador, columnas.vista(['Latitud', 'Longitud', 'Lote']))
+    else:
+        etiquetas = limpiador._agrupar_espacial(columnas.columna('Latitud').to_numpy(),
+                                                columnas.columna('Longitud').to_numpy())
+    # Primer registro de cada cluster, en orden de etiqueta
+    _, primeros = np.unique(etiquetas, return_index=True)
+    limpiador.stats['eliminados_espaciales'] = len(columnas) - len(primeros)
+    columnas.seleccionar(primeros)
+    return {'eliminadas': limpiador.stats['eliminados_espaciales']}
+
+
+def lineas(limpiador, columnas: Columnas) -> dict:
+    """Revisión de líneas; sin `validar_lineas` en el limpiador solo marca."""
+    # Con validar_lineas='reasignar' cambian la línea y, en el formato nuevo, los nombres
+    reescribibles = ['Linea', limpiador.COLUMNA_LINEA_ORIGINAL, 'nombre_spot', 'nombre_planta']
+    vista = columnas.vista(COLUMNAS_SECUENCIA + reescribibles[1:])
+    limpiador._revisar_lineas(vista)
+    informe = limpiador._informes_lineas[-1]
+    reasignadas = int(informe['reasignada'].sum())
+    if reasignadas:
+        for nombre in reescribibles:
+            if nombre in vista.columns:
+                columnas.reescribir(nombre, vista[nombre])
+    return {'sospechosas': len(informe), 'reasignadas': reasignadas, 'informe': informe}
+
+
+def secuencia(limpiador, columnas: Columnas) -> dict:
+    vista = columnas.vista(COLUMNAS_SECUENCIA)
+    # Etapa vectorizada y barata: también con varios procesos se resuelve aquí
+    limpiador._report_progress(4, 6, "4/5: Corrigiendo secuencia (optimizado)...")
+    orden, palma_corregida = limpiador._ordenar_secuencia(vista)
+    palma_original = vista['Palma'].to_numpy(dtype=np.float64, na_value=np.nan)[orden]
+    columnas.seleccionar(orden)
+    columnas.reescribir('Palma', limpiador._palma_secuencia(palma_original, palma_corregida))
+    return {'corregidas': limpiador.stats['corregidos_secuencia']}
+
+
+ETAPAS = {etapa.__name__: etapa for etapa in (duplicados_exactos, duplicados_espaciales, lineas, secuencia)}
+
+# Etapas que solo quitan filas y no dependen del resto de columnas (el modo por bloques las corre sobre toda la finca)
+ETAPAS_FILTRADO = ('duplicados_exactos', 'duplicados_espaciales')
+
+# Pipelines con nombre; cualquier otra lista de etapas también sirve
+PIPELINES = {
+    'completo': ('duplicados_exactos', 'duplicados_espaciales', 'lineas', 'secuencia'),
+    'duplicados': ('duplicados_exactos', 'duplicados_espaciales'),
+    'validar': ('lineas',),
+}
+
+
+class ResultadoPipeline:
+    """
+    Plan de un pipeline sobre un DataFrame; las etapas corren la primera vez
+    que se pide algo del resultado.
+
+    `etapas`: por etapa, filas de entrada y salida, `filas` (posiciones de la
+    entrada que quedaban tras ella) y lo que devolvió la etapa. `df` se
+    construye la primera vez que se pide.
+    """
+
+    def __init__(self, pipeline: 'Pipeline', df: pd.DataFrame):
+        self._pipeline = pipeline
+        self._limpiador = pipeline.limpiador
+        self._entrada = df
+        self._columnas = None
+        self._etapas = None
+        self._df = None
+
+    @property
+    def ejecutado(self) -> bool:
+        return self._etapas is not None
+
+    def _ejecutar(self) -> Columnas:
+        if self._etapas is None:
+            self._columnas, self._etapas = self._pipeline._aplicar(self._entrada)
+            self._entrada = None
+        return self._columnas
+
+    def __len__(self) -> int:
+        return len(self._ejecutar())
+
+    @property
+    def etapas(self) -> dict[str, dict]:
+        self._ejecutar()
+        return self._etapas
+
+    @property
+    def filas(self) -> np.ndarray:
+        """Posiciones de la entrada que quedan, en el orden de salida."""
+        return self._ejecutar().filas
+
+    @property
+    def mascara(self) -> np.ndarray:
+        """Filas de la entrada que conservan todas las etapas de filtrado juntas."""
+        return self._ejecutar().mascara()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        if self._df is None:
+            self._df = self._ejecutar().materializar()
+        return self._df
+
+    def exportar(self, ruta: str):
+        """CSV con el formato de la API (y <salida>_LINEAS.csv si corrió la revisión de líneas)."""
+        self._limpiador._escribir_csv(self.df, ruta)
+        if self._limpiador._informes_lineas:
+            self._limpiador._exportar_lineas(ruta)
+
+
+class Pipeline:
+    """
+    Etapas de `LimpiezaSpots` en el orden dado: nombres de `ETAPAS`, funciones
+    propias o el nombre de uno de `PIPELINES`. Cada etapa se mide en
+    stats['etapas'] con su nombre.
+    """
+
+    def __init__(self, limpiador, etapas=PIPELINES['completo']):
+        if isinstance(etapas, str):
+            if etapas not in PIPELINES:
+                raise ValueError(f"pipeline debe ser uno de {tuple(PIPELINES)}, no '{etapas}'")
+            etapas = PIPELINES[etapas]
+        self.limpiador = limpiador
+        self.etapas = []
+        for etapa in etapas:
+            if callable(etapa):
+                self.etapas.append((etapa.__name__, etapa))
+            elif etapa in ETAPAS:
+                self.etapas.append((etapa, ETAPAS[etapa]))
+            else:
+                raise ValueError(f"Etapa desconocida '{etapa}'; las disponibles son {tuple(ETAPAS)}")
+
+    @property
+    def nombres(self) -> list[str]:
+        return [nombre for nombre, _ in self.etapas]
+
+    def ejecutar(self, df: pd.DataFrame) -> ResultadoPipeline:
+        """
+        Plan de las etapas sobre `df` (ya normalizado, de una finca), que no se
+        modifica. Nada corre hasta que se pide algo del resultado.
+        """
+        return ResultadoPipeline(self, df)
+
+    def _aplicar(self, df: pd.DataFrame) -> tuple[Columnas, dict[str, dict]]:
+        columnas = Columnas(df)
+        resultados = {}
+        for nombre, etapa in self.etapas:
+            filas_entrada = len(columnas)
+            with self.limpiador._medir(nombre, filas_entrada) as medida:
+                resultado = etapa(self.limpiador, columnas) or {}
+                medida['filas_salida'] = len(columnas)
+            resultados[nombre] = {'filas_entrada': filas_entrada, 'filas_salida': len(columnas),
+                                  'filas': columnas.filas, **resultado}
+        return columnas, resultados
+
+    def desde_archivo(self, ruta: str, finca_id_manual: str) -> ResultadoPipeline:
+        """Carga y normaliza `ruta` (stats nuevas) y arma el plan de las etapas sobre él."""
+        self.limpiador._reiniciar_stats()
+        with self.limpiador._medir('carga') as medida:
+            df = self.limpiador._cargar_y_normalizar(ruta, finca_id_manual)
+            medida['filas_salida'] = 0 if df is None else len(df)
+        if df is None:
+            raise ValueError("Error al cargar o interpretar el archivo. Verifique el formato y las columnas.")
+        if df['finca_id'].nunique(dropna=False) > 1:
+            raise ValueError("El pipeline trabaja sobre una sola finca; use procesar_y_exportar para archivos con varias.")
+        return self.ejecutar(df)
@@ -0,0 +1,336 @@
+"""
+Servicio HTTP de limpieza (Flask) para procesar fincas en un servidor central.
+
+    POST   /trabajos                   archivo (multipart 'file' o cuerpo crudo) + finca_id -> 202 con id
+                                       (con cuerpo crudo, finca_id y nombre van en la URL)
+    GET    /trabajos/<id>              estado, progreso (%), mensaje y stats
+    GET    /trabajos/<id>/resultado    CSV limpio (respuesta en streaming)
+    GET    /trabajos/<id>/delta        CSV delta, si el motor lo generó
+    GET    /trabajos/<id>/lineas       informe de palmas fuera de su línea, si se pidió
+    DELETE /trabajos/<id>              cancela el trabajo
+    GET    /salud                      trabajos activos y capacidad
+
+Los trabajos se ejecutan en un ProcessPoolExecutor acotado, así las etapas
+pesadas no bloquean a los hilos que atienden peticiones. El progreso de cada
+trabajo llega desde `update_callback` a través de un diccionario compartido.
+Cuando hay demasiados trabajos pendientes se responde 429 con Retry-After.
+
+Con gunicorn, un solo proceso con varios hilos (el estado de los trabajos vive
+en memoria de ese proceso):
+    gunicorn -w 1 --threads 8 -b 0.0.0.0:8000 "src.servicio:crear_app()"
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import Flask, abort, jsonify, request, send_file
+from werkzeug.utils import secure_filename
+
+from .columnar import EXTENSIONES as EXTENSIONES_COLUMNARES
+from .delta import ruta_delta
+from .lineas import ruta_informe as ruta_informe_lineas
+from .motor_limpieza import LimpiezaSpots
+
+TAMANO_BLOQUE = 1024 * 1024
+EXTENSIONES = ('.csv', '.xlsx') + EXTENSIONES_COLUMNARES
+
+
+def _ejecutar_trabajo(id_trabajo: str, entrada: str, salida: str, finca_id: str, opciones: dict,
+                      progreso, cancelaciones) -> tuple[bool, str, dict]:
+    """Se ejecuta en un proceso del pool. `progreso` y `cancelaciones` son dicts de un Manager."""
+    def avisar(porcentaje: int, mensaje: str):
+        progreso[id_trabajo] = (porcentaje, mensaje)
+        # La cancelación pedida por HTTP se comprueba en cada aviso de progreso
+        if cancelaciones.get(id_trabajo):
+            limpiador.cancelar()
+
+    limpiador = LimpiezaSpots(update_callback=avisar, **opciones)
+    ok, reporte = limpiador.procesar_y_exportar(entrada, salida, finca_id)
+    return ok, reporte.strip(), limpiador.stats
+
+
+class Trabajo:
+    def __init__(self, id_trabajo: str, directorio: str, nombre: str, finca_id: str):
+        self.id = id_trabajo
+        self.directorio = directorio
+        self.nombre = nombre
+        self.finca_id = finca_id
+        self.entrada = os.path.join(directorio, nombre)
+        self.salida = os.path.join(directorio, f"{os.path.splitext(nombre)[0]}_LIMPIAS.csv")
+        self.estado = 'en_cola'
+        self.reporte = ''
+        self.stats = {}
+        self.creado = time.time()
+        self.terminado = None
+        self.futuro = None
+
+    def como_dict(self, progreso: tuple[int, str] | None) -> dict:
+        porcentaje, mensaje = progreso or (0, '')
+        if self.estado == 'terminado':
+            porcentaje = 100
+        return {
+            'id': self.id,
+            'archivo': self.nombre,
+            'finca_id': self.finca_id,
+            'estado': self.estado,
+            'progreso': porcentaje,
+            'mensaje': mensaje,
+            'reporte': self.reporte,
+            'stats': self.stats,
+        }
+
+
+class ServicioLimpieza:
+    """Cola de trabajos de limpieza en un pool de procesos de tamaño fijo."""
+
+    def __init__(self, directorio: str, workers: int = 2, max_pendientes: int | None = None,
+                 retencion_horas: float = 24, opciones: dict | None = None):
+        self.directorio = directorio
+        self.workers = max(1, int(workers))
+        self.max_pendientes = max_pendientes or self.workers * 4
+        self.retencion_segundos = retencion_horas * 3600
+        self.opciones = opciones or {}
+        self.trabajos: dict[str, Trabajo] = {}
+        self._cerrojo = threading.Lock()
+        self._pool = None
+        self._manager = None
+        os.makedirs(directorio, exist_ok=True)
+
+    def _iniciar_pool(self):
+        # 'spawn': hacer fork de un servidor con hilos puede dejar cerrojos tomados
+        contexto = multiprocessing.get_context('spawn')
+        self._manager = contexto.Manager()
+        self.progreso = self._manager.dict()
+        self.cancelaciones = self._manager.dict()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=contexto)
+
+    def pendientes(self) -> int:
+        return sum(trabajo.estado in ('en_cola', 'procesando') for trabajo in self.trabajos.values())
+
+    def nuevo(self, nombre: str, finca_id: str) -> Trabajo | None:
+        """Reserva un trabajo y su carpeta, o None si la cola está llena."""
+        with self._cerrojo:
+            self._purgar()
+            if self.pendientes() >= self.max_pendientes:
+                return None
+            id_trabajo = uuid.uuid4().hex
+            directorio = os.path.join(self.directorio, id_trabajo)
+            os.makedirs(directorio)
+            trabajo = Trabajo(id_trabajo, directorio, nombre, finca_id)
+            self.trabajos[id_trabajo] = trabajo
+            return trabajo
+
+    def encolar(self, trabajo: Trabajo):
+        """Envía el trabajo al pool; si falla, el trabajo sigue reservado (ver `descartar`)."""
+        with self._cerrojo:
+            if self._pool is None:
+                self._iniciar_pool()
+            try:
+                trabajo.futuro = self._pool.submit(
+                    _ejecutar_trabajo, trabajo.id, trabajo.entrada, trabajo.salida, trabajo.finca_id,
+                    self.opciones, self.progreso, self.cancelaciones
+                )
+            except BrokenProcessPool:
+                # Un proceso del pool murió: el siguiente trabajo arranca uno nuevo
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                raise
+        trabajo.futuro.add_done_callback(lambda futuro: self._terminar(trabajo, futuro))
+
+    def descartar(self, trabajo: Trabajo):
+        """Libera un trabajo reservado que no llegó a encolarse (p. ej. subida fallida)."""
+        with self._cerrojo:
+            self.trabajos.pop(trabajo.id, None)
+        shutil.rmtree(trabajo.directorio, ignore_errors=True)
+
+    def cerrar(self):
+        """Detiene el pool y el Manager (los trabajos en curso se esperan)."""
+        with self._cerrojo:
+            pool, manager = self._pool, self._manager
+            self._pool = self._manager = None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
+
+    def _terminar(self, trabajo: Trabajo, futuro):
+        if futuro.cancelled():
+            estado, reporte, stats = 'cancelado', "Proceso cancelado por el usuario.", {}
+        else:
+            try:
+                ok, reporte, stats = futuro.result()
+                if ok:
+                    estado = 'terminado'
+                else:
+                    estado = 'cancelado' if self.cancelaciones.get(trabajo.id) else 'error'
+            except Exception as e:
+                estado, reporte, stats = 'error', f"{type(e).__name__}: {e}", {}
+        with self._cerrojo:
+            trabajo.estado, trabajo.reporte, trabajo.stats = estado, reporte, stats
+            trabajo.terminado = time.time()
+
+    def consultar(self, trabajo: Trabajo) -> dict:
+        with self._cerrojo:
+            if trabajo.estado == 'en_cola' and trabajo.futuro is not None and trabajo.futuro.running():
+                trabajo.estado = 'procesando'
+        progreso = self.progreso.get(trabajo.id) if self._manager else None
+        return trabajo.como_dict(progreso)
+
+    def cancelar(self, trabajo: Trabajo):
+        # Si aún no empezó no llega a ejecutarse; si está en curso se detiene en el siguiente aviso
+        if trabajo.futuro is not None and not trabajo.futuro.cancel():
+            self.cancelaciones[trabajo.id] = True
+
+    def _purgar(self):
+        """Borra los trabajos terminados hace más de `retencion_horas` (con el cerrojo tomado)."""
+        limite = time.time() - self.retencion_segundos
+        for id_trabajo, trabajo in list(self.trabajos.items()):
+            if trabajo.terminado is not None and trabajo.terminado < limite:
+                del self.trabajos[id_trabajo]
+                shutil.rmtree(trabajo.directorio, ignore_errors=True)
+                if self._manager:
+                    self.progreso.pop(id_trabajo, None)
+                    self.cancelaciones.pop(id_trabajo, None)
+
+
+def _guardar_cuerpo(destino: str, archivo=None):
+    """
+    Copia el archivo de la petición (`archivo` multipart o, sin él, el cuerpo
+    crudo) a disco por bloques, sin cargarlo en memoria. Devuelve los bytes escritos.
+    """
+    origen = archivo.stream if archivo else request.stream
+    with open(destino, 'wb') as f:
+        shutil.copyfileobj(origen, f, TAMANO_BLOQUE)
+    return os.path.getsize(destino)
+
+
+def crear_app(directorio: str | None = None, workers: int | None = None, max_pendientes: int | None = None,
+              opciones: dict | None = None) -> Flask:
+    """
+    Crea la aplicación. Sin argumentos lee PALMCLEAN_TRABAJOS, PALMCLEAN_WORKERS,
+    PALMCLEAN_MAX_PENDIENTES, PALMCLEAN_MOTOR y PALMCLEAN_LINEAS ('marcar' o
+    'reasignar') del entorno (útil con gunicorn).
+    """
+    directorio = directorio or os.environ.get('PALMCLEAN_TRABAJOS') or \
+        os.path.join(tempfile.gettempdir(), 'palmclean_trabajos')
+    workers = workers or int(os.environ.get('PALMCLEAN_WORKERS', os.cpu_count() or 1))
+    max_pendientes = max_pendientes or int(os.environ.get('PALMCLEAN_MAX_PENDIENTES', 0)) or None
+    if opciones is None:
+        opciones = {'motor_espacial': os.environ.get('PALMCLEAN_MOTOR', 'grid'),
+                    'validar_lineas': os.environ.get('PALMCLEAN_LINEAS') or None}
+
+    servicio = ServicioLimpieza(directorio, workers, max_pendientes, opciones=opciones)
+    app = Flask(__name__)
+    app.config['SERVICIO'] = servicio
+
+    def buscar(id_trabajo: str) -> Trabajo:
+        trabajo = servicio.trabajos.get(id_trabajo)
+        if trabajo is None:
+            abort(404, description="Trabajo no encontrado.")
+        return trabajo
+
+    @app.errorhandler(404)
+    @app.errorhandler(400)
+    def error_json(error):
+        return jsonify(error=error.description), error.code
+
+    @app.post('/trabajos')
+    def crear_trabajo():
+        # Solo un multipart tiene formulario: leer request.form con un cuerpo crudo
+        # (p. ej. enviado como x-www-form-urlencoded) lo consumiría antes de guardarlo
+        multipart = request.mimetype == 'multipart/form-data'
+        finca_id = ((request.form.get('finca_id') if multipart else None) or request.args.get('finca_id') or '').strip()
+        if not finca_id:
+            return jsonify(error="Falta 'finca_id'."), 400
+        archivo = request.files.get('file') if multipart else None
+        nombre = secure_filename((archivo.filename if archivo else request.args.get('nombre')) or 'spots.csv')
+        if os.path.splitext(nombre)[1].lower() not in EXTENSIONES:
+            return jsonify(error=f"Extensión no soportada; use {', '.join(EXTENSIONES)}."), 400
+
+        trabajo = servicio.nuevo(nombre, finca_id)
+        if trabajo is None:
+            respuesta = jsonify(error="Cola llena, intente más tarde.")
+            respuesta.headers['Retry-After'] = '30'
+            return respuesta, 429
+        try:
+            tamano = _guardar_cuerpo(trabajo.entrada, archivo)
+        except Exception as e:
+            servicio.descartar(trabajo)
+            return jsonify(error=f"No se pudo recibir el archivo: {e}"), 400
+        if not tamano:
+            servicio.descartar(trabajo)
+            return jsonify(error="El archivo está vacío."), 400
+
+        try:
+            servicio.encolar(trabajo)
+        except Exception as e:
+            # Sin liberarlo quedaría 'en_cola' para siempre, ocupando un puesto de la cola
+            servicio.descartar(trabajo)
+            return jsonify(error=f"No se pudo encolar el trabajo: {e}"), 500
+        respuesta = jsonify(id=trabajo.id, estado=trabajo.estado, url_estado=f"/trabajos/{trabajo.id}",
+                            url_resultado=f"/trabajos/{trabajo.id}/resultado")
+        respuesta.headers['Location'] = f"/trabajos/{trabajo.id}"
+        return respuesta, 202
+
+    @app.get('/trabajos/<id_trabajo>')
+    def estado_trabajo(id_trabajo):
+        return jsonify(servicio.consultar(buscar(id_trabajo)))
+
+    @app.get('/trabajos/<id_trabajo>/resultado')
+    def resultado_trabajo(id_trabajo):
+        trabajo = buscar(id_trabajo)
+        if trabajo.estado != 'terminado':
+            return jsonify(servicio.consultar(trabajo)), 409
+        # send_file envía el archivo por bloques (y admite Range)
+        return send_file(trabajo.salida, mimetype='text/csv', as_attachment=True,
+                         download_name=os.path.basename(trabajo.salida))
+
+    @app.get('/trabajos/<id_trabajo>/delta')
+    def delta_trabajo(id_trabajo):
+        trabajo = buscar(id_trabajo)
+        if trabajo.estado != 'terminado' or not os.path.exists(ruta_delta(trabajo.salida)):
+            return jsonify(error="Este trabajo no tiene delta."), 404
+        return send_file(ruta_delta(trabajo.salida), mimetype='text/csv', as_attachment=True,
+                         download_name=os.path.basename(ruta_delta(trabajo.salida)))
+
+    @app.get('/trabajos/<id_trabajo>/lineas')
+    def lineas_trabajo(id_trabajo):
+        trabajo = buscar(id_trabajo)
+        if trabajo.estado != 'terminado' or not os.path.exists(ruta_informe_lineas(trabajo.salida)):
+            return jsonify(error="Este trabajo no tiene informe de líneas."), 404
+        return send_file(ruta_informe_lineas(trabajo.salida), mimetype='text/csv', as_attachment=True,
+                         download_name=os.path.basename(ruta_informe_lineas(trabajo.salida)))
+
+    @app.delete('/trabajos/<id_trabajo>')
+    def cancelar_trabajo(id_trabajo):
+        trabajo = buscar(id_trabajo)
+        servicio.cancelar(trabajo)
+        return jsonify(servicio.consultar(trabajo)), 202
+
+    @app.get('/salud')
+    def salud():
+        return jsonify(ok=True, workers=servicio.workers, pendientes=servicio.pendientes(),
+                       max_pendientes=servicio.max_pendientes)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP de limpieza de spots (desarrollo).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--workers', type=int, help="Trabajos de limpieza simultáneos.")
+    parser.add_argument('--directorio', help="Carpeta de trabajos (entradas y salidas).")
+    args = parser.parse_args()
+    crear_app(args.directorio, args.workers).run(host=args.host, port=args.puerto, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Modo por bloques para archivos CSV muy grandes.
+
+1. Lee el CSV en bloques de `filas_por_bloque`, normaliza cada bloque y lo
+   reparte en archivos temporales por 'Lote'. En memoria solo quedan las
+   coordenadas (y Lote/Linea/Palma en forma numérica) de todo el archivo.
+2. Con esas columnas numéricas resuelve los duplicados exactos y espaciales de
+   toda la finca (también entre lotes), igual que el modo en memoria.
+3. Carga cada lote, aplica la máscara de filas conservadas, le aplica el resto
+   de etapas del pipeline (revisión de líneas y secuencia) y lo añade al CSV
+   de salida, en el mismo orden que groupby('Lote').
+
+La memoria máxima depende del lote más grande y no del archivo completo, y la
+salida es idéntica a la del modo en memoria.
+"""
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .lectura import convertir_numericas, opciones_lectura_csv
+from .pipeline import ETAPAS_FILTRADO
+
+
+class _Particiones:
+    """Archivos temporales (pickle concatenados) con las filas de cada lote."""
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self.codigos: dict = {}
+
+    def codigo(self, lote) -> int:
+        clave = None if pd.isna(lote) else lote
+        if clave not in self.codigos:
+            self.codigos[clave] = len(self.codigos)
+        return self.codigos[clave]
+
+    def _ruta(self, codigo: int) -> str:
+        return os.path.join(self.directorio, f"lote_{codigo}.pkl")
+
+    def agregar(self, codigo: int, df: pd.DataFrame):
+        with open(self._ruta(codigo), 'ab') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def leer(self, codigo: int) -> pd.DataFrame:
+        partes = []
+        with open(self._ruta(codigo), 'rb') as f:
+            while True:
+                try:
+                    partes.append(pickle.load(f))
+                except EOFError:
+                    break
+        return pd.concat(partes, ignore_index=True)
+
+    def en_orden(self) -> list[int]:
+        """Códigos en el orden de groupby('Lote', dropna=False): valores ordenados y NaN al final."""
+        claves = sorted(clave for clave in self.codigos if clave is not None)
+        if None in self.codigos:
+            claves.append(None)
+        return [self.codigos[clave] for clave in claves]
+
+
+def _repartir(limpiador, ruta: str, lectura: dict, numericas: dict, finca_id_manual: str, particiones: _Particiones):
+    """
+    Única pasada por el archivo: normaliza bloque a bloque y reparte las filas por
+    lote. Devuelve las columnas numéricas de todo el archivo, o None si el formato
+    no es válido.
+    """
+    plantilla = limpiador._normalizar(convertir_numericas(pd.read_csv(ruta, nrows=0, **lectura), numericas), finca_id_manual)
+    if plantilla is None:
+        return None
+
+    lat, lng, lote, linea, palma_valida, fincas = [], [], [], [], [], []
+    linea_decimal = False
+    total = 0
+    for numero, bloque in enumerate(pd.read_csv(ruta, chunksize=limpiador.filas_por_bloque, **lectura), 1):
+        limpiador._report_progress(1, 6, f"1/5: Leyendo bloque {numero} ({total} registros)...")
+        df = limpiador._normalizar(convertir_numericas(bloque, numericas), finca_id_manual)
+        if df is None:
+            return None
+        fincas.append(df['finca_id'].unique())
+        linea_decimal |= df['Linea'].dtype.kind == 'f'
+
+        codigos_bloque, valores = pd.factorize(df['Lote'], use_na_sentinel=False)
+        codigos = np.array([particiones.codigo(valor) for valor in valores], dtype=np.int64)[codigos_bloque]
+        df['_fila'] = np.arange(total, total + len(df))
+        for codigo in np.unique(codigos):
+            particiones.agregar(int(codigo), df[codigos == codigo])
+
+        lat.append(df['Latitud'].to_numpy(dtype=np.float64))
+        lng.append(df['Longitud'].to_numpy(dtype=np.float64))
+        lote.append(codigos)
+        linea.append(df['Linea'].to_numpy(dtype=np.float64, na_value=np.nan))
+        palma_valida.append(df['Palma'].notna().to_numpy())
+        total += len(df)
+
+    fincas_en_archivo = pd.unique(np.concatenate(fincas)) if fincas else []
+    if len(fincas_en_archivo) > 1:
+        # Partir por finca necesita el archivo en memoria (src.fincas)
+        limpiador._report_progress(1, 6, f"ERROR: Múltiples fincas en archivo: {fincas_en_archivo}. "
+                                         "El modo por bloques admite una sola finca por archivo.")
+        return None
+
+    vacio = np.empty(0, dtype=np.float64)
+    return {
+        'plantilla': plantilla,
+        'lat': np.concatenate(lat) if lat else vacio,
+        'lng': np.concatenate(lng) if lng else vacio,
+        'lote': np.concatenate(lote) if lote else np.empty(0, dtype=np.int64),
+        'linea': np.concatenate(linea) if linea else vacio,
+        'palma_valida': np.concatenate(palma_valida) if palma_valida else np.empty(0, dtype=bool),
+        'linea_decimal': linea_decimal,
+    }
+
+
+def _filas_conservadas(limpiador, etapas: list[str], datos: dict) -> np.ndarray:
+    """
+    Etapas de filtrado (2 y 3) del pipeline sobre las coordenadas de toda la
+    finca. Devuelve la máscara de filas que quedan.
+    """
+    coordenadas = pd.DataFrame({'Latitud': datos['lat'], 'Longitud': datos['lng'], 'Lote': datos['lote']})
+    return limpiador.pipeline(etapas).ejecutar(coordenadas).mascara
+
+
+def _hay_lineas_sin_palma(lote: np.ndarray, linea: np.ndarray, palma_valida: np.ndarray) -> bool:
+    """
+    True si alguna (Lote, Linea) se queda sin 'Palma' válida: en el modo en memoria
+    eso convierte toda la columna 'Palma' en decimal, y aquí debe ocurrir lo mismo.
+    """
+    if len(lote) == 0:
+        return False
+    grupos = pd.DataFrame({'lote': lote, 'linea': linea, 'valida': palma_valida})
+    return not grupos.groupby(['lote', 'linea'], dropna=False)['valida'].any().all()
+
+
+def procesar_por_bloques(limpiador, input_file_path: str, output_file_path: str, finca_id_manual: str) -> tuple[bool, str]:
+    """
+    Equivalente de `procesar_y_exportar` por bloques. Rellena `limpiador.stats`
+    y devuelve (éxito, mensaje de error).
+    """
+    limpiador._report_progress(1, 6, "1/5: Cargando archivo por bloques...")
+    with tempfile.TemporaryDirectory(prefix='palmclean_', dir=limpiador.directorio_temporal) as directorio:
+        datos = None
+        with limpiador._medir('carga') as etapa:
+            try:
+                opciones = opciones_lectura_csv(input_file_path)
+                lectura = {'sep': opciones['sep'], 'encoding': opciones['encoding'], 'dtype': opciones['dtype']}
+                particiones = _Particiones(directorio)
+                datos = _repartir(limpiador, input_file_path, lectura, opciones['numericas'], finca_id_manual, particiones)
+            except Exception as e:
+                limpiador._report_progress(1, 6, f"ERROR: No se pudo leer el archivo: {e}")
+            etapa['filas_salida'] = 0 if datos is None else len(datos['lat'])
+
+        if datos is None:
+            limpiador._report_progress(0, 6, "ERROR: Archivo no válido.")
+            return False, "Error al cargar o interpretar el archivo. Verifique el formato y las columnas."
+
+        limpiador.stats['original'] = len(datos['lat'])
+        # Las mismas etapas que en memoria: las de filtrado sobre toda la finca, el resto lote a lote
+        etapas = limpiador._etapas_limpieza()
+        filtrado = [etapa for etapa in etapas if etapa in ETAPAS_FILTRADO]
+        por_lote = limpiador.pipeline([etapa for etapa in etapas if etapa not in ETAPAS_FILTRADO])
+        conservar = _filas_conservadas(limpiador, filtrado, datos)
+        palma_decimal = _hay_lineas_sin_palma(
+            datos['lote'][conservar], datos['linea'][conservar], datos['palma_valida'][conservar]
+        )
+
+        corregidos = 0
+        finales = 0
+        escrito = False
+        codigos = particiones.en_orden()
+        try:
+            for numero, codigo in enumerate(codigos, 1):
+                limpiador._report_progress(4 + (numero - 1) / len(codigos), 6, f"4/5: Corrigiendo secuencia del lote {numero}/{len(codigos)}...")
+                df_lote = particiones.leer(codigo)
+                df_lote = df_lote[conservar[df_lote['_fila'].to_numpy()]]
+                df_lote = df_lote.drop(columns=['_fila']).reset_index(drop=True)
+                if df_lote.empty:
+                    continue
+                if datos['linea_decimal']:
+                    df_lote['Linea'] = df_lote['Linea'].astype(np.float64)
+
+                # Las líneas no cruzan lotes: revisarlas y ordenarlas lote a lote da lo mismo que toda la finca
+                df_lote = por_lote.ejecutar(df_lote).df
+                corregidos += limpiador.stats['corregidos_secuencia']
+                if palma_decimal:
+                    df_lote['Palma'] = df_lote['Palma'].astype(np.float64)
+
+                with limpiador._medir('exportacion', len(df_lote)) as etapa:
+                    limpiador._preparar_exportacion(df_lote).to_csv(
+                        output_file_path,
+                        mode='a' if escrito else 'w',
+                        header=not escrito,
+                        index=False,
+                        sep=',',
+                        lineterminator='\r\n'
+                    )
+                    etapa['filas_salida'] = len(df_lote)
+                escrito = True
+                finales += len(df_lote)
+
+            if not escrito:
+                limpiador._preparar_exportacion(datos['plantilla']).to_csv(
+                    output_file_path, index=False, sep=',', lineterminator='\r\n'
+                )
+        except Exception as e:
+            limpiador._report_progress(100, 100, "ERROR: No se pudo guardar el archivo.")
+            return False, f"Error al guardar el archivo limpio: {e}"
+
+    limpiador.stats['corregidos_secuencia'] = corregidos
+    limpiador.stats['final'] = finales
+    return True, ""
@@ -0,0 +1,339 @@
+"""
+Subida del CSV limpio a la API de SIOMA.
+
+Por defecto el archivo va completo en una sola petición, tal cual (el contrato
+que acepta hoy el endpoint de subida), con reintentos con espera exponencial
+ante timeouts, errores de conexión, 429 y 5xx.
+
+Con `por_partes=True` (solo contra un endpoint que acepte partes) el archivo se
+divide en partes de tamaño acotado que agrupan lotes completos (un lote más
+grande que el tope se parte por filas); cada parte lleva la cabecera y los
+campos 'parte' y 'total_partes', opcionalmente comprimida con gzip
+(`comprimir=True`), y va en su propia petición. Las partes se suben en paralelo
+con una sola `requests.Session` (conexiones reutilizadas). Un manifiesto JSON
+junto al archivo registra las partes ya subidas, de modo que un nuevo intento
+tras un fallo solo envía las que faltan.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .lectura import opciones_lectura_csv
+
+MB = 1024 * 1024
+
+COLUMNAS_LOTE = ('lote_id', 'lote')
+
+# Respuestas que merecen otro intento: el servidor está ocupado o falló de forma transitoria
+ESTADOS_REINTENTABLES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class SubidaCancelada(Exception):
+    """Se lanza cuando se pidió cancelar la subida."""
+
+
+def _lotes_por_fila(texto: str, sep: str) -> tuple[str, list[tuple[str, str]]]:
+    """
+    Devuelve la cabecera y, por cada fila de datos, (lote, texto original de la fila).
+    Las filas se recortan del texto original para enviar los bytes tal cual.
+    """
+    # Mismas líneas que recibe csv.reader, para que line_num indexe esta lista
+    lineas = io.StringIO(texto, newline='').readlines()
+    if not lineas:
+        return '', []
+    lector = csv.reader(iter(lineas), delimiter=sep)
+    cabecera = next(lector)
+    normalizadas = [nombre.strip().lower() for nombre in cabecera]
+    columna = next((normalizadas.index(nombre) for nombre in COLUMNAS_LOTE if nombre in normalizadas), None)
+
+    filas = []
+    inicio = lector.line_num
+    for campos in lector:
+        fin = lector.line_num
+        lote = campos[columna] if columna is not None and columna < len(campos) else ''
+        filas.append((lote, ''.join(lineas[inicio:fin])))
+        inicio = fin
+    return ''.join(lineas[:1]), filas
+
+
+def dividir_en_partes(ruta_csv: str, max_bytes: int) -> list[dict]:
+    """
+    Parte el CSV en trozos de como mucho `max_bytes` (sin contar la cabecera) que
+    agrupan lotes consecutivos completos. Cada parte es un dict con 'numero',
+    'filas', 'lotes', 'datos' (bytes con cabecera) y 'huella' (sha256 de 'datos').
+    """
+    opciones = opciones_lectura_csv(ruta_csv)
+    # El BOM no se repite en cada parte
+    encoding = 'utf-8' if opciones['encoding'] == 'utf-8-sig' else opciones['encoding']
+    with open(ruta_csv, encoding=opciones['encoding'], newline='') as f:
+        cabecera, filas = _lotes_por_fila(f.read(), opciones['sep'])
+    cabecera = cabecera.encode(encoding)
+
+    # Tramos de filas consecutivas del mismo lote
+    tramos = []
+    for lote, fila in filas:
+        datos = fila.encode(encoding)
+        if tramos and tramos[-1]['lote'] == lote:
+            tramos[-1]['filas'].append(datos)
+            tramos[-1]['bytes'] += len(datos)
+        else:
+            tramos.append({'lote': lote, 'filas': [datos], 'bytes': len(datos)})
+
+    partes = []
+    actual = None
+
+    def cerrar():
+        if actual and actual['filas']:
+            datos = cabecera + b''.join(actual['filas'])
+            partes.append({
+                'numero': len(partes) + 1,
+                'filas': len(actual['filas']),
+                'lotes': actual['lotes'],
+                'datos': datos,
+                'huella': hashlib.sha256(datos).hexdigest(),
+            })
+
+    for tramo in tramos:
+        # Un lote que no cabe en la parte actual empieza una nueva
+        if actual is None or actual['bytes'] + tramo['bytes'] > max_bytes:
+            cerrar()
+            actual = {'filas': [], 'lotes': [], 'bytes': 0}
+        actual['lotes'].append(tramo['lote'])
+        for datos in tramo['filas']:
+            # Solo un lote mayor que max_bytes llega a partirse por filas
+            if actual['filas'] and actual['bytes'] + len(datos) > max_bytes:
+                cerrar()
+                actual = {'filas': [], 'lotes': [tramo['lote']], 'bytes': 0}
+            actual['filas'].append(datos)
+            actual['bytes'] += len(datos)
+    cerrar()
+
+    if not partes and cabecera:
+        # Archivo solo con cabecera: se envía igual para que la API lo valide
+        partes.append({'numero': 1, 'filas': 0, 'lotes': [], 'datos': cabecera,
+                       'huella': hashlib.sha256(cabecera).hexdigest()})
+    return partes
+
+
+def archivo_completo(ruta_csv: str) -> list[dict]:
+    """El archivo entero como única parte, con sus bytes tal cual."""
+    with open(ruta_csv, 'rb') as f:
+        datos = f.read()
+    return [{'numero': 1, 'filas': None, 'lotes': [], 'datos': datos, 'huella': hashlib.sha256(datos).hexdigest()}]
+
+
+def _interpretar_respuesta(respuesta: requests.Response) -> tuple[bool, bool, str]:
+    """
+    (éxito, reintentable, mensaje) de una respuesta HTTP de la API. Solo es un
+    éxito un JSON con status 'success': un 200 con una página HTML (p. ej. de un
+    proxy) o sin status no confirma que la API recibiera el archivo.
+    """
+    if respuesta.status_code in ESTADOS_REINTENTABLES:
+        return False, True, f"HTTP {respuesta.status_code}"
+    if not 200 <= respuesta.status_code < 300:
+        return False, False, f"HTTP {respuesta.status_code}: {respuesta.text[:100]}"
+    try:
+        data = respuesta.json()
+    except ValueError:
+        return False, False, f"La respuesta del servidor no es un JSON válido. (Respuesta: {respuesta.text[:100]})"
+    if not isinstance(data, dict) or data.get('status') != 'success':
+        data = data if isinstance(data, dict) else {}
+        return False, False, f"{data.get('message')} (Código: {data.get('codigo')})"
+    return True, False, data.get('message', '')
+
+
+class SubidaSpots:
+    """
+    Sube un CSV a `url` con reintentos; con `por_partes`, en partes (comprimidas
+    si `comprimir`) subidas en paralelo. `autorizacion` es el valor completo de
+    la cabecera Authorization. Ninguna espera entre reintentos pasa de `espera_max`.
+    """
+
+    def __init__(self, url: str, autorizacion: str, update_callback=None, workers: int = 4,
+                 max_mb_parte: float = 4, reintentos: int = 5, espera_base: float = 1.0, espera_max: float = 60.0,
+                 timeout: tuple[float, float] = (10, 120), por_partes: bool = False, comprimir: bool = False,
+                 verificar_ssl: bool = True):
+        self.url = url
+        self.autorizacion = autorizacion
+        self.update_callback = update_callback
+        self.workers = max(1, int(workers))
+        self.max_bytes_parte = int(max_mb_parte * MB)
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.timeout = timeout
+        self.por_partes = por_partes
+        self.comprimir = comprimir
+        self.verificar_ssl = verificar_ssl
+        self.stats = {}
+        self._cancelado = threading.Event()
+        self._cerrojo = threading.Lock()
+        self.session = requests.Session()
+        # Una conexión por hilo como mínimo, reutilizada entre partes
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+        self.session.headers['Authorization'] = autorizacion
+
+    def cancelar(self):
+        """Pide detener la subida (seguro desde otro hilo). Las partes en vuelo terminan."""
+        self._cancelado.set()
+
+    def _report_progress(self, step: float, total_steps: int, message: str):
+        if self.update_callback:
+            progress = int((step / total_steps) * 100) if total_steps else 100
+            self.update_callback(progress, message)
+
+    @staticmethod
+    def ruta_manifiesto(ruta_csv: str) -> str:
+        return ruta_csv + '.subida.json'
+
+    def _cargar_manifiesto(self, ruta: str) -> dict:
+        """Manifiesto de un intento anterior contra la misma URL, o uno vacío."""
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                manifiesto = json.load(f)
+            if manifiesto.get('url') == self.url and isinstance(manifiesto.get('subidas'), dict):
+                return manifiesto
+        except (OSError, ValueError):
+            pass
+        return {'url': self.url, 'subidas': {}}
+
+    def _guardar_manifiesto(self, ruta: str, manifiesto: dict):
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, ruta)
+
+    def _espera(self, intento: int, respuesta: requests.Response | None) -> float:
+        """
+        Espera exponencial con jitter; respeta Retry-After (en segundos) si el
+        servidor lo envía. Ambas quedan acotadas por `espera_max`.
+        """
+        if respuesta is not None:
+            try:
+                return min(max(float(respuesta.headers['Retry-After']), 0.0), self.espera_max)
+            except (KeyError, ValueError):
+                pass
+        return min(self.espera_base * 2 ** intento * random.uniform(0.5, 1.5), self.espera_max)
+
+    def _peticion(self, parte: dict, total: int, nombre_archivo: str) -> dict:
+        """Argumentos de `session.post` para la parte: el archivo completo va como antes, sin campos extra."""
+        if not self.por_partes:
+            return {'files': {'file': (nombre_archivo, parte['datos'], 'text/csv')}}
+        nombre_base = os.path.splitext(nombre_archivo)[0]
+        if self.comprimir:
+            contenido = gzip.compress(parte['datos'], compresslevel=6, mtime=0)
+            archivo = (f"{nombre_base}_parte{parte['numero']:03d}.csv.gz", contenido, 'application/gzip')
+        else:
+            archivo = (f"{nombre_base}_parte{parte['numero']:03d}.csv", parte['datos'], 'text/csv')
+        return {
+            'files': {'file': archivo},
+            'data': {'parte': parte['numero'], 'total_partes': total},
+            # Misma clave en todos los reintentos: el servidor puede descartar una parte repetida
+            'headers': {'Idempotency-Key': parte['huella']},
+        }
+
+    def _subir_parte(self, parte: dict, total: int, nombre_archivo: str) -> tuple[str, int]:
+        """
+        Envía una parte con reintentos. Devuelve (mensaje de la API, bytes del
+        archivo enviado, comprimido si se comprime) o lanza RuntimeError.
+        """
+        peticion = self._peticion(parte, total, nombre_archivo)
+        enviados = len(peticion['files']['file'][1])
+
+        ultimo_error = ''
+        for intento in range(self.reintentos + 1):
+            if self._cancelado.is_set():
+                raise SubidaCancelada()
+            respuesta = None
+            try:
+                respuesta = self.session.post(self.url, timeout=self.timeout, verify=self.verificar_ssl, **peticion)
+                exito, reintentable, mensaje = _interpretar_respuesta(respuesta)
+                if exito:
+                    return mensaje, enviados
+                ultimo_error = mensaje
+                if not reintentable:
+                    break
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                ultimo_error = f"{type(e).__name__}: {e}"
+            if intento < self.reintentos:
+                # Esperar en el Event permite cancelar durante la espera
+                if self._cancelado.wait(self._espera(intento, respuesta)):
+                    raise SubidaCancelada()
+        raise RuntimeError(f"Parte {parte['numero']}: {ultimo_error}")
+
+    def subir(self, ruta_csv: str) -> Tuple[bool, str]:
+        """
+        Sube `ruta_csv` reanudando desde su manifiesto. Rellena `self.stats` y
+        devuelve (éxito, mensaje).
+        """
+        self._cancelado.clear()
+        self.stats = {'partes': 0, 'subidas': 0, 'ya_subidas': 0, 'fallidas': 0,
+                      'bytes_enviados': 0, 'segundos': 0.0}
+        inicio = time.perf_counter()
+
+        self._report_progress(0, 1, "Preparando partes para la subida..." if self.por_partes else "Preparando la subida...")
+        try:
+            partes = dividir_en_partes(ruta_csv, self.max_bytes_parte) if self.por_partes else archivo_completo(ruta_csv)
+        except OSError as e:
+            return False, f"No se pudo leer el archivo a subir: {e}"
+
+        ruta_manifiesto = self.ruta_manifiesto(ruta_csv)
+        manifiesto = self._cargar_manifiesto(ruta_manifiesto)
+        pendientes = [parte for parte in partes if parte['huella'] not in manifiesto['subidas']]
+        self.stats.update(partes=len(partes), ya_subidas=len(partes) - len(pendientes))
+
+        nombre_archivo = os.path.basename(ruta_csv)
+        errores = []
+        hechas = self.stats['ya_subidas']
+        self._report_progress(hechas, len(partes), f"Subiendo {len(pendientes)} de {len(partes)} partes...")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futuros = {pool.submit(self._subir_parte, parte, len(partes), nombre_archivo): parte for parte in pendientes}
+            for futuro in as_completed(futuros):
+                parte = futuros[futuro]
+                try:
+                    mensaje, enviados = futuro.result()
+                except SubidaCancelada:
+                    continue
+                except Exception as e:
+                    errores.append(str(e))
+                    continue
+                with self._cerrojo:
+                    manifiesto['subidas'][parte['huella']] = {
+                        'numero': parte['numero'], 'filas': parte['filas'], 'mensaje': mensaje,
+                    }
+                    self._guardar_manifiesto(ruta_manifiesto, manifiesto)
+                hechas += 1
+                self.stats['subidas'] += 1
+                self.stats['bytes_enviados'] += enviados
+                self._report_progress(hechas, len(partes), f"Parte {parte['numero']} subida ({hechas}/{len(partes)})")
+
+        self.stats['fallidas'] = len(errores)
+        self.stats['segundos'] = round(time.perf_counter() - inicio, 3)
+        if self._cancelado.is_set():
+            return False, f"Subida cancelada: {hechas}/{len(partes)} partes subidas. Vuelva a intentar para continuar."
+        if errores:
+            return False, (f"{len(errores)} de {len(partes)} partes fallaron; se reintentarán en la próxima subida. "
+                           f"Primer error: {errores[0]}")
+
+        # Todo subido: el manifiesto ya no hace falta
+        try:
+            os.remove(ruta_manifiesto)
+        except OSError:
+            pass
+        if not self.por_partes:
+            return True, manifiesto['subidas'][partes[0]['huella']]['mensaje']
+        return True, f"Archivo subido en {len(partes)} partes ({self.stats['ya_subidas']} ya estaban subidas)."
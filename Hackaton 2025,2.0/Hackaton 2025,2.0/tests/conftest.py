@@ -0,0 +1,63 @@
+"""
+Datos compartidos por las pruebas: Spots.csv (muestra real, sin duplicados),
+una copia con duplicados inyectados y una finca sintética de varios lotes.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generador import METROS_POR_GRADO, escribir_finca, generar_finca
+from src.motor_limpieza import LimpiezaSpots
+
+RAIZ = Path(__file__).resolve().parents[1]
+SPOTS = RAIZ / 'Spots.csv'
+CONTADORES = ('original', 'eliminados_exactos', 'eliminados_espaciales', 'corregidos_secuencia', 'final')
+
+
+def _desplazar(grados: pd.Series, metros: np.ndarray) -> pd.Series:
+    return (grados.astype(float) + metros / METROS_POR_GRADO).map('{:.7f}'.format)
+
+
+@pytest.fixture(scope='session')
+def spots_duplicados(tmp_path_factory) -> Path:
+    """
+    Spots.csv con duplicados exactos, casi duplicados (unos 30 cm) y casi
+    duplicados anotados en otro lote, intercalados al final de cada lote.
+    """
+    df = pd.read_csv(SPOTS, sep=';', dtype=str)
+    rng = np.random.default_rng(0)
+    exactos = df.sample(200, random_state=1)
+    casi = df.sample(300, random_state=2)
+    casi = casi.assign(Latitud=_desplazar(casi['Latitud'], rng.normal(0, 0.3, len(casi))))
+    otro_lote = df.sample(100, random_state=3)
+    otro_lote = otro_lote.assign(Longitud=_desplazar(otro_lote['Longitud'], np.full(len(otro_lote), 0.3)),
+                                 Lote=df['Lote'].iloc[0])
+    ruta = tmp_path_factory.mktemp('datos') / 'spots_duplicados.csv'
+    pd.concat([df, exactos, casi, otro_lote]).to_csv(ruta, sep=';', index=False)
+    return ruta
+
+
+@pytest.fixture(scope='session')
+def finca_sintetica(tmp_path_factory) -> Path:
+    """30 000 palmas en 10 lotes, formato de la API, con duplicados y líneas desordenadas."""
+    ruta = tmp_path_factory.mktemp('datos') / 'finca.csv'
+    escribir_finca(generar_finca(30_000, 'nuevo', semilla=3), str(ruta))
+    return ruta
+
+
+@pytest.fixture
+def limpiar(tmp_path):
+    """limpiar(entrada, nombre_salida, **opciones) -> (bytes de la salida, stats)."""
+    def limpiar(entrada: Path, nombre: str = 'salida.csv', **opciones) -> tuple[bytes, dict]:
+        limpiador = LimpiezaSpots(**opciones)
+        salida = tmp_path / nombre
+        ok, reporte = limpiador.procesar_y_exportar(str(entrada), str(salida), '7')
+        assert ok, reporte
+        return salida.read_bytes(), limpiador.stats
+    return limpiar
+
+
+def contadores(stats: dict) -> dict:
+    return {clave: stats[clave] for clave in CONTADORES}
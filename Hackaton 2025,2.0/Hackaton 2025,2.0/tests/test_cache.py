@@ -0,0 +1,75 @@
+"""
+Caché por lote del agrupamiento espacial (src.cache): la salida con caché,
+fría o caliente, es idéntica a la salida sin caché.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cache import CacheResultados, huella
+
+from .conftest import contadores
+
+
+@pytest.mark.parametrize('motor', ['dbscan', 'grid'])
+def test_fria_y_caliente_igual_que_sin_cache(finca_sintetica, limpiar, tmp_path, motor):
+    directorio = str(tmp_path / 'cache')
+    salida, stats = limpiar(finca_sintetica, 'sin_cache.csv', motor_espacial=motor)
+    fria, stats_fria = limpiar(finca_sintetica, 'fria.csv', motor_espacial=motor, directorio_cache=directorio)
+    caliente, stats_caliente = limpiar(finca_sintetica, 'caliente.csv', motor_espacial=motor, directorio_cache=directorio)
+
+    assert fria == salida and caliente == salida
+    assert contadores(stats_fria) == contadores(stats) == contadores(stats_caliente)
+    assert stats_fria['cache']['aciertos'] == 0
+    assert stats_caliente['cache'] == {'aciertos': stats_fria['cache']['fallos'], 'fallos': 0}
+
+
+def test_solo_se_recalcula_el_lote_editado(finca_sintetica, limpiar, tmp_path):
+    directorio = str(tmp_path / 'cache')
+    _, stats = limpiar(finca_sintetica, 'antes.csv', motor_espacial='grid', directorio_cache=directorio)
+
+    # Una palma movida 5 m y otra finca_id: solo cambia la clave de su lote
+    df = pd.read_csv(finca_sintetica, dtype=str)
+    df.loc[0, 'lat'] = f"{float(df.loc[0, 'lat']) + 5 / 111320:.7f}"
+    df['finca_id'] = '99'
+    editado = tmp_path / 'editado.csv'
+    df.to_csv(editado, index=False)
+
+    salida, stats_editado = limpiar(editado, 'despues.csv', motor_espacial='grid', directorio_cache=directorio)
+    salida_sin_cache, _ = limpiar(editado, 'sin_cache.csv', motor_espacial='grid')
+    assert salida == salida_sin_cache
+    assert stats_editado['cache']['fallos'] == 1
+    assert stats_editado['cache']['aciertos'] == stats['cache']['fallos'] - 1
+
+
+def test_entrada_corrupta_se_descarta(tmp_path):
+    cache = CacheResultados(str(tmp_path))
+    clave = huella(np.arange(3), umbral=1.0)
+    cache.guardar(clave, raiz=np.arange(3))
+    with open(os.path.join(tmp_path, f"{clave}.npz"), 'wb') as f:
+        f.write(b'no es un npz')
+    assert cache.obtener(clave) is None
+    assert not os.path.exists(os.path.join(tmp_path, f"{clave}.npz"))
+    assert (cache.aciertos, cache.fallos) == (0, 1)
+
+
+def test_recortar_expulsa_las_menos_usadas(tmp_path):
+    cache = CacheResultados(str(tmp_path), max_mb=1.5)
+    claves = [huella(np.array([i])) for i in range(3)]
+    for numero, clave in enumerate(claves):
+        cache.guardar(clave, datos=np.zeros(100_000))  # 0,8 MB cada una
+        os.utime(os.path.join(tmp_path, f"{clave}.npz"), (numero, numero))
+    assert cache.obtener(claves[0]) is not None  # el acierto la vuelve la más reciente
+    cache.recortar()
+    assert cache.obtener(claves[0]) is not None
+    assert cache.obtener(claves[1]) is None and cache.obtener(claves[2]) is None
+
+
+def test_huella_depende_de_valores_tipo_y_parametros():
+    base = huella(np.arange(4, dtype=np.float64), umbral=1.0)
+    assert base == huella(np.arange(4, dtype=np.float64), umbral=1.0)
+    assert base != huella(np.arange(4, dtype=np.float32), umbral=1.0)
+    assert base != huella(np.arange(4, dtype=np.float64), umbral=2.0)
+    assert base != huella(np.array([0, 1, 2, 4], dtype=np.float64), umbral=1.0)
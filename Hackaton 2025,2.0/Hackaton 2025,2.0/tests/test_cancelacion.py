@@ -0,0 +1,51 @@
+"""
+Cancelación desde el callback de progreso (LimpiezaSpots.cancelar): el proceso
+se detiene en el siguiente aviso, en un solo proceso y con varios, y no deja
+ninguna salida, tampoco la escrita a medias en el modo por bloques.
+"""
+import pytest
+
+from src.motor_limpieza import LimpiezaSpots
+
+CANCELADO = (False, "Proceso cancelado por el usuario.")
+
+
+def _cancelar_en(etapa: str, **opciones) -> tuple[LimpiezaSpots, list[str]]:
+    """Limpiador que se cancela a sí mismo en el primer aviso que empieza por `etapa`."""
+    avisos = []
+
+    def progreso(porcentaje, mensaje):
+        avisos.append(mensaje)
+        if mensaje.startswith(etapa):
+            limpiador.cancelar()
+
+    limpiador = LimpiezaSpots(update_callback=progreso, motor_espacial='grid', **opciones)
+    return limpiador, avisos
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('etapa', ['1/5', '3/5', '4/5', '5/5'])
+def test_cancelar_desde_el_progreso(finca_sintetica, tmp_path, workers, etapa):
+    limpiador, avisos = _cancelar_en(etapa, workers=workers, validar_lineas='marcar')
+    salida = tmp_path / 'salida.csv'
+    assert limpiador.procesar_y_exportar(str(finca_sintetica), str(salida), '7') == CANCELADO
+    # Ningún aviso después del que pidió cancelar, y nada escrito
+    assert avisos[-1].startswith(etapa)
+    assert list(tmp_path.iterdir()) == []
+
+    # El mismo limpiador vuelve a funcionar
+    limpiador.update_callback = None
+    ok, reporte = limpiador.procesar_y_exportar(str(finca_sintetica), str(salida), '7')
+    assert ok, reporte
+
+
+def test_por_bloques_borra_lo_escrito(finca_sintetica, tmp_path):
+    limpiador, avisos = _cancelar_en('4/5: Corrigiendo secuencia del lote 4/', filas_por_bloque=5000)
+    salida = tmp_path / 'salida.csv'
+    # Un resultado anterior con otro nombre no se toca
+    anterior = tmp_path / 'anterior.csv'
+    anterior.write_bytes(b'x')
+    assert limpiador.procesar_y_exportar(str(finca_sintetica), str(salida), '7') == CANCELADO
+    # Los tres primeros lotes llegaron a escribirse y se borraron
+    assert any(aviso.startswith('4/5: Corrigiendo secuencia del lote 3/') for aviso in avisos)
+    assert list(tmp_path.iterdir()) == [anterior]
@@ -0,0 +1,60 @@
+"""
+Comando `clean` de la línea de comandos (src.cli): una línea JSON por archivo,
+código de salida 1 si alguno falla y entradas cuya salida coincidiría.
+"""
+import json
+
+from src.cli import main
+
+from .conftest import SPOTS
+
+
+def _clean(capsys, *argumentos) -> tuple[int, dict]:
+    codigo = main(['clean', *map(str, argumentos), '--motor', 'grid', '--jobs', '1'])
+    lineas = capsys.readouterr().out.splitlines()
+    return codigo, {resultado['archivo']: resultado for resultado in map(json.loads, lineas)}
+
+
+def _copiar(ruta):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_bytes(SPOTS.read_bytes())
+    return ruta
+
+
+def test_una_linea_json_por_archivo(tmp_path, capsys, limpiar):
+    entradas = [_copiar(tmp_path / 'entrada' / nombre) for nombre in ('norte.csv', 'sur.csv')]
+    salidas = tmp_path / 'limpios'
+    codigo, resultados = _clean(capsys, tmp_path / 'entrada' / '*.csv', '--finca-id', '7', '--out-dir', salidas)
+
+    assert codigo == 0
+    assert set(resultados) == {str(ruta) for ruta in entradas}
+    esperado = limpiar(SPOTS)[0]
+    for ruta in entradas:
+        resultado = resultados[str(ruta)]
+        assert resultado['ok'] and resultado['finca_id'] == '7'
+        assert resultado['salida'] == str(salidas / f"{ruta.stem}_LIMPIAS.csv")
+        assert resultado['stats']['final'] == 11083
+        assert (salidas / f"{ruta.stem}_LIMPIAS.csv").read_bytes() == esperado
+
+
+def test_sin_finca_id_falla(tmp_path, capsys):
+    ruta = _copiar(tmp_path / 'norte.csv')
+    codigo, resultados = _clean(capsys, ruta, '--out-dir', tmp_path / 'limpios')
+    assert codigo == 1
+    assert not resultados[str(ruta)]['ok'] and 'finca_id' in resultados[str(ruta)]['error']
+
+
+def test_salidas_que_coinciden(tmp_path, capsys):
+    repetidas = [_copiar(tmp_path / 'a' / 'finca.csv'), _copiar(tmp_path / 'b' / 'finca.csv')]
+    extension = _copiar(tmp_path / 'a' / 'sur.csv')
+    (tmp_path / 'a' / 'sur.xlsx').write_bytes(b'')
+    unica = _copiar(tmp_path / 'b' / 'norte.csv')
+    salidas = tmp_path / 'limpios'
+    codigo, resultados = _clean(capsys, tmp_path / '*' / '*.*', '--finca-id', '7', '--out-dir', salidas)
+
+    assert codigo == 1
+    assert resultados[str(unica)]['ok']
+    for ruta in repetidas + [extension, tmp_path / 'a' / 'sur.xlsx']:
+        assert not resultados[str(ruta)]['ok'] and 'coincide' in resultados[str(ruta)]['error']
+    # Ninguna de las que coinciden llega a escribirse
+    assert sorted(ruta.name for ruta in salidas.iterdir()) == ['norte_LIMPIAS.csv']
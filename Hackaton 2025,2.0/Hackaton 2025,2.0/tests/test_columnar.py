@@ -0,0 +1,42 @@
+"""
+Copia columnar de la salida (src.columnar): mismos valores que el CSV limpio
+en cada formato disponible, y se acepta como entrada con la misma salida.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from src.columnar import FORMATOS, HAY_PYARROW, leer_columnar, ruta_columnar
+
+FORMATOS_DISPONIBLES = [
+    pytest.param(formato, marks=pytest.mark.skipif(formato != 'npz' and not HAY_PYARROW, reason="sin pyarrow"))
+    for formato in FORMATOS
+]
+
+
+@pytest.fixture(params=['spots_duplicados', 'finca_sintetica'])
+def entrada(request):
+    return request.getfixturevalue(request.param)
+
+
+@pytest.mark.parametrize('formato', FORMATOS_DISPONIBLES)
+def test_mismos_valores_que_el_csv(entrada, limpiar, tmp_path, formato):
+    salida, stats = limpiar(entrada, formato_columnar=formato)
+    ruta = ruta_columnar(str(tmp_path / 'salida.csv'), formato)
+    assert stats['columnar'] == ruta
+
+    # Del CSV, como al leerlo con pandas, cuenta la primera de las columnas repetidas
+    csv = pd.read_csv(io.BytesIO(salida), dtype=str, keep_default_na=False)
+    csv = csv.loc[:, [columna for columna in csv.columns if not columna.endswith('.1')]]
+    columnar = leer_columnar(ruta)
+    assert columnar['lat'].dtype == 'float64'
+    pd.testing.assert_frame_equal(columnar.astype(str), csv)
+
+
+@pytest.mark.parametrize('formato', FORMATOS_DISPONIBLES)
+def test_copia_como_entrada(spots_duplicados, limpiar, tmp_path, formato):
+    limpiar(spots_duplicados, 'primera.csv', formato_columnar=formato)
+    desde_csv, _ = limpiar(tmp_path / 'primera.csv', 'desde_csv.csv')
+    desde_columnar, _ = limpiar(ruta_columnar(str(tmp_path / 'primera.csv'), formato), 'desde_columnar.csv')
+    assert desde_columnar == desde_csv
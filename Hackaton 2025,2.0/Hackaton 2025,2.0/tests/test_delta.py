@@ -0,0 +1,79 @@
+"""
+Instantáneas de subida (src.delta): el delta exacto tras agregar, mover y
+eliminar spots, y con archivos de varias fincas, que se confirman finca por
+finca y cuya siguiente limpieza solo ve los cambios reales.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generador import METROS_POR_GRADO
+from src.delta import confirmar_subida, ruta_delta
+from src.fincas import ruta_finca, salidas_por_finca
+
+from .conftest import SPOTS
+
+
+@pytest.fixture
+def dos_fincas(finca_sintetica, tmp_path):
+    df = pd.read_csv(finca_sintetica, dtype=str)
+    df['finca_id'] = df['lote_id'].str.split('-').str[0].map(lambda lote: '1' if int(lote) <= 5 else '2')
+    ruta = tmp_path / 'fincas.csv'
+    df.to_csv(ruta, index=False)
+    return ruta
+
+
+def test_confirmar_cada_finca(dos_fincas, limpiar, tmp_path):
+    instantaneas = str(tmp_path / 'subidas')
+    _, stats = limpiar(dos_fincas, 'salida.csv', directorio_instantaneas=instantaneas)
+    salida = str(tmp_path / 'salida.csv')
+    assert set(stats['fincas']) == {'1', '2'}
+    assert all(finca['delta'] is None for finca in stats['fincas'].values())
+
+    # El archivo unido no tiene huellas: se confirma cada finca
+    assert not confirmar_subida(salida, instantaneas)
+    assert salidas_por_finca(salida) == [ruta_finca(salida, '1'), ruta_finca(salida, '2')]
+    assert all(confirmar_subida(ruta, instantaneas) for ruta in salidas_por_finca(salida))
+
+    _, stats = limpiar(dos_fincas, 'salida.csv', directorio_instantaneas=instantaneas)
+    for finca in stats['fincas'].values():
+        assert finca['delta']['agregados'] == finca['delta']['modificados'] == finca['delta']['eliminados'] == 0
+
+
+def test_sin_resumen_no_hay_salidas_por_finca(tmp_path):
+    assert salidas_por_finca(str(tmp_path / 'salida.csv')) == []
+
+
+def test_un_spot_agregado_uno_movido_y_uno_eliminado(limpiar, tmp_path):
+    instantaneas = str(tmp_path / 'subidas')
+    df = pd.read_csv(SPOTS, sep=';', dtype=str)
+    limpiar(SPOTS, 'salida.csv', directorio_instantaneas=instantaneas)
+    assert confirmar_subida(str(tmp_path / 'salida.csv'), instantaneas)
+
+    palmas = pd.to_numeric(df['Palma'])
+    por_linea = palmas.groupby([df['Lote'], df['Linea']], sort=False)
+    largas = por_linea.transform('size') >= 5
+    # Se elimina la última palma de una línea (las demás conservan su número) y se
+    # mueve 2 m una palma del medio de otra
+    eliminada = palmas[largas & (palmas == por_linea.transform('max'))].index[0]
+    movida = palmas[largas & (palmas == 3) & (df['Linea'] != df.loc[eliminada, 'Linea'])].index[0]
+    cambiado = df.drop(index=eliminada)
+    cambiado.loc[movida, 'Latitud'] = f"{float(df.loc[movida, 'Latitud']) + 2 / METROS_POR_GRADO:.7f}"
+    nueva = df.loc[[movida]].assign(Linea='999', Palma='1', Latitud=f"{float(df.loc[movida, 'Latitud']) + 0.05:.7f}")
+    ruta = tmp_path / 'cambiado.csv'
+    pd.concat([cambiado, nueva]).to_csv(ruta, sep=';', index=False)
+
+    _, stats = limpiar(ruta, 'salida.csv', directorio_instantaneas=instantaneas)
+    assert stats['delta'] == {'agregados': 1, 'modificados': 1, 'eliminados': 1, 'sin_cambios': len(df) - 2}
+
+    salida = pd.read_csv(tmp_path / 'salida.csv', dtype=str, keep_default_na=False)
+    nombre = 'SPOT_' + df['Lote'] + '_L' + df['Linea'] + '_P' + df['Palma']
+    nombre_nueva = f"SPOT_{nueva['Lote'].iloc[0]}_L999_P1"
+    cambios = salida[salida['nombre_spot'].isin([nombre[movida], nombre_nueva])]
+    esperado = pd.concat([
+        cambios.assign(cambio=np.where(cambios['nombre_spot'] == nombre_nueva, 'agregado', 'modificado')),
+        pd.DataFrame({'cambio': ['eliminado'], 'nombre_spot': [nombre[eliminada]]}),
+    ], ignore_index=True).reindex(columns=['cambio'] + list(salida.columns)).fillna('')
+    delta = pd.read_csv(ruta_delta(str(tmp_path / 'salida.csv')), dtype=str, keep_default_na=False)
+    pd.testing.assert_frame_equal(delta, esperado)
+    assert set(delta['cambio']) == {'agregado', 'modificado', 'eliminado'}
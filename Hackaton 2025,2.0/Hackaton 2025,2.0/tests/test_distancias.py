@@ -0,0 +1,32 @@
+"""
+Núcleo de distancias (src.distancias): `haversine` por tramos da bit a bit lo
+mismo que `haversine_m` y `equirectangular` queda dentro de su tolerancia.
+"""
+import numpy as np
+import pytest
+
+from src.distancias import Coordenadas, equirectangular, haversine, haversine_m
+
+
+@pytest.fixture(scope='module')
+def puntos():
+    rng = np.random.default_rng(2)
+    lat = 3.88 + rng.uniform(-0.01, 0.01, 5000)
+    lng = -73.67 + rng.uniform(-0.01, 0.01, 5000)
+    i, j = rng.integers(0, 5000, 20_000), rng.integers(0, 5000, 20_000)
+    return lat, lng, i, j
+
+
+@pytest.mark.parametrize('tramo', [1, 777, 32768])
+def test_haversine_igual_que_referencia(puntos, tramo):
+    lat, lng, i, j = puntos
+    coordenadas = Coordenadas(lat, lng)
+    referencia = haversine_m(lng[i], lat[i], lng[j], lat[j])
+    np.testing.assert_array_equal(haversine(coordenadas, i, coordenadas, j, tramo=tramo), referencia)
+
+
+def test_equirectangular_cerca_de_haversine(puntos):
+    lat, lng, i, j = puntos
+    coordenadas = Coordenadas(lat, lng)
+    exacta = haversine(coordenadas, i, coordenadas, j)
+    np.testing.assert_allclose(equirectangular(coordenadas, i, coordenadas, j), exacta, rtol=1e-5, atol=1e-9)
@@ -0,0 +1,37 @@
+"""
+Etapa 3: el primer registro de cada cluster se elige con np.unique e iloc en
+lugar del bucle groupby/pd.concat original; el resultado debe ser el mismo.
+"""
+import pandas as pd
+import pytest
+
+from src.motor_limpieza import LimpiezaSpots
+
+from .conftest import SPOTS
+
+
+def _seleccion_concat(df: pd.DataFrame, etiquetas) -> pd.DataFrame:
+    """Selección anterior: un pd.concat por cluster."""
+    df = df.copy()
+    df['cluster'] = etiquetas
+    df_final = pd.DataFrame()
+    for _, grupo in df.groupby('cluster'):
+        df_final = pd.concat([df_final, grupo.iloc[[0]]])
+    return df_final.drop(columns=['cluster']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('entrada', ['spots', 'spots_duplicados'])
+def test_igual_al_bucle_concat(entrada, request):
+    ruta = SPOTS if entrada == 'spots' else request.getfixturevalue('spots_duplicados')
+    limpiador = LimpiezaSpots()
+    df = limpiador._cargar_y_normalizar(str(ruta), '7')
+    df = df.drop_duplicates(subset=['Latitud', 'Longitud'], keep='first').reset_index(drop=True)
+    etiquetas = limpiador._etiquetar_clusters(df['Latitud'].values, df['Longitud'].values)
+
+    nuevo = limpiador._corregir_duplicados_espaciales(df, etiquetas)
+    anterior = _seleccion_concat(df, etiquetas)
+
+    pd.testing.assert_frame_equal(nuevo, anterior)
+    assert limpiador.stats['eliminados_espaciales'] == len(df) - len(anterior)
+    if entrada == 'spots_duplicados':
+        assert limpiador.stats['eliminados_espaciales'] > 0
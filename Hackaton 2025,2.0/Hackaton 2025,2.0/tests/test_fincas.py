@@ -0,0 +1,41 @@
+"""
+Archivos con varias fincas (src.fincas): cada finca igual que limpiada sola y
+el progreso del archivo nunca retrocede.
+"""
+import pandas as pd
+import pytest
+
+from src.fincas import ruta_finca
+from src.motor_limpieza import LimpiezaSpots
+
+
+@pytest.fixture(scope='module')
+def tres_fincas(finca_sintetica, tmp_path_factory):
+    df = pd.read_csv(finca_sintetica, dtype=str)
+    lote = df['lote_id'].str.split('-').str[0].astype(int)
+    df['finca_id'] = (lote % 3 + 1).astype(str)
+    directorio = tmp_path_factory.mktemp('fincas')
+    df.to_csv(directorio / 'fincas.csv', index=False)
+    for finca, filas in df.groupby('finca_id'):
+        filas.to_csv(directorio / f"sola_{finca}.csv", index=False)
+    return directorio
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cada_finca_igual_que_sola(tres_fincas, limpiar, tmp_path, workers):
+    _, stats = limpiar(tres_fincas / 'fincas.csv', 'salida.csv', workers=workers)
+    assert set(stats['fincas']) == {'1', '2', '3'}
+    for finca in stats['fincas']:
+        sola, _ = limpiar(tres_fincas / f"sola_{finca}.csv", f"sola_{finca}.csv")
+        with open(ruta_finca(str(tmp_path / 'salida.csv'), finca), 'rb') as f:
+            assert f.read() == sola
+
+
+def test_progreso_no_retrocede(tres_fincas, tmp_path):
+    avisos = []
+    limpiador = LimpiezaSpots(update_callback=lambda progreso, mensaje: avisos.append((progreso, mensaje)))
+    ok, reporte = limpiador.procesar_y_exportar(str(tres_fincas / 'fincas.csv'), str(tmp_path / 'salida.csv'), '7')
+    assert ok, reporte
+    progresos = [progreso for progreso, _ in avisos]
+    assert progresos == sorted(progresos) and progresos[-1] == 100
+    assert any(mensaje.startswith('Finca 2: ') for _, mensaje in avisos)
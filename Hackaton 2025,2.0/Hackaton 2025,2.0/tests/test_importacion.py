@@ -0,0 +1,22 @@
+"""
+Presupuesto de arranque (benchmarks.bench_importacion) como prueba: cada punto
+de entrada no carga dependencias de otras etapas y se importa a tiempo.
+FACTOR_IMPORTACION multiplica los presupuestos en máquinas lentas, como --factor.
+"""
+import os
+
+import pytest
+
+from benchmarks.bench_importacion import COMPROBACIONES, medir_importacion, prohibidos_cargados
+
+FACTOR = float(os.environ.get('FACTOR_IMPORTACION', 1))
+REPETICIONES = 3
+
+
+@pytest.mark.parametrize('modulo, prohibidos, presupuesto_ms', COMPROBACIONES, ids=[c[0] for c in COMPROBACIONES])
+def test_presupuesto_de_importacion(modulo, prohibidos, presupuesto_ms):
+    medidas = [medir_importacion(modulo) for _ in range(REPETICIONES)]
+    if any(medida is None for medida in medidas):
+        pytest.skip(f"{modulo} no se puede importar aquí")
+    assert prohibidos_cargados(medidas[0][1], prohibidos) == []
+    assert min(ms for ms, _ in medidas) <= presupuesto_ms * FACTOR
@@ -0,0 +1,59 @@
+"""
+Índice espacial (src.indice): `cargar` devuelve lo que `guardar` escribió y
+las consultas coinciden con la búsqueda exhaustiva por haversine.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.distancias import haversine_m
+from src.indice import IndiceSpots, SpotIndex
+from src.motor_limpieza import LimpiezaSpots
+
+from .conftest import SPOTS
+
+
+@pytest.fixture(scope='module')
+def salida(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp('indice') / 'salida.csv'
+    ok, reporte = LimpiezaSpots().procesar_y_exportar(str(SPOTS), str(ruta), '7')
+    assert ok, reporte
+    return ruta
+
+
+@pytest.fixture(scope='module')
+def lecturas():
+    df = pd.read_csv(SPOTS, sep=';')
+    rng = np.random.default_rng(5)
+    filas = rng.choice(len(df), 200)
+    lat = df['Latitud'].to_numpy()[filas] + rng.normal(0, 2e-5, 200)
+    lng = df['Longitud'].to_numpy()[filas] + rng.normal(0, 2e-5, 200)
+    return np.r_[lat, np.nan], np.r_[lng, -73.6]
+
+
+def test_nombre_pedido():
+    assert SpotIndex is IndiceSpots
+
+
+def test_cargar_lo_guardado(salida, lecturas, tmp_path):
+    indice = IndiceSpots.desde_archivo(str(salida))
+    ruta = str(tmp_path / 'indice.npz')
+    indice.guardar(ruta)
+    cargado = IndiceSpots.cargar(ruta)
+
+    # El .npz guarda el texto como categorías: se comparan los valores
+    pd.testing.assert_frame_equal(cargado.spots, indice.spots, check_dtype=False, check_categorical=False)
+    assert cargado.spots['lat'].dtype == indice.spots['lat'].dtype
+    for original, copia in zip(indice.vecinos(*lecturas, k=3), cargado.vecinos(*lecturas, k=3)):
+        np.testing.assert_array_equal(copia, original)
+
+
+def test_vecinos_igual_que_busqueda_exhaustiva(salida, lecturas):
+    indice = IndiceSpots.desde_archivo(str(salida))
+    lat, lng = lecturas
+    posiciones, distancias = indice.buscar(lat, lng)
+    assert posiciones[-1] == -1 and np.isnan(distancias[-1])
+
+    todas = haversine_m(lng[:-1, None], lat[:-1, None], indice.lng[None, :], indice.lat[None, :])
+    np.testing.assert_allclose(distancias[:-1], todas.min(axis=1), rtol=1e-9)
+    np.testing.assert_allclose(todas[np.arange(len(todas)), posiciones[:-1]], todas.min(axis=1), rtol=1e-9)
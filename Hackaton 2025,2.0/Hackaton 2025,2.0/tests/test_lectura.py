@@ -0,0 +1,132 @@
+"""
+Lectura de CSV: una sola pasada por el archivo, también con valores sucios,
+con los tipos de `lectura.TIPOS_FORMATO` y los lotes en orden.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.lectura import convertir_numericas, opciones_lectura_csv
+from src.motor_limpieza import LimpiezaSpots
+
+from .conftest import SPOTS, contadores
+
+SUCIOS = {'Latitud': 'N/A', 'Longitud': '-73,66', 'Linea': 'x', 'Palma': '2.5'}
+
+
+def _spots_barajado() -> pd.DataFrame:
+    # Lotes en desorden: el primero que aparece no es el menor
+    return pd.read_csv(SPOTS, sep=';', dtype=str).sample(frac=1, random_state=7).reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def sucio_y_limpio(tmp_path_factory):
+    """(archivo con valores no numéricos, el mismo con esos valores vacíos)."""
+    df = _spots_barajado()
+    rng = np.random.default_rng(1)
+    sucio, limpio = df.copy(), df.copy()
+    for columna, valor in SUCIOS.items():
+        filas = rng.choice(len(df), 25, replace=False)
+        sucio.loc[filas, columna] = valor
+        limpio.loc[filas, columna] = ''
+    directorio = tmp_path_factory.mktemp('datos')
+    sucio.to_csv(directorio / 'sucio.csv', sep=';', index=False)
+    limpio.to_csv(directorio / 'limpio.csv', sep=';', index=False)
+    return directorio / 'sucio.csv', directorio / 'limpio.csv'
+
+
+def test_tipos_con_valores_sucios(sucio_y_limpio):
+    df = LimpiezaSpots()._cargar_y_normalizar(str(sucio_y_limpio[0]), '7')
+    assert df['Latitud'].dtype == np.float64 and df['Longitud'].dtype == np.float64
+    assert df['Linea'].dtype == 'Int32' and df['Palma'].dtype == 'Int32'
+    # Coordenadas no numéricas: la fila se descarta; Linea/Palma no numéricas o decimales: vacías
+    assert 11083 - 50 <= len(df) < 11083
+    assert df['Linea'].isna().any() and df['Palma'].isna().any()
+    assert isinstance(df['Lote'].dtype, pd.CategoricalDtype)
+    assert df['Lote'].cat.categories.is_monotonic_increasing
+
+
+def test_valores_sucios_igual_que_vacios(sucio_y_limpio, limpiar):
+    sucio, limpio = sucio_y_limpio
+    salida_sucio, stats_sucio = limpiar(sucio, 'sucio.csv')
+    salida_limpio, stats_limpio = limpiar(limpio, 'limpio.csv')
+    # Los nombres y la palma leída conservan el texto del archivo ('x', '2.5'); el resto no cambia
+    texto = ['nombre_spot', 'nombre_planta', 'posicion.1']
+    df_sucio = pd.read_csv(io.BytesIO(salida_sucio), dtype=str)
+    df_limpio = pd.read_csv(io.BytesIO(salida_limpio), dtype=str)
+    pd.testing.assert_frame_equal(df_sucio.drop(columns=texto), df_limpio.drop(columns=texto))
+    cambiados = (df_sucio[texto].fillna('') != df_limpio[texto].fillna('')).any(axis=1)
+    assert 0 < cambiados.sum() <= 50
+    assert contadores(stats_sucio) == contadores(stats_limpio)
+
+
+@pytest.mark.parametrize('filas_por_bloque', [500, 3000])
+def test_bloques_sucios_igual_que_en_memoria(sucio_y_limpio, limpiar, filas_por_bloque):
+    salida, _ = limpiar(sucio_y_limpio[0], 'memoria.csv')
+    salida_bloques, _ = limpiar(sucio_y_limpio[0], 'bloques.csv', filas_por_bloque=filas_por_bloque)
+    assert salida_bloques == salida
+
+
+@pytest.mark.parametrize('opciones', [{}, {'filas_por_bloque': 1000}])
+def test_una_sola_lectura(sucio_y_limpio, limpiar, monkeypatch, opciones):
+    lecturas = []
+    read_csv = pd.read_csv
+
+    def contar(ruta, *args, **kwargs):
+        if kwargs.get('nrows') != 0:
+            lecturas.append(ruta)
+        return read_csv(ruta, *args, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_csv', contar)
+    limpiar(sucio_y_limpio[0], **opciones)
+    assert len(lecturas) == 1
+
+
+def test_lotes_en_orden_con_categorias_desordenadas():
+    df = _spots_barajado()
+    # Categorías en orden de aparición, como las deja read_csv en archivos grandes
+    df['Lote'] = pd.Categorical(df['Lote'], categories=pd.unique(df['Lote']))
+    assert not df['Lote'].cat.categories.is_monotonic_increasing
+    lotes = df['Lote'].astype(str).tolist()
+    normalizado = LimpiezaSpots()._normalizar(df, '7')
+    assert normalizado['Lote'].cat.categories.is_monotonic_increasing
+    assert normalizado['Lote'].astype(str).tolist() == lotes
+
+
+def test_convertir_numericas():
+    df = pd.DataFrame({
+        'lat': ['3.5', 'abc', '', '4'],
+        'linea': [1.0, 2.5, np.nan, 3e12],
+        'posicion': pd.array([1, None, 3, 4], dtype='Int32'),
+    })
+    convertir_numericas(df, {'lat': 'float64', 'linea': 'Int32', 'posicion': 'Int32', 'falta': 'Int32'})
+    assert df['lat'].dtype == np.float64 and df['lat'][0] == 3.5 and df['lat'][3] == 4.0
+    assert df['lat'].isna().tolist() == [False, True, True, False]
+    assert df['linea'].dtype == 'Int32' and df['linea'].isna().tolist() == [False, True, True, True]
+    assert df['posicion'].dtype == 'Int32' and df['posicion'].isna().tolist() == [False, True, False, False]
+
+
+def test_opciones_sin_tipos_numericos_en_lectura():
+    opciones = opciones_lectura_csv(str(SPOTS))
+    assert opciones['numericas'] == {'Latitud': 'float64', 'Longitud': 'float64'}
+    assert opciones['dtype'] == {'Lote': 'category', 'Linea': str, 'Palma': str}
+
+
+@pytest.mark.parametrize('opciones', [{}, {'filas_por_bloque': 3000}])
+def test_nombres_con_ceros_a_la_izquierda(tmp_path, limpiar, opciones):
+    df = pd.read_csv(SPOTS, sep=';', dtype=str)
+    rellenado = df.assign(Linea=df['Linea'].str.zfill(2), Palma=df['Palma'].str.zfill(3))
+    rellenado.to_csv(tmp_path / 'ceros.csv', sep=';', index=False)
+    salida, _ = limpiar(SPOTS, 'sin_ceros.csv', **opciones)
+    salida_ceros, _ = limpiar(tmp_path / 'ceros.csv', 'ceros.csv', **opciones)
+
+    esperado = pd.read_csv(tmp_path / 'sin_ceros.csv', dtype=str)
+    # La primera columna posicion es la palma corregida; la segunda, la palma tal como se leyó
+    linea, palma = esperado['linea'].str.zfill(2), esperado['posicion.1'].str.zfill(3)
+    esperado['nombre_spot'] = 'SPOT_' + esperado['lote_id'] + '_L' + linea + '_P' + palma
+    esperado['nombre_planta'] = 'L' + esperado['lote_id'] + 'L' + linea + 'P' + palma
+    esperado['posicion.1'] = palma
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'ceros.csv', dtype=str), esperado)
+    assert salida_ceros != salida
@@ -0,0 +1,78 @@
+"""
+Lectura de .xlsx (src.lectura_xlsx): mismos tipos y misma salida que el CSV
+equivalente, también con valores sucios y con cualquier tamaño de lote, y la
+copia convertida (convertir_xlsx) reutilizada mientras el libro no cambie.
+"""
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import src.motor_limpieza
+from src.columnar import FORMATOS, resolver_formato
+from src.lectura_xlsx import leer_xlsx
+
+from .conftest import SPOTS
+
+pytest.importorskip('openpyxl')
+
+SUCIOS = {'Latitud': 'N/A', 'Longitud': 'abc', 'Linea': 'x', 'Palma': '2.5', 'Lote': 'NULL'}
+
+
+@pytest.fixture(scope='module')
+def libros(tmp_path_factory):
+    """{'limpio' | 'sucio': (ruta .xlsx, ruta .csv con las mismas celdas)}."""
+    directorio = tmp_path_factory.mktemp('libros')
+    limpio = pd.read_csv(SPOTS, sep=';')
+    sucio = pd.read_csv(SPOTS, sep=';', dtype=object)
+    for fila, (columna, valor) in enumerate(SUCIOS.items()):
+        sucio.loc[fila * 101:fila * 101 + 9, columna] = valor
+    rutas = {}
+    for nombre, df in (('limpio', limpio), ('sucio', sucio)):
+        rutas[nombre] = directorio / f"{nombre}.xlsx", directorio / f"{nombre}.csv"
+        df.to_excel(rutas[nombre][0], index=False)
+        df.to_csv(rutas[nombre][1], index=False)
+    return rutas
+
+
+@pytest.mark.parametrize('nombre', ['limpio', 'sucio'])
+def test_salida_igual_que_csv(libros, limpiar, nombre):
+    xlsx, csv = libros[nombre]
+    salida_xlsx, _ = limpiar(xlsx, 'desde_xlsx.csv')
+    salida_csv, _ = limpiar(csv, 'desde_csv.csv')
+    assert salida_xlsx == salida_csv
+
+
+@pytest.mark.parametrize('nombre', ['limpio', 'sucio'])
+def test_tipos_independientes_del_lote(libros, nombre):
+    df = leer_xlsx(str(libros[nombre][0]))
+    assert df['Latitud'].dtype == 'float64' and df['Linea'].dtype == object
+    assert isinstance(df['Lote'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(leer_xlsx(str(libros[nombre][0]), filas_por_lote=997), df)
+
+
+def test_convertir_xlsx_reutiliza_la_copia(libros, limpiar, tmp_path, monkeypatch):
+    libro = tmp_path / 'libro.xlsx'
+    shutil.copy(libros['sucio'][0], libro)
+    convertido = str(libro) + FORMATOS[resolver_formato('auto')]
+    lecturas = []
+
+    def contar(ruta, *args, **kwargs):
+        lecturas.append(ruta)
+        return leer_xlsx(ruta, *args, **kwargs)
+
+    monkeypatch.setattr(src.motor_limpieza, 'leer_xlsx', contar)
+    esperado, _ = limpiar(libros['sucio'][1], 'desde_csv.csv')
+
+    # Primera vez: se lee el libro y se guarda la copia
+    assert limpiar(libro, 'primera.csv', convertir_xlsx=True)[0] == esperado
+    assert len(lecturas) == 1 and os.path.exists(convertido)
+    # Copia igual de reciente que el libro: no se vuelve a leer el .xlsx
+    assert limpiar(libro, 'segunda.csv', convertir_xlsx=True)[0] == esperado
+    assert len(lecturas) == 1
+    # Copia más antigua que el libro (libro modificado): se lee de nuevo y se rehace la copia
+    os.utime(convertido, (os.path.getmtime(libro) - 10,) * 2)
+    assert limpiar(libro, 'tercera.csv', convertir_xlsx=True)[0] == esperado
+    assert len(lecturas) == 2
+    assert os.path.getmtime(convertido) >= os.path.getmtime(libro)
@@ -0,0 +1,81 @@
+"""
+Revisión de líneas (validar_lineas) con palmas anotadas en una línea vecina:
+se detectan todas, 'reasignar' las devuelve a su línea con nombres únicos y
+'marcar' solo escribe el informe _LINEAS.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.generador import escribir_finca, generar_finca
+from src.lineas import ruta_informe
+
+from .conftest import contadores
+
+N_PALMAS = 12_000
+
+
+@pytest.fixture(scope='module', params=['nuevo', 'antiguo'])
+def finca_equivocada(request, tmp_path_factory):
+    """(archivo con líneas equivocadas, misma finca con las líneas bien, filas equivocadas)."""
+    opciones = dict(formato=request.param, semilla=5, frac_exactos=0, frac_casi_duplicados=0)
+    equivocada = generar_finca(N_PALMAS, frac_lineas_equivocadas=0.02, **opciones)
+    correcta = generar_finca(N_PALMAS, **opciones)
+    ruta = tmp_path_factory.mktemp('lineas') / 'finca.csv'
+    escribir_finca(equivocada, str(ruta))
+    if request.param == 'antiguo':
+        columnas = {'Lote': 'lote_id', 'Linea': 'linea', 'Palma': 'posicion', 'Latitud': 'lat', 'Longitud': 'lng'}
+        equivocada, correcta = equivocada.rename(columns=columnas), correcta.rename(columns=columnas)
+    filas = (equivocada['linea'] != correcta['linea']).to_numpy().nonzero()[0]
+    return ruta, correcta, filas
+
+
+def _nombres(df: pd.DataFrame) -> pd.Series:
+    return 'SPOT_' + df['lote_id'] + '_L' + df['linea'] + '_P' + df['posicion']
+
+
+def test_detecta_las_palmas_en_otra_linea(finca_equivocada, limpiar, tmp_path):
+    ruta, correcta, filas = finca_equivocada
+    _, stats = limpiar(ruta, validar_lineas='marcar')
+    assert len(filas) > 100
+    assert stats['lineas']['revisadas'] == N_PALMAS
+    assert stats['lineas']['sospechosas'] == stats['lineas']['reasignables'] == len(filas)
+    assert stats['lineas']['reasignadas'] == 0
+
+    informe = pd.read_csv(ruta_informe(str(tmp_path / 'salida.csv')), dtype=str)
+    assert stats['lineas']['informe'] == ruta_informe(str(tmp_path / 'salida.csv'))
+    assert len(informe) == len(filas) and (informe['reasignada'] == 'False').all()
+    # Cada sospechosa, con la línea en la que realmente está como sugerida
+    reales = correcta.iloc[filas].astype({'lat': float, 'lng': float})
+    cruce = informe.astype({'lat': float, 'lng': float}).merge(reales, on=['lat', 'lng'], suffixes=('', '_real'))
+    assert len(cruce) == len(filas)
+    assert (cruce['linea_sugerida'].astype(float) == cruce['linea_real'].astype(float)).all()
+
+
+def test_marcar_no_cambia_la_salida(finca_equivocada, limpiar):
+    ruta = finca_equivocada[0]
+    salida, stats = limpiar(ruta, 'sin_revisar.csv')
+    salida_marcada, stats_marcada = limpiar(ruta, 'marcada.csv', validar_lineas='marcar')
+    assert salida_marcada == salida
+    assert contadores(stats_marcada) == contadores(stats)
+
+
+def test_reasignar_devuelve_cada_palma_a_su_linea(finca_equivocada, limpiar):
+    ruta, correcta, filas = finca_equivocada
+    salida, stats = limpiar(ruta, validar_lineas='reasignar')
+    assert stats['lineas']['reasignadas'] == len(filas)
+
+    df = pd.read_csv(io.BytesIO(salida), dtype=str)
+    # Sin nombres repetidos: los de las palmas reasignadas llevan la línea nueva
+    assert df['nombre_spot'].is_unique
+    esperadas = set(zip(_nombres(correcta), correcta['linea']))
+    assert set(zip(df['nombre_spot'], df['linea'])) == esperadas
+    plantas = 'L' + correcta['lote_id'] + 'L' + correcta['linea'] + 'P' + correcta['posicion']
+    assert set(df['nombre_planta']) == set(plantas)
+
+
+def test_reasignar_por_bloques_igual_que_en_memoria(finca_equivocada, limpiar):
+    salida, _ = limpiar(finca_equivocada[0], 'memoria.csv', validar_lineas='reasignar')
+    salida_bloques, _ = limpiar(finca_equivocada[0], 'bloques.csv', validar_lineas='reasignar', filas_por_bloque=5000)
+    assert salida_bloques == salida
@@ -0,0 +1,44 @@
+"""
+Motor 'grid': mismos clusters (numerados por primer registro) que DBSCAN con
+min_samples=1 y métrica haversine, y por tanto la misma salida.
+"""
+import numpy as np
+import pytest
+
+from src.motor_espacial import agrupar_por_rejilla
+from src.motor_limpieza import LimpiezaSpots
+
+from .conftest import contadores
+
+
+@pytest.mark.parametrize('umbral', [0.5, 1.0, 5.0])
+def test_etiquetas_iguales_a_dbscan(spots_duplicados, umbral):
+    limpiador = LimpiezaSpots(umbral_metros=umbral)
+    df = limpiador._cargar_y_normalizar(str(spots_duplicados), '7')
+    lat, lng = df['Latitud'].to_numpy(), df['Longitud'].to_numpy()
+
+    dbscan = limpiador._etiquetar_clusters(lat, lng)
+    rejilla = agrupar_por_rejilla(lat, lng, umbral)
+
+    np.testing.assert_array_equal(rejilla, dbscan)
+    assert len(np.unique(rejilla)) < len(rejilla)
+
+
+def test_cadenas_de_puntos_cercanos():
+    # Cada punto a 0,8 m del anterior: una sola cadena aunque los extremos estén a 4 m
+    lat = 3.88 + np.arange(6) * 0.8 / 111195.0
+    lng = np.full(6, -73.67)
+    assert agrupar_por_rejilla(np.r_[lat, 3.9], np.r_[lng, -73.6], 1.0).tolist() == [0, 0, 0, 0, 0, 0, 1]
+
+
+def test_vacio():
+    assert len(agrupar_por_rejilla(np.array([]), np.array([]), 1.0)) == 0
+
+
+@pytest.mark.parametrize('entrada', ['spots_duplicados', 'finca_sintetica'])
+def test_salida_igual_a_dbscan(entrada, request, limpiar):
+    ruta = request.getfixturevalue(entrada)
+    salida_dbscan, stats_dbscan = limpiar(ruta, 'dbscan.csv')
+    salida_rejilla, stats_rejilla = limpiar(ruta, 'grid.csv', motor_espacial='grid')
+    assert salida_rejilla == salida_dbscan
+    assert contadores(stats_rejilla) == contadores(stats_dbscan)
@@ -0,0 +1,18 @@
+"""
+Etapas 3 y 4 por lote en procesos (workers > 1): misma salida y mismos
+contadores que en un solo proceso, también con casi duplicados entre lotes.
+"""
+import pytest
+
+from .conftest import contadores
+
+
+@pytest.mark.parametrize('motor', ['dbscan', 'grid'])
+@pytest.mark.parametrize('entrada', ['spots_duplicados', 'finca_sintetica'])
+def test_igual_que_un_proceso(entrada, motor, request, limpiar):
+    ruta = request.getfixturevalue(entrada)
+    salida, stats = limpiar(ruta, 'serie.csv', motor_espacial=motor)
+    salida_lotes, stats_lotes = limpiar(ruta, 'lotes.csv', motor_espacial=motor, workers=2)
+    assert salida_lotes == salida
+    assert contadores(stats_lotes) == contadores(stats)
+
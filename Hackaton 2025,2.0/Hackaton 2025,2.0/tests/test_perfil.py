@@ -0,0 +1,55 @@
+"""Medición por etapa (src.perfil): picos de memoria con mediciones anidadas."""
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from src.perfil import medir_etapa
+
+
+@pytest.fixture
+def con_tracemalloc():
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+def test_pico_exterior_incluye_lo_anterior_a_la_anidada(con_tracemalloc):
+    etapas = {}
+    with medir_etapa(etapas, 'exterior'):
+        grande = np.ones(4_000_000)  # 32 MB
+        del grande
+        with medir_etapa(etapas, 'interior'):
+            pequeno = np.ones(1000)
+            del pequeno
+    assert etapas['exterior']['memoria_pico_mb'] >= 30
+    assert etapas['interior']['memoria_pico_mb'] < 1
+
+
+def test_pico_exterior_incluye_el_de_la_anidada(con_tracemalloc):
+    etapas = {}
+    with medir_etapa(etapas, 'exterior'):
+        with medir_etapa(etapas, 'interior'):
+            grande = np.ones(4_000_000)
+            del grande
+        with medir_etapa(etapas, 'otra'):
+            pass
+    assert etapas['interior']['memoria_pico_mb'] >= 30
+    assert etapas['exterior']['memoria_pico_mb'] >= etapas['interior']['memoria_pico_mb']
+    assert etapas['otra']['memoria_pico_mb'] < 1
+
+
+def test_sin_tracemalloc():
+    etapas = {}
+    with medir_etapa(etapas, 'etapa', 10) as registro:
+        registro['filas_salida'] = 5
+    assert etapas['etapa']['filas_entrada'] == 10 and etapas['etapa']['filas_salida'] == 5
+    assert 'memoria_pico_mb' not in etapas['etapa']
+
+
+def test_acumula_mediciones_repetidas():
+    etapas = {}
+    for _ in range(3):
+        with medir_etapa(etapas, 'lote', 2) as registro:
+            registro['filas_salida'] = 1
+    assert etapas['lote']['filas_entrada'] == 6 and etapas['lote']['filas_salida'] == 3
@@ -0,0 +1,42 @@
+"""
+Pipeline de etapas (src.pipeline): el plan corre al pedir el resultado, una
+sola vez, y todos los modos del limpiador pasan por las mismas etapas.
+"""
+import pytest
+
+from src.motor_limpieza import LimpiezaSpots
+
+from .conftest import SPOTS
+
+
+def test_las_etapas_corren_al_pedir_el_resultado():
+    limpiador = LimpiezaSpots()
+    df = limpiador._cargar_y_normalizar(str(SPOTS), '7')
+    llamadas = []
+
+    def contar(limpiador, columnas):
+        llamadas.append(len(columnas))
+
+    resultado = limpiador.pipeline(['duplicados_exactos', contar]).ejecutar(df)
+    assert not resultado.ejecutado and llamadas == []
+    assert resultado.etapas['contar']['filas_entrada'] == len(df)
+    assert len(resultado.df) == len(resultado) and llamadas == [len(df)]
+
+
+def test_pipeline_igual_que_procesar_y_exportar(spots_duplicados, limpiar, tmp_path):
+    salida, stats = limpiar(spots_duplicados)
+    limpiador = LimpiezaSpots()
+    limpiador.pipeline().desde_archivo(str(spots_duplicados), '7').exportar(str(tmp_path / 'pipeline.csv'))
+    assert (tmp_path / 'pipeline.csv').read_bytes() == salida
+    assert limpiador.stats['eliminados_espaciales'] == stats['eliminados_espaciales']
+
+
+@pytest.mark.parametrize('opciones', [{'workers': 2}, {'cache': True}])
+def test_bloques_por_lote_igual_que_en_memoria(finca_sintetica, limpiar, tmp_path, opciones):
+    if opciones.pop('cache', False):
+        opciones['directorio_cache'] = str(tmp_path / 'cache')
+    salida, _ = limpiar(finca_sintetica, 'memoria.csv', motor_espacial='grid')
+    salida_bloques, stats = limpiar(finca_sintetica, 'bloques.csv', motor_espacial='grid',
+                                    filas_por_bloque=7000, **opciones)
+    assert salida_bloques == salida
+    assert ('cache' in stats) == ('directorio_cache' in opciones)
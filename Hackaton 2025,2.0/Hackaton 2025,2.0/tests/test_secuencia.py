@@ -0,0 +1,73 @@
+"""
+Corrección de secuencia (LimpiezaSpots._ordenar_secuencia) frente al algoritmo
+anterior, un groupby(['Lote', 'Linea']).apply por línea con haversine_m: mismo
+orden y misma 'Palma' corregida con filas barajadas, coordenadas vacías,
+líneas de una sola palma, líneas sin ninguna 'Palma' y 'Linea' vacía.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.distancias import haversine_m
+from src.motor_limpieza import LimpiezaSpots
+
+
+def _secuencia_por_linea(df: pd.DataFrame) -> pd.DataFrame:
+    """El algoritmo anterior, tal cual: cada línea ordenada por distancia a su menor 'Palma'."""
+    def reordenar_linea(grupo):
+        grupo_valido = grupo.dropna(subset=['Palma']).copy()
+        if grupo_valido.empty:
+            return grupo
+        palma_inicio = grupo_valido.loc[grupo_valido['Palma'].idxmin()]
+        distancias = haversine_m(palma_inicio['Longitud'], palma_inicio['Latitud'],
+                                 grupo['Longitud'].to_numpy(dtype=float), grupo['Latitud'].to_numpy(dtype=float))
+        grupo['distancia_inicio'] = distancias
+        grupo_ordenado = grupo.sort_values(by='distancia_inicio').reset_index(drop=True)
+        grupo_ordenado['Palma_Corregida'] = grupo_ordenado.index + 1
+        return grupo_ordenado
+
+    grupos = df.groupby(['Lote', 'Linea'], dropna=False, group_keys=False, observed=True)
+    return grupos[list(df.columns)].apply(reordenar_linea)
+
+
+def _finca(semilla: int) -> pd.DataFrame:
+    """Lotes con líneas de 1 a 40 palmas, filas barajadas y algunos valores vacíos."""
+    rng = np.random.default_rng(semilla)
+    partes = []
+    for lote in ('62-LA CEIBA', '63-CERCA', '7-A'):
+        for linea in range(1, 26):
+            n = int(rng.choice([1, 1, 2, 3, rng.integers(4, 41)]))
+            partes.append(pd.DataFrame({
+                'Lote': lote,
+                'Linea': linea,
+                'Palma': rng.permutation(n) + 1,
+                'Latitud': 3.88 + linea * 7e-5 + rng.normal(0, 3e-6, n),
+                'Longitud': -73.67 + np.arange(n) * 8e-5 + rng.normal(0, 3e-6, n),
+            }))
+    df = pd.concat(partes, ignore_index=True).sample(frac=1, random_state=semilla).reset_index(drop=True)
+    df['id'] = np.arange(len(df))
+    df['Palma'] = df['Palma'].astype('Int32')
+    df['Linea'] = df['Linea'].astype('Int32')
+
+    filas = rng.choice(len(df), 60, replace=False)
+    df.loc[filas[:20], 'Latitud'] = np.nan
+    df.loc[filas[20:30], 'Longitud'] = np.nan
+    df.loc[filas[30:45], 'Palma'] = pd.NA
+    df.loc[filas[45:], 'Linea'] = pd.NA
+    # Una línea sin ninguna 'Palma' válida
+    df.loc[(df['Lote'] == '7-A') & (df['Linea'] == 3), 'Palma'] = pd.NA
+    df['Lote'] = pd.Categorical(df['Lote'], categories=sorted(df['Lote'].unique()))
+    return df
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_igual_que_el_apply_por_linea(semilla):
+    df = _finca(semilla)
+    assert (df.groupby(['Lote', 'Linea'], observed=True).size() == 1).any()
+
+    orden, palma_corregida = LimpiezaSpots()._ordenar_secuencia(df)
+    esperado = _secuencia_por_linea(df)
+
+    np.testing.assert_array_equal(df['id'].to_numpy()[orden], esperado['id'].to_numpy())
+    np.testing.assert_array_equal(palma_corregida, esperado['Palma_Corregida'].to_numpy(dtype=float))
+    assert np.isnan(palma_corregida).any()
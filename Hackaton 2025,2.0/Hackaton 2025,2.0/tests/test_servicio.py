@@ -0,0 +1,125 @@
+"""
+Servicio HTTP (src.servicio) con el cliente de pruebas de Flask: subida
+multipart y en cuerpo crudo, cuerpo vacío, cola llena, resultado aún no
+listo, fallo al encolar, cancelación y descarga del resultado.
+"""
+import io
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+
+from src.servicio import crear_app
+
+from .conftest import SPOTS
+
+FINALES = ('terminado', 'error', 'cancelado')
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = crear_app(str(tmp_path / 'trabajos'), workers=1, max_pendientes=2, opciones={})
+    yield app
+    app.config['SERVICIO'].cerrar()
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def sin_pool(app, monkeypatch):
+    """Los trabajos se reservan pero no llegan a ejecutarse (quedan 'en_cola')."""
+    monkeypatch.setattr(app.config['SERVICIO'], 'encolar', lambda trabajo: None)
+
+
+def _subir(cliente, datos: bytes = None, **campos):
+    datos = SPOTS.read_bytes() if datos is None else datos
+    return cliente.post('/trabajos', data={'file': (io.BytesIO(datos), 'Spots.csv'), **campos},
+                        content_type='multipart/form-data')
+
+
+def _esperar(cliente, id_trabajo: str, limite_s: float = 120) -> dict:
+    fin = time.monotonic() + limite_s
+    while True:
+        estado = cliente.get(f'/trabajos/{id_trabajo}').get_json()
+        if estado['estado'] in FINALES or time.monotonic() > fin:
+            return estado
+        time.sleep(0.2)
+
+
+def test_multipart_y_descarga_del_resultado(cliente, limpiar):
+    respuesta = _subir(cliente, finca_id='7')
+    assert respuesta.status_code == 202
+    id_trabajo = respuesta.get_json()['id']
+    assert respuesta.headers['Location'] == f'/trabajos/{id_trabajo}'
+
+    estado = _esperar(cliente, id_trabajo)
+    assert estado['estado'] == 'terminado' and estado['progreso'] == 100
+    resultado = cliente.get(f'/trabajos/{id_trabajo}/resultado')
+    assert resultado.status_code == 200
+    assert resultado.headers['Content-Disposition'].endswith('Spots_LIMPIAS.csv')
+    assert resultado.data == limpiar(SPOTS)[0]
+
+
+@pytest.mark.parametrize('tipo', ['text/csv', 'application/x-www-form-urlencoded'])
+def test_cuerpo_crudo(app, cliente, sin_pool, tipo):
+    # Un cuerpo crudo con cualquier Content-Type se guarda entero; finca_id va en la URL
+    respuesta = cliente.post('/trabajos?finca_id=7&nombre=Spots.csv', data=SPOTS.read_bytes(), content_type=tipo)
+    assert respuesta.status_code == 202
+    trabajo = app.config['SERVICIO'].trabajos[respuesta.get_json()['id']]
+    assert trabajo.finca_id == '7'
+    with open(trabajo.entrada, 'rb') as f:
+        assert f.read() == SPOTS.read_bytes()
+
+
+@pytest.mark.parametrize('multipart', [True, False])
+def test_cuerpo_vacio(app, cliente, multipart):
+    if multipart:
+        respuesta = _subir(cliente, b'', finca_id='7')
+    else:
+        respuesta = cliente.post('/trabajos?finca_id=7', data=b'', content_type='text/csv')
+    assert respuesta.status_code == 400
+    assert app.config['SERVICIO'].trabajos == {}
+
+
+def test_falta_finca_id(cliente):
+    assert _subir(cliente).status_code == 400
+
+
+def test_cola_llena(cliente, sin_pool):
+    assert [_subir(cliente, finca_id='7').status_code for _ in range(2)] == [202, 202]
+    respuesta = _subir(cliente, finca_id='7')
+    assert respuesta.status_code == 429 and respuesta.headers['Retry-After'] == '30'
+
+
+def test_resultado_no_listo(cliente, sin_pool):
+    id_trabajo = _subir(cliente, finca_id='7').get_json()['id']
+    respuesta = cliente.get(f'/trabajos/{id_trabajo}/resultado')
+    assert respuesta.status_code == 409 and respuesta.get_json()['estado'] == 'en_cola'
+    assert cliente.get('/trabajos/no-existe/resultado').status_code == 404
+
+
+def test_fallo_al_encolar_libera_el_trabajo(app, cliente, monkeypatch):
+    servicio = app.config['SERVICIO']
+
+    def fallar(trabajo):
+        raise RuntimeError("pool roto")
+
+    monkeypatch.setattr(servicio, 'encolar', fallar)
+    respuesta = _subir(cliente, finca_id='7')
+    assert respuesta.status_code == 500 and 'pool roto' in respuesta.get_json()['error']
+    assert servicio.trabajos == {} and servicio.pendientes() == 0
+
+
+def test_cancelar(cliente):
+    # Con un solo proceso, el segundo trabajo se cancela en cola o en su primer aviso de progreso
+    primero = _subir(cliente, finca_id='7').get_json()['id']
+    segundo = _subir(cliente, finca_id='7').get_json()['id']
+    assert cliente.delete(f'/trabajos/{segundo}').status_code == 202
+
+    assert _esperar(cliente, segundo)['estado'] == 'cancelado'
+    assert cliente.get(f'/trabajos/{segundo}/resultado').status_code == 409
+    assert _esperar(cliente, primero)['estado'] == 'terminado'
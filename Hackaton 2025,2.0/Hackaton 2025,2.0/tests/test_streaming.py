@@ -0,0 +1,37 @@
+"""
+Modo por bloques (filas_por_bloque): misma salida y mismos contadores que
+cargando el archivo entero, con cualquier tamaño de bloque.
+"""
+import pandas as pd
+import pytest
+
+from .conftest import SPOTS, contadores
+
+
+@pytest.fixture(scope='module')
+def spots_con_vacios(tmp_path_factory):
+    """Spots.csv desordenado, con una Linea y una Palma vacías al final (columnas decimales en todo el archivo)."""
+    df = pd.read_csv(SPOTS, sep=';', dtype=str).sample(frac=1, random_state=4)
+    df.iloc[-1, df.columns.get_loc('Palma')] = ''
+    df.iloc[-2, df.columns.get_loc('Linea')] = ''
+    ruta = tmp_path_factory.mktemp('datos') / 'spots_vacios.csv'
+    df.to_csv(ruta, sep=',', index=False)
+    return ruta
+
+
+@pytest.mark.parametrize('filas_por_bloque', [997, 4000, 1_000_000])
+@pytest.mark.parametrize('entrada', ['spots_duplicados', 'finca_sintetica', 'spots_con_vacios'])
+def test_igual_que_en_memoria(entrada, filas_por_bloque, request, limpiar):
+    ruta = request.getfixturevalue(entrada)
+    salida, stats = limpiar(ruta, 'memoria.csv', motor_espacial='grid')
+    salida_bloques, stats_bloques = limpiar(ruta, 'bloques.csv', motor_espacial='grid',
+                                            filas_por_bloque=filas_por_bloque)
+    assert salida_bloques == salida
+    assert contadores(stats_bloques) == contadores(stats)
+
+
+def test_no_quedan_temporales(spots_duplicados, limpiar, tmp_path):
+    temporal = tmp_path / 'temporal'
+    temporal.mkdir()
+    limpiar(spots_duplicados, filas_por_bloque=2000, directorio_temporal=str(temporal))
+    assert not any(temporal.iterdir())
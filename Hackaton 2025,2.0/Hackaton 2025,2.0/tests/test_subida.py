@@ -0,0 +1,153 @@
+"""
+Subida a la API (src.subida) contra un servidor HTTP local: reintentos ante
+503/429, número de partes, bytes enviados, reanudación desde el manifiesto y
+respuestas 200 que no son un éxito de la API.
+"""
+import gzip
+import os
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.subida import SubidaSpots, dividir_en_partes
+
+from .conftest import SPOTS
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers['Content-Length']))
+        mensaje = BytesParser(policy=HTTP).parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + cuerpo
+        )
+        campos = {}
+        for campo in mensaje.iter_parts():
+            nombre = campo.get_param('name', header='content-disposition')
+            campos[nombre] = (campo.get_filename(), campo.get_payload(decode=True))
+
+        servidor = self.server
+        with servidor.cerrojo:
+            servidor.peticiones.append({'campos': campos, 'cabeceras': dict(self.headers)})
+            codigo = servidor.respuestas.pop(0) if servidor.respuestas else 200
+            if 'parte' in campos and int(campos['parte'][1]) in servidor.partes_rechazadas:
+                codigo = 400
+            cuerpo_ok = servidor.cuerpo_ok
+        self.send_response(codigo)
+        if codigo in (429, 503):
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'text/html' if cuerpo_ok.startswith(b'<') else 'application/json')
+        self.end_headers()
+        self.wfile.write(cuerpo_ok if codigo == 200 else b'{"status": "error", "message": "error"}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Manejador)
+    servidor.cerrojo = threading.Lock()
+    servidor.peticiones, servidor.respuestas, servidor.partes_rechazadas = [], [], set()
+    servidor.cuerpo_ok = b'{"status": "success", "message": "ok"}'
+    servidor.url = f"http://127.0.0.1:{servidor.server_port}/upload"
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def spots(tmp_path):
+    ruta = tmp_path / 'Spots.csv'
+    ruta.write_bytes(SPOTS.read_bytes())
+    return str(ruta)
+
+
+def _subida(servidor, **opciones) -> SubidaSpots:
+    return SubidaSpots(servidor.url, 'Bearer x', espera_base=0.001, **opciones)
+
+
+def test_por_defecto_una_sola_peticion_sin_campos_extra(servidor, spots):
+    servidor.respuestas = [503, 429]
+    subida = _subida(servidor)
+    ok, mensaje = subida.subir(spots)
+
+    assert ok and mensaje == 'ok'
+    assert len(servidor.peticiones) == 3  # dos reintentos
+    campos = servidor.peticiones[-1]['campos']
+    assert set(campos) == {'file'}
+    assert campos['file'] == ('Spots.csv', SPOTS.read_bytes())
+    assert 'Idempotency-Key' not in servidor.peticiones[-1]['cabeceras']
+    assert subida.stats['partes'] == 1 and subida.stats['bytes_enviados'] == os.path.getsize(spots)
+    assert not os.path.exists(SubidaSpots.ruta_manifiesto(spots))
+
+
+def test_por_partes_comprimidas(servidor, spots):
+    partes = dividir_en_partes(spots, 64 * 1024)
+    assert len(partes) > 3
+    servidor.respuestas = [503, 429]
+    subida = _subida(servidor, por_partes=True, comprimir=True, max_mb_parte=64 / 1024, workers=2)
+    ok, _ = subida.subir(spots)
+
+    assert ok
+    assert len(servidor.peticiones) == len(partes) + 2
+    recibidas = {}
+    for peticion in servidor.peticiones:
+        campos = peticion['campos']
+        assert int(campos['total_partes'][1]) == len(partes)
+        recibidas[int(campos['parte'][1])] = gzip.decompress(campos['file'][1])
+    assert recibidas == {parte['numero']: parte['datos'] for parte in partes}
+    comprimidos = sum(len(gzip.compress(parte['datos'], compresslevel=6, mtime=0)) for parte in partes)
+    assert subida.stats['bytes_enviados'] == comprimidos < sum(len(parte['datos']) for parte in partes)
+
+
+def test_reanuda_solo_las_partes_que_faltan(servidor, spots):
+    partes = dividir_en_partes(spots, 64 * 1024)
+    servidor.partes_rechazadas = {2}
+    subida = _subida(servidor, por_partes=True, max_mb_parte=64 / 1024)
+    ok, _ = subida.subir(spots)
+    assert not ok and subida.stats['fallidas'] == 1
+    assert len(servidor.peticiones) == len(partes)  # un 400 no se reintenta
+    assert os.path.exists(SubidaSpots.ruta_manifiesto(spots))
+
+    servidor.peticiones.clear()
+    servidor.partes_rechazadas = set()
+    ok, _ = subida.subir(spots)
+    assert ok
+    assert [int(peticion['campos']['parte'][1]) for peticion in servidor.peticiones] == [2]
+    assert subida.stats['ya_subidas'] == len(partes) - 1
+    assert not os.path.exists(SubidaSpots.ruta_manifiesto(spots))
+
+
+@pytest.mark.parametrize('cuerpo', [
+    b'<html><body>Portal de acceso</body></html>',
+    b'{"message": "ok"}',
+    b'{"status": "error", "message": "Lote inexistente", "codigo": 12}',
+])
+def test_200_sin_status_success_no_es_exito(servidor, spots, cuerpo):
+    servidor.cuerpo_ok = cuerpo
+    subida = _subida(servidor)
+    ok, mensaje = subida.subir(spots)
+    assert not ok
+    assert len(servidor.peticiones) == 1  # no se reintenta
+    if cuerpo.startswith(b'<'):
+        assert 'no es un JSON' in mensaje
+    if b'codigo' in cuerpo:
+        assert 'Lote inexistente' in mensaje and '12' in mensaje
+
+
+class _Respuesta:
+    def __init__(self, cabeceras):
+        self.headers = cabeceras
+
+
+def test_espera_acotada():
+    subida = SubidaSpots('http://localhost', 'x', espera_base=1.0, espera_max=5.0)
+    assert subida._espera(0, _Respuesta({'Retry-After': '3600'})) == 5.0
+    assert subida._espera(0, _Respuesta({'Retry-After': '2'})) == 2.0
+    assert subida._espera(10, None) == 5.0
+    assert subida._espera(0, None) <= 1.5
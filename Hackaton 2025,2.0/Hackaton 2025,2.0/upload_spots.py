@@ -1,6 +1,8 @@
-import requests
+import os
 import urllib3
 
+from src.subida import SubidaSpots
+
 # Desactiva advertencias SSL (solo en desarrollo)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -10,22 +12,27 @@ token = "TZtFlm+l9CS0ksbBr3eqbQ=="   # tu token real
 csv_file = "Spots.csv"              # nombre del archivo CSV
 
 # --- ENVÍO DEL ARCHIVO ---
-try:
-    with open(csv_file, "rb") as f:
-        files = {"file": f}
-        headers = {"Authorization": f"Bearer {token}"}
-
+# El archivo completo en una sola petición, con reintentos ante errores
+# transitorios (429, 5xx, timeouts).
+if not os.path.exists(csv_file):
+    print(f"⚠️ No se encontró el archivo {csv_file}. Colócalo en la misma carpeta que este script.")
+else:
+    try:
+        subida = SubidaSpots(
+            url,
+            f"Bearer {token}",
+            update_callback=lambda progreso, mensaje: print(f"⏳ ({progreso}%) {mensaje}"),
+            verificar_ssl=False,
+        )
         print("⏳ Subiendo archivo a Sioma...")
-        response = requests.post(url, files=files, headers=headers, verify=False)
+        ok, mensaje = subida.subir(csv_file)
 
-        if response.status_code == 200:
+        if ok:
             print("✅ Respuesta del servidor:")
-            print(response.text)
+            print(mensaje)
         else:
-            print(f"❌ Error {response.status_code}:")
-            print(response.text)
+            print("❌ Error:")
+            print(mensaje)
 
-except FileNotFoundError:
-    print(f"⚠️ No se encontró el archivo {csv_file}. Colócalo en la misma carpeta que este script.")
-except Exception as e:
-    print(f"⚠️ Error inesperado: {e}")
+    except Exception as e:
+        print(f"⚠️ Error inesperado: {e}")